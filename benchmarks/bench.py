@@ -0,0 +1,263 @@
+"""Benchmarks for the parsers and the CLI commands
+
+Parsers are measured on the recorded pages in tests/test_data, plus a course
+list with a few hundred tasks made from the recorded one. Commands run
+in-process against a local stub of the CSES site serving the same pages.
+
+Run with `rye run bench` or `python -m benchmarks.bench [--iterations N]`.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import re
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+from unittest import mock
+
+from tyora import client, parser, transport, tyora
+from tyora.utils import find_link, parse_form
+
+TEST_DATA = Path(__file__).parent.parent / "tests" / "test_data"
+LIST_TASKS = 300
+
+
+@dataclass
+class Measurement:
+    name: str
+    median_ms: float
+    peak_kib: float
+    requests: Optional[int] = None
+
+
+def read_page(name: str) -> str:
+    return (TEST_DATA / name).read_text()
+
+
+def large_task_list(tasks: int = LIST_TASKS) -> str:
+    """Return the recorded course list with its tasks repeated to the given size"""
+    html = read_page("session_logged_in_some_tasks_done.html")
+    items = re.findall(r'<li class="task">.*?(?=<li|</ul>)', html)
+    repeated = "".join(
+        re.sub(r"/task/\d+", f"/task/{1000 + i}", items[i % len(items)])
+        for i in range(tasks)
+    )
+    return html.replace("".join(items), repeated, 1)
+
+
+def measure(
+    name: str, func: Callable[[], Any], iterations: int, counter: Optional[Any] = None
+) -> Measurement:
+    """Run func iterations times for the timing, and once more for memory use"""
+    timings: list[float] = list()
+    requests = None
+    for _ in range(iterations):
+        if counter is not None:
+            counter.reset()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+        if counter is not None:
+            requests = counter.count
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return Measurement(
+        name=name,
+        median_ms=statistics.median(timings) * 1000,
+        peak_kib=peak / 1024,
+        requests=requests,
+    )
+
+
+def bench_parsers(iterations: int, list_tasks: int = LIST_TASKS) -> list[Measurement]:
+    pages = {
+        "list": large_task_list(list_tasks),
+        "task": read_page("task_3055_complete.html"),
+        "form": read_page("submit_3055_form.html"),
+        "result": read_page("result_3055_failed.html"),
+    }
+    cases: dict[str, tuple[str, Callable[[Any], Any]]] = {
+        "parse_task_list": ("list", client.parse_task_list),
+        "parse_task": ("task", client.parse_task),
+        "parse_form": ("form", parse_form),
+        "find_link": ("list", lambda root: find_link(root, './/a[@title="Log out"]')),
+        "parse_submit_result": ("result", client.parse_submit_result),
+    }
+
+    backends = ["html5lib", "html.parser"]
+    if parser.get_backend() == "lxml":
+        backends.append("lxml")
+
+    measurements: list[Measurement] = list()
+    for backend in backends:
+        for name, (page, func) in cases.items():
+            # Parse from the raw html every time, the memoized tree would hide it
+            parse = parser.PARSERS[backend]
+            measurements.append(
+                measure(
+                    f"{name} [{backend}]",
+                    lambda: func(parse(pages[page])),
+                    iterations,
+                )
+            )
+    return measurements
+
+
+class StubCses(BaseHTTPRequestHandler):
+    """Serves the recorded pages for the paths of a course on the CSES site"""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    count = 0
+    lock = threading.Lock()
+    routes = {
+        r"/dsa24k/list": "list",
+        r"/dsa24k/task/3055/?": "task_3055_complete.html",
+        r"/dsa24k/task/\d+/?": "task_3052_incomplete_no_submit_link.html",
+        r"/dsa24k/submit/\d+/?": "submit_3055_form.html",
+        r"/dsa24k/result/\d+/?": "result_3055_accepted.html",
+    }
+    pages: dict[str, str] = dict()
+
+    @classmethod
+    def reset(cls) -> None:
+        with cls.lock:
+            cls.count = 0
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+    def _count(self) -> None:
+        with self.lock:
+            type(self).count += 1
+
+    def do_GET(self) -> None:
+        self._count()
+        for route, page in self.routes.items():
+            if re.fullmatch(route, self.path):
+                body = self.pages[page].encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+        self.send_error(404)
+
+    def do_POST(self) -> None:
+        self._count()
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(303)
+        self.send_header("Location", "/dsa24k/result/0000/")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+@contextlib.contextmanager
+def stub_site(list_tasks: int = LIST_TASKS) -> Iterator[str]:
+    StubCses.pages = {"list": large_task_list(list_tasks)}
+    for name in StubCses.routes.values():
+        if name != "list":
+            StubCses.pages[name] = read_page(name)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubCses)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def run_cli(args: list[str]) -> None:
+    with mock.patch.object(sys, "argv", ["tyora"] + args):
+        with contextlib.redirect_stdout(io.StringIO()):
+            tyora.main()
+
+
+def bench_commands(iterations: int, list_tasks: int = LIST_TASKS) -> list[Measurement]:
+    measurements: list[Measurement] = list()
+    with stub_site(list_tasks) as site_url, tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        config = tmp_path / "config.json"
+        config.write_text(json.dumps({"username": "user", "password": "secret"}))
+        solution = tmp_path / "candies.py"
+        solution.write_text("print(1)\n")
+        state_dir = tmp_path / "state"
+        base_args = ["--config", str(config)]
+
+        def cold(args: list[str]) -> Callable[[], None]:
+            return lambda: run_cli(base_args + ["--no-state"] + args)
+
+        def warm(args: list[str]) -> Callable[[], None]:
+            return lambda: run_cli(base_args + args)
+
+        cases = {
+            "tyora list (no state)": cold(["list"]),
+            "tyora list (cached)": warm(["list"]),
+            "tyora show 3055 (no state)": cold(["show", "3055"]),
+            "tyora show --all (no state)": cold(["show", "--all"]),
+            "tyora show --all (cached)": warm(["show", "--all"]),
+            "tyora submit (no state)": cold(
+                ["submit", "--filename", str(solution), "3055"]
+            ),
+        }
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(mock.patch.object(tyora, "SITE_URL", site_url))
+            stack.enter_context(mock.patch.object(tyora, "STATE_DIR", state_dir))
+            stack.enter_context(mock.patch.object(client, "POLL_INTERVAL", 0.0))
+            # The stub isn't the real site, measure without the politeness limit
+            stack.enter_context(mock.patch.object(transport, "HTTP_RATE_LIMIT", 0.0))
+            for name, func in cases.items():
+                # Fill the caches the warm runs rely on
+                func()
+                measurements.append(measure(name, func, iterations, StubCses))
+    return measurements
+
+
+def print_report(measurements: list[Measurement]) -> None:
+    print(f"{'benchmark':<42} {'median ms':>10} {'peak KiB':>10} {'requests':>9}")
+    for m in measurements:
+        requests = "" if m.requests is None else str(m.requests)
+        print(f"{m.name:<42} {m.median_ms:>10.2f} {m.peak_kib:>10.1f} {requests:>9}")
+
+
+def main(args: Optional[list[str]] = None) -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--iterations", type=int, default=20)
+    arg_parser.add_argument(
+        "--tasks", type=int, default=LIST_TASKS, help="Amount of tasks in the course"
+    )
+    arg_parser.add_argument(
+        "--only", choices=["parsers", "commands"], help="Run only one group"
+    )
+    arg_parser.add_argument("--json", help="Also write the results to this file")
+    parsed_args = arg_parser.parse_args(args)
+
+    measurements: list[Measurement] = list()
+    if parsed_args.only != "commands":
+        measurements += bench_parsers(parsed_args.iterations, parsed_args.tasks)
+    if parsed_args.only != "parsers":
+        measurements += bench_commands(parsed_args.iterations, parsed_args.tasks)
+
+    print_report(measurements)
+    if parsed_args.json:
+        with open(parsed_args.json, "w") as f:
+            json.dump([m.__dict__ for m in measurements], f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
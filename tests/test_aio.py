@@ -0,0 +1,109 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+import requests_mock
+
+from tyora.aio import AsyncClient, AsyncSession
+from tyora.client import TaskState
+from tyora.history import Submission, SubmissionHistory
+from tyora.session import MoocfiCsesSession as Session
+
+
+def test_async_client_get_task_list() -> None:
+    client = AsyncClient(AsyncSession(Session(base_url="https://example.com")))
+
+    with requests_mock.Mocker() as m:
+        m.get(
+            "https://example.com/list",
+            text=open("tests/test_data/session_logged_in_some_tasks_done.html").read(),
+        )
+        task_list = asyncio.run(client.get_task_list())
+    assert len(task_list) == 4
+    assert task_list[3].state == TaskState.INCOMPLETE
+
+
+def test_async_client_get_tasks() -> None:
+    client = AsyncClient(AsyncSession(Session(base_url="https://example.com")))
+
+    with requests_mock.Mocker() as m:
+        m.get(
+            "https://example.com/task/3055",
+            text=open("tests/test_data/task_3055_complete.html").read(),
+        )
+        m.get(
+            "https://example.com/task/3052",
+            text=open(
+                "tests/test_data/task_3052_incomplete_no_submit_link.html"
+            ).read(),
+        )
+        tasks = asyncio.run(client.get_tasks(["3055", "3052"]))
+    assert [task.id for task in tasks] == ["3055", "3052"]
+
+
+def test_async_client_wait_for_result(monkeypatch: pytest.MonkeyPatch) -> None:
+    client = AsyncClient(AsyncSession(Session(base_url="https://example.com")))
+    sleeps: list[float] = []
+
+    async def sleep(delay: float) -> None:
+        sleeps.append(delay)
+
+    monkeypatch.setattr("tyora.aio.asyncio.sleep", sleep)
+
+    async def states() -> list[str]:
+        return [
+            state.status
+            async for state in client.wait_for_result(
+                "https://example.com/result/0000/"
+            )
+        ]
+
+    with requests_mock.Mocker() as m:
+        m.get(
+            "https://example.com/result/0000/",
+            [
+                {"text": open("tests/test_data/result_3055_pending.html").read()},
+                {"text": open("tests/test_data/result_3055_accepted.html").read()},
+            ],
+        )
+        assert asyncio.run(states()) == ["pending", "ready"]
+    # The wait between polls is on the event loop, not in the executor
+    assert len(sleeps) == 2 and sleeps[0] == 0.0 < sleeps[1]
+
+
+def test_async_client_records_results(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    history = SubmissionHistory(tmp_path / "history.db")
+    session = Session(base_url="https://example.com")
+    client = AsyncClient(AsyncSession(session), history=history)
+    url = "https://example.com/result/0000/"
+    history.record(
+        Submission(
+            course="https://example.com",
+            task_id="3055",
+            filename="candies.py",
+            file_hash="hash",
+            submitted_at=0.0,
+            result_url=url,
+        )
+    )
+
+    async def sleep(delay: float) -> None:
+        pass
+
+    monkeypatch.setattr("tyora.aio.asyncio.sleep", sleep)
+
+    async def results(cancelled: bool = False) -> list[str]:
+        return [
+            state.result
+            async for state in client.wait_for_result(url, cancelled=lambda: cancelled)
+        ]
+
+    with requests_mock.Mocker() as m:
+        m.get(url, text=open("tests/test_data/result_3055_accepted.html").read())
+        assert asyncio.run(results(cancelled=True)) == []
+        assert m.call_count == 0
+        assert asyncio.run(results()) == ["accepted"]
+    assert history.for_task("https://example.com", "3055")[0].result == "accepted"
+    history.close()
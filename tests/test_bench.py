@@ -0,0 +1,65 @@
+from pathlib import Path
+
+import pytest
+
+from tyora.bench import complexity_class, fit_exponent, generate_input, run_bench
+from tyora.client import parse_task
+from tyora.runner import Sample
+
+
+def test_fit_exponent() -> None:
+    sizes = [10, 100, 1000]
+    assert fit_exponent(sizes, [2 * n**2 for n in sizes]) == pytest.approx(2)
+    assert fit_exponent(sizes, [0.5 * n for n in sizes]) == pytest.approx(1)
+    assert fit_exponent([10], [1.0]) is None
+    assert fit_exponent([10, 100], [1.0, 0.0]) is None
+    assert complexity_class(1.1) == "O(n) or O(n log n)"
+    assert complexity_class(4.0) == "O(n^4.0)"
+
+
+def test_generate_input() -> None:
+    assert generate_input("python -c 'print(*range({n}))'", 3) == "0 1 2\n"
+
+
+def test_run_bench(tmp_path: Path) -> None:
+    solution = tmp_path / "pairs.py"
+    solution.write_text(
+        "def pairs(n):\n"
+        "    return sum(1 for i in range(n) for j in range(n) if i < j)\n"
+    )
+    samples = [
+        (n, Sample(f"n={n}", "", expression=f"pairs({n})")) for n in (800, 1600, 3200)
+    ]
+    report = run_bench(str(solution), samples)
+    assert [point.size for point in report.points] == [800, 1600, 3200]
+    assert all(point.ok for point in report.points)
+    assert report.time_exponent is not None
+    # Quadratic, with room for a noisy machine. The sizes are large enough for
+    # the time of starting Python to be noise next to the work itself.
+    assert 1.5 < report.time_exponent < 2.7
+    predicted = report.predict_time(4800)
+    assert predicted is not None and predicted > report.points[-1].time
+
+
+def test_run_bench_stops_at_timeout(tmp_path: Path) -> None:
+    solution = tmp_path / "slow.py"
+    solution.write_text("import time\nn = int(input())\ntime.sleep(n / 10)\n")
+    samples = [(n, Sample(f"n={n}", "", stdin=f"{n}\n")) for n in (1, 10, 20)]
+    report = run_bench(str(solution), samples, timeout=0.5)
+    assert [point.result.verdict for point in report.points] == ["PASS", "TIMEOUT"]
+    assert report.time_exponent is None
+
+
+def test_parse_limits() -> None:
+    task = parse_task(
+        '<div class="nav sidebar"><a class="current" href="/task/1068">'
+        "Weird Algorithm</a></div>"
+        '<ul class="task-constraints"><li><b>Time limit:</b> 1.00 s</li>'
+        "<li><b>Memory limit:</b> 512 MB</li></ul>"
+        '<div class="md"><p>Print the values.</p></div>'
+    )
+    assert (task.time_limit, task.memory_limit) == (1.0, 512)
+    assert task.to_dict()["time_limit"] == 1.0
+    no_limits = parse_task(open("tests/test_data/task_3055_complete.html").read())
+    assert (no_limits.time_limit, no_limits.memory_limit) == (None, None)
+    assert "time_limit" not in no_limits.to_dict()
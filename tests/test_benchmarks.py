@@ -0,0 +1,26 @@
+from benchmarks import bench
+
+
+def test_large_task_list() -> None:
+    from tyora.client import parse_task_list
+
+    assert len(parse_task_list(bench.large_task_list(25))) == 25
+
+
+def test_bench_parsers_smoke() -> None:
+    measurements = bench.bench_parsers(iterations=1, list_tasks=5)
+    assert {m.name.split()[0] for m in measurements} == {
+        "parse_task_list",
+        "parse_task",
+        "parse_form",
+        "find_link",
+        "parse_submit_result",
+    }
+
+
+def test_bench_commands_request_counts() -> None:
+    measurements = {m.name: m for m in bench.bench_commands(iterations=1, list_tasks=5)}
+    assert measurements["tyora list (no state)"].requests == 1
+    assert measurements["tyora list (cached)"].requests == 0
+    assert measurements["tyora show --all (no state)"].requests == 6
+    assert measurements["tyora show --all (cached)"].requests == 0
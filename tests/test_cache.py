@@ -0,0 +1,190 @@
+import os
+import time
+from pathlib import Path
+
+import pytest
+import requests_mock
+
+from tyora.cache import CacheEntry, ResponseCache, page_ttl
+from tyora.client import Client, TaskState
+from tyora.session import MoocfiCsesSession as Session
+
+
+@pytest.fixture
+def cache(tmp_path: Path) -> ResponseCache:
+    return ResponseCache(tmp_path / "cache")
+
+
+@pytest.fixture
+def client(cache: ResponseCache) -> Client:
+    return Client(session=Session(base_url="https://example.com/"), cache=cache)
+
+
+def test_page_ttl() -> None:
+    assert page_ttl("https://example.com/dsa24k/list") < page_ttl(
+        "https://example.com/dsa24k/task/3055"
+    )
+    assert page_ttl("https://example.com/dsa24k/result/1234/") == 0
+
+
+def test_cache_roundtrip(cache: ResponseCache) -> None:
+    entry = CacheEntry(url="https://example.com/list", body="<html/>", etag='"abc"')
+    cache.set(entry)
+    assert cache.get("https://example.com/list") == entry
+    assert cache.get("https://example.com/other") is None
+    cache.delete("https://example.com/list")
+    assert cache.get("https://example.com/list") is None
+
+
+def test_cache_evicts_least_recently_used(tmp_path: Path) -> None:
+    cache = ResponseCache(tmp_path / "cache")
+    for i in range(3):
+        cache.set(CacheEntry(url=f"https://example.com/task/{i}", body="x" * 50))
+        path = cache._path(f"https://example.com/task/{i}")
+        os.utime(path, (time.time() - 10 + i, time.time() - 10 + i))
+    # Room for exactly three entries
+    cache.max_size = 3 * cache._path("https://example.com/task/0").stat().st_size
+    # Reading the oldest entry makes it the most recently used one
+    assert cache.get("https://example.com/task/0") is not None
+    cache.set(CacheEntry(url="https://example.com/task/3", body="x" * 50))
+    assert cache.get("https://example.com/task/0") is not None
+    assert cache.get("https://example.com/task/1") is None
+
+
+def test_cache_scans_only_when_full(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    cache = ResponseCache(tmp_path / "cache", max_size=10_000)
+    scans = 0
+    scan = cache._scan
+
+    def counting_scan() -> list[tuple[float, int, Path]]:
+        nonlocal scans
+        scans += 1
+        return scan()
+
+    monkeypatch.setattr(cache, "_scan", counting_scan)
+    for i in range(20):
+        cache.set(CacheEntry(url=f"https://example.com/task/{i}", body="x" * 50))
+    # Only to learn the size of what's already on disk
+    assert scans == 1
+    cache.delete("https://example.com/task/0")
+    assert cache._size == sum(size for _, size, _ in scan())
+
+    for i in range(20, 100):
+        cache.set(CacheEntry(url=f"https://example.com/task/{i}", body="x" * 50))
+    assert scans > 1
+    assert sum(size for _, size, _ in scan()) <= cache.max_size
+
+
+def test_cache_memory_follows_other_processes(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    url = "https://example.com/task/3055"
+    daemon = ResponseCache(tmp_path / "cache", memory_entries=8)
+    other = ResponseCache(tmp_path / "cache")
+    daemon.set(CacheEntry(url=url, body="incomplete"))
+
+    def fail(f: object) -> None:
+        raise AssertionError("read the file of an unchanged entry")
+
+    with monkeypatch.context() as m:
+        m.setattr("tyora.cache.json.load", fail)
+        entry = daemon.get(url)
+    assert entry is not None and entry.body == "incomplete"
+
+    # A submission in another process invalidates the task
+    other.delete(url)
+    assert daemon.get(url) is None
+    other.set(CacheEntry(url=url, body="complete"))
+    entry = daemon.get(url)
+    assert entry is not None and entry.body == "complete"
+
+
+def test_client_uses_fresh_cache(client: Client) -> None:
+    with requests_mock.Mocker() as m:
+        m.get(
+            "https://example.com/task/3055",
+            text=open("tests/test_data/task_3055_complete.html").read(),
+        )
+        first = client.get_task("3055")
+        second = client.get_task("3055")
+        assert m.call_count == 1
+    assert first == second
+    assert second.state == TaskState.COMPLETE
+
+
+def test_client_revalidates_stale_cache(client: Client, cache: ResponseCache) -> None:
+    url = "https://example.com/list"
+    with requests_mock.Mocker() as m:
+        m.get(
+            url,
+            text=open("tests/test_data/session_logged_in_some_tasks_done.html").read(),
+            headers={"ETag": '"v1"'},
+        )
+        client.get_task_list()
+    entry = cache.get(url)
+    assert entry is not None
+    entry.fetched_at = 0.0
+    cache.set(entry)
+
+    with requests_mock.Mocker() as m:
+        m.get(url, status_code=304)
+        task_list = client.get_task_list()
+        assert m.last_request.headers["If-None-Match"] == '"v1"'
+    assert len(task_list) == 4
+    assert task_list[3].state == TaskState.INCOMPLETE
+
+
+def test_client_revalidates_stale_cache_after_relogin(
+    cache: ResponseCache,
+) -> None:
+    url = "https://example.com/list"
+    logged_in = open("tests/test_data/session_logged_in_some_tasks_done.html").read()
+    cache.set(CacheEntry(url=url, body=logged_in, etag='"v1"', fetched_at=0.0))
+    session = Session(
+        base_url="https://example.com/", username="user", password="secret"
+    )
+    client = Client(session=session, cache=cache)
+
+    def list_page(request, context) -> str:
+        if m.call_count == 1:
+            return open("tests/test_data/session_logged_out.html").read()
+        # Logged in again, the page is the one the cache has
+        if "If-None-Match" in request.headers:
+            context.status_code = 304
+            return ""
+        return logged_in
+
+    with requests_mock.Mocker() as m:
+        m.get(url, text=list_page)
+        m.get(
+            "https://example.com/login/oauth-redirect?site=mooc.fi",
+            text=open("tests/test_data/tmcmoocfi-oauth-redirect.html").read(),
+        )
+        m.post("https://example.com/sessions", text="")
+        task_list = client.get_task_list()
+    assert len(task_list) == 4
+    assert session.login_is_cached
+
+
+def test_client_skips_parsing_unchanged_body(
+    client: Client, cache: ResponseCache, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    url = "https://example.com/list"
+    body = open("tests/test_data/session_logged_in_some_tasks_done.html").read()
+    with requests_mock.Mocker() as m:
+        m.get(url, text=body)
+        client.get_task_list()
+    entry = cache.get(url)
+    assert entry is not None
+    entry.fetched_at = 0.0
+    cache.set(entry)
+
+    def fail(html: str) -> None:
+        raise AssertionError("unchanged page parsed again")
+
+    monkeypatch.setattr("tyora.client.parse_task_list", fail)
+    with requests_mock.Mocker() as m:
+        m.get(url, text=body)
+        assert len(client.get_task_list()) == 4
@@ -1,7 +1,22 @@
+import re
+import time
+
 import pytest
 import requests_mock
 
-from tyora.client import Client, TaskState
+from tyora.cache import ResponseCache
+from tyora.client import (
+    Client,
+    JudgedTest,
+    SubmitResult,
+    Task,
+    TaskState,
+    diff_task_lists,
+    iter_task_list,
+    parse_submit_result,
+    parse_task,
+)
+from tyora.history import SubmissionHistory
 from tyora.session import MoocfiCsesSession as Session
 
 test_cookies = {"cookie_a": "value_a", "cookie_b": "value_b"}
@@ -45,6 +60,25 @@ def test_client_get_task_list(mock_session: Session) -> None:
     assert task_list[3].state == TaskState.INCOMPLETE
 
 
+def test_client_get_task_list_filtered(mock_session: Session, tmp_path) -> None:
+    html = open("tests/test_data/session_logged_in_some_tasks_done.html").read()
+    for cache in (None, ResponseCache(tmp_path)):
+        client = Client(session=mock_session, cache=cache)
+        with requests_mock.Mocker() as m:
+            m.get("https://example.com/list", text=html)
+            complete = client.get_task_list(state=TaskState.COMPLETE, limit=2)
+            incomplete = client.get_task_list(state=TaskState.INCOMPLETE)
+        assert [task.id for task in complete] == ["3055", "3049"]
+        assert [task.id for task in incomplete] == ["2643"]
+
+
+def test_iter_task_list_is_lazy() -> None:
+    html = open("tests/test_data/session_logged_in_some_tasks_done.html").read()
+    tasks = iter_task_list(html)
+    assert next(tasks).id == "3055"
+    assert [task.id for task in iter_task_list(html, TaskState.INCOMPLETE)] == ["2643"]
+
+
 def test_client_get_task_complete(mock_session: Session) -> None:
     client = Client(session=mock_session)
 
@@ -105,3 +139,346 @@ def test_client_submit_task(mock_session: Session) -> None:
             "3055", "print('Hello, World!')\n", filename="test.py"
         )
     assert result == "https://example.com/course/send.php"
+
+
+def test_client_resubmit_posts_remembered_form(mock_session: Session, tmp_path) -> None:
+    client = Client(session=mock_session, cache=ResponseCache(tmp_path))
+    accepted = {
+        "status_code": 303,
+        "headers": {"location": "https://example.com/result/0000/"},
+    }
+
+    with requests_mock.Mocker() as m:
+        m.get(
+            "https://example.com/dsa24k/submit/3055/",
+            text=open("tests/test_data/submit_3055_form.html").read(),
+        )
+        post = m.post(
+            "https://example.com/course/send.php",
+            [accepted, accepted, {"status_code": 403}, accepted],
+        )
+        m.get(
+            "https://example.com/result/0000/",
+            text=open("tests/test_data/result_3055_accepted.html").read(),
+        )
+        m.get(
+            "https://example.com/task/3055",
+            text=open("tests/test_data/task_3055_complete.html").read(),
+        )
+        client.submit_task("3055", "print(1)\n", filename=None)
+        assert m.call_count == 4
+
+        # A new client, like the next run of tyora, finds the form in the cache
+        # and the result page it's redirected to means the site took it
+        client = Client(session=mock_session, cache=ResponseCache(tmp_path))
+        result_url = client.submit_task("3055", "print(2)\n", filename=None)
+        assert result_url == "https://example.com/result/0000/"
+        methods = [r.method for r in m.request_history[4:]]
+        assert methods == ["POST", "GET"]
+        assert b"csrftokenstuffhererandomrandombleep" in post.last_request.body
+        assert b'filename="candies.py"' in post.last_request.body
+
+        # A rejected form is fetched again, with the task page the submission
+        # invalidated, and the solution posted once more
+        client.submit_task("3055", "print(3)\n", filename=None)
+        methods = [r.method for r in m.request_history[6:]]
+        assert methods == ["POST", "GET", "GET", "POST", "GET"]
+
+
+def test_client_skips_identical_resubmission(mock_session: Session, tmp_path) -> None:
+    history = SubmissionHistory(tmp_path / "history.db")
+    client = Client(session=mock_session, history=history)
+
+    with requests_mock.Mocker() as m:
+        m.get(
+            "https://example.com/dsa24k/submit/3055/",
+            text=open("tests/test_data/submit_3055_form.html").read(),
+        )
+        m.post(
+            "https://example.com/course/send.php",
+            status_code=303,
+            headers={"location": "https://example.com/result/0000/"},
+        )
+        m.get(
+            "https://example.com/result/0000/",
+            text=open("tests/test_data/result_3055_accepted.html").read(),
+        )
+        m.get(
+            "https://example.com/task/3055",
+            text=open("tests/test_data/task_3055_complete.html").read(),
+        )
+        result_url = client.submit_task("3055", "print(1)\n", filename=None)
+        assert result_url == "https://example.com/result/0000/"
+        list(client.wait_for_result(result_url))
+        calls = m.call_count
+
+        # The judge isn't asked to test the very same solution again
+        assert client.submit_task("3055", "print(1)\n", filename=None) == result_url
+        assert m.call_count == calls
+        client.submit_task("3055", "print(1)\n", filename=None, force=True)
+        assert m.call_count > calls
+
+    passing = history.last_passing(mock_session.base_url, "3055")
+    assert passing is not None
+    assert (passing.filename, passing.code) == ("candies.py", "print(1)\n")
+    assert len(history.for_task(mock_session.base_url, "3055")) == 2
+    history.close()
+
+
+def test_client_get_tasks(mock_session: Session) -> None:
+    client = Client(session=mock_session)
+
+    with requests_mock.Mocker() as m:
+        m.get(
+            "https://example.com/task/3055",
+            text=open("tests/test_data/task_3055_complete.html").read(),
+        )
+        m.get(
+            "https://example.com/task/3052",
+            text=open(
+                "tests/test_data/task_3052_incomplete_no_submit_link.html"
+            ).read(),
+        )
+        tasks = list(client.get_tasks(["3055", "3052"], max_workers=2))
+        assert m.call_count == 2
+    assert sorted(task.id for task in tasks) == ["3052", "3055"]
+
+
+def test_client_get_tasks_ordered(mock_session: Session) -> None:
+    client = Client(session=mock_session)
+
+    def slow_page(request, context) -> str:
+        time.sleep(0.05)
+        return open("tests/test_data/task_3055_complete.html").read()
+
+    with requests_mock.Mocker() as m:
+        m.get("https://example.com/task/3055", text=slow_page)
+        m.get(
+            "https://example.com/task/3052",
+            text=open(
+                "tests/test_data/task_3052_incomplete_no_submit_link.html"
+            ).read(),
+        )
+        tasks = client.get_tasks(["3055", "3052"], max_workers=2, ordered=True)
+        assert [task.id for task in tasks] == ["3055", "3052"]
+
+
+def test_parse_submit_result() -> None:
+    failed = parse_submit_result(open("tests/test_data/result_3055_failed.html").read())
+    assert (failed.status, failed.result) == ("ready", "time limit exceeded")
+    assert failed.tests == [
+        JudgedTest(1, "accepted", 0.02),
+        JudgedTest(2, "wrong answer", 0.03),
+        JudgedTest(3, "time limit exceeded"),
+        JudgedTest(4, "accepted", 0.61),
+    ]
+    # The test that ran out of time is the slowest, with no headroom left
+    assert failed.slowest == failed.tests[2]
+    assert failed.headroom(1.0) is None
+
+    accepted = parse_submit_result(
+        open("tests/test_data/result_3055_accepted.html").read()
+    )
+    assert accepted.slowest == JudgedTest(4, "accepted", 0.05)
+    assert accepted.headroom(1.0) == pytest.approx(0.95)
+    assert accepted.headroom(None) is None
+    data = accepted.to_dict(time_limit=1.0)
+    assert (data["slowest"], data["tests"][0]["verdict"]) == (4, "accepted")
+
+    assert parse_submit_result(
+        open("tests/test_data/result_3055_testing.html").read()
+    ) == SubmitResult(status="testing", result="")
+
+
+def test_parse_test_report_memory() -> None:
+    result = parse_submit_result(
+        "<table><tr><td>Status:</td><td><span>READY</span></td></tr></table>"
+        "<table><tr><th>test</th><th>verdict</th><th>time</th><th>memory</th></tr>"
+        "<tr><td>#1</td><td>ACCEPTED</td><td>120 ms</td><td>12.5 MB</td></tr></table>"
+    )
+    assert result.tests == [JudgedTest(1, "accepted", 0.12, 12800)]
+
+
+def test_client_wait_for_result(
+    mock_session: Session, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    client = Client(session=mock_session)
+    sleeps: list[float] = []
+    monkeypatch.setattr("tyora.client.time.sleep", sleeps.append)
+
+    with requests_mock.Mocker() as m:
+        m.get(
+            "https://example.com/result/0000/",
+            [
+                {"text": open("tests/test_data/result_3055_pending.html").read()},
+                {"text": open("tests/test_data/result_3055_testing.html").read()},
+                {"text": open("tests/test_data/result_3055_testing.html").read()},
+                {"text": open("tests/test_data/result_3055_accepted.html").read()},
+            ],
+        )
+        states = list(client.wait_for_result("https://example.com/result/0000/"))
+        assert m.call_count == 4
+    assert [state.status for state in states] == ["pending", "testing", "ready"]
+    assert states[-1].result == "accepted"
+    assert len(states[-1].tests) == 4
+    assert len(sleeps) == 3
+    assert sleeps[0] <= sleeps[2]
+
+
+def test_client_wait_for_result_timeout(mock_session: Session) -> None:
+    client = Client(session=mock_session)
+
+    with requests_mock.Mocker() as m:
+        m.get(
+            "https://example.com/result/0000/",
+            text=open("tests/test_data/result_3055_testing.html").read(),
+        )
+        with pytest.raises(TimeoutError):
+            list(client.wait_for_result("https://example.com/result/0000/", timeout=0))
+
+
+def test_client_match_submit_files(mock_session: Session) -> None:
+    client = Client(session=mock_session)
+
+    with requests_mock.Mocker() as m:
+        m.get(
+            "https://example.com/list",
+            text=open("tests/test_data/session_logged_in_some_tasks_done.html").read(),
+        )
+        m.get(
+            re.compile("https://example.com/task/"),
+            text=open(
+                "tests/test_data/task_3052_incomplete_no_submit_link.html"
+            ).read(),
+        )
+        m.get(
+            "https://example.com/task/3055",
+            text=open("tests/test_data/task_3055_complete.html").read(),
+        )
+        matches = client.match_submit_files(["candies.py", "notes.txt"])
+    assert matches == {"3055": "candies.py"}
+
+
+def test_client_submit_tasks_and_wait(
+    mock_session: Session, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    client = Client(session=mock_session)
+    monkeypatch.setattr("tyora.client.time.sleep", lambda _: None)
+
+    with requests_mock.Mocker() as m:
+        m.get(
+            "https://example.com/task/3055",
+            text=open("tests/test_data/task_3055_complete.html").read(),
+        )
+        m.get(
+            "https://example.com/task/3052",
+            text=open(
+                "tests/test_data/task_3052_incomplete_no_submit_link.html"
+            ).read(),
+        )
+        m.get(
+            "https://example.com/dsa24k/submit/3055/",
+            text=open("tests/test_data/submit_3055_form.html").read(),
+        )
+        m.post("https://example.com/course/send.php")
+        m.get(
+            "https://example.com/course/send.php",
+            [
+                {"text": open("tests/test_data/result_3055_testing.html").read()},
+                {"text": open("tests/test_data/result_3055_accepted.html").read()},
+            ],
+        )
+        result_urls = dict(
+            client.submit_tasks(
+                {
+                    "3055": ("candies.py", "print(1)\n"),
+                    "3052": ("efficiency.py", "print(2)\n"),
+                }
+            )
+        )
+        assert result_urls == {
+            "3055": "https://example.com/course/send.php",
+            "3052": None,
+        }
+        submitted = {key: url for key, url in result_urls.items() if url}
+        results = dict(client.wait_for_results(submitted))
+    assert results["3055"].result == "accepted"
+
+
+def test_client_wait_for_results_keeps_polling_after_error(
+    mock_session: Session, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    client = Client(session=mock_session)
+    monkeypatch.setattr("tyora.client.time.sleep", lambda _: None)
+
+    with requests_mock.Mocker() as m:
+        m.get("https://example.com/result/0001/", status_code=500)
+        m.get(
+            "https://example.com/result/0002/",
+            [
+                {"text": open("tests/test_data/result_3055_testing.html").read()},
+                {"text": open("tests/test_data/result_3055_accepted.html").read()},
+            ],
+        )
+        errors: dict[str, Exception] = dict()
+        results = dict(
+            client.wait_for_results(
+                {
+                    "3052": "https://example.com/result/0001/",
+                    "3055": "https://example.com/result/0002/",
+                },
+                errors=errors,
+            )
+        )
+    assert list(errors) == ["3052"]
+    assert results["3055"].result == "accepted"
+
+
+def test_diff_task_lists() -> None:
+    old = [
+        Task(id="1", name="Candies", state=TaskState.INCOMPLETE),
+        Task(id="2", name="Repeat", state=TaskState.INCOMPLETE),
+        Task(id="3", name="Same bits", state=TaskState.COMPLETE),
+    ]
+    new = [
+        Task(id="1", name="Candies", state=TaskState.COMPLETE),
+        Task(id="2", name="Repeater", state=TaskState.INCOMPLETE),
+        Task(id="3", name="Same bits", state=TaskState.COMPLETE),
+        Task(id="4", name="Inversions", state=TaskState.INCOMPLETE),
+    ]
+    changes = diff_task_lists(old, new)
+    assert [(task.id, previous) for task, previous in changes] == [
+        ("1", old[0]),
+        ("2", old[1]),
+        ("4", None),
+    ]
+    assert diff_task_lists(new, new) == []
+
+
+def test_task_description_is_rendered_lazily() -> None:
+    task = parse_task(open("tests/test_data/task_3055_complete.html").read())
+    assert not hasattr(task, "__dict__")
+    assert task.submit_file == "candies.py"
+    assert task._description is None
+
+    assert task.description is not None
+    assert task.description.startswith("A gummy candy costs a euros")
+    restored = Task.from_dict(task.to_dict())
+    assert restored.description_html == task.description_html
+    assert restored == task
+
+
+def test_client_get_task_caches_rendered_description(
+    mock_session: Session, tmp_path
+) -> None:
+    client = Client(session=mock_session, cache=ResponseCache(tmp_path))
+    with requests_mock.Mocker() as m:
+        m.get(
+            "https://example.com/task/3055",
+            text=open("tests/test_data/task_3055_complete.html").read(),
+        )
+        task = client.get_task("3055", describe=True)
+
+    cached = Client(session=mock_session, cache=ResponseCache(tmp_path))
+    cached_task = cached.get_task("3055")
+    assert cached_task._description == task.description
@@ -0,0 +1,107 @@
+import json
+import threading
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+import requests_mock
+
+from tyora import tyora
+from tyora.daemon import DaemonServer, forward
+
+
+@pytest.fixture
+def state_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    state_dir = tmp_path / "state"
+    monkeypatch.setattr(tyora, "STATE_DIR", state_dir)
+    monkeypatch.setattr(tyora, "SITE_URL", "https://example.com/")
+    return state_dir
+
+
+@pytest.fixture
+def daemon(tmp_path: Path, state_dir: Path) -> Iterator[str]:
+    socket_path = str(tmp_path / "t.sock")
+    server = DaemonServer(socket_path)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield socket_path
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def config(tmp_path: Path) -> str:
+    config = tmp_path / "config.json"
+    config.write_text(json.dumps({"username": "user", "password": "secret"}))
+    return str(config)
+
+
+def test_forward_without_daemon(tmp_path: Path) -> None:
+    assert forward(str(tmp_path / "missing.sock"), ["list"]) is None
+
+
+def test_forward_runs_command_in_daemon(
+    daemon: str, config: str, capsys: pytest.CaptureFixture[str]
+) -> None:
+    with requests_mock.Mocker() as m:
+        m.get(
+            "https://example.com/dsa24k/list",
+            text=open("tests/test_data/session_logged_in_some_tasks_done.html").read(),
+        )
+        assert forward(daemon, ["--config", config, "list", "--limit", "2"]) == 0
+        assert forward(daemon, ["--config", config, "list", "--limit", "2"]) == 0
+        # The second list was served from the daemon's cache
+        assert m.call_count == 1
+    assert (
+        capsys.readouterr().out.splitlines()
+        == [
+            "- 3055: Candies ✅",
+            "- 3049: Inversions ✅",
+        ]
+        * 2
+    )
+
+
+def test_forward_reports_errors(
+    daemon: str, config: str, capsys: pytest.CaptureFixture[str]
+) -> None:
+    assert forward(daemon, ["--config", config, "show"]) == 1
+    assert "task ids" in capsys.readouterr().err
+
+
+def test_daemon_runs_no_submissions(
+    daemon: str, config: str, capsys: pytest.CaptureFixture[str]
+) -> None:
+    assert forward(daemon, ["--config", config, "submit", "3055"]) == 1
+    assert "doesn't run submit" in capsys.readouterr().err
+
+
+def test_daemon_logs_in_again_after_password_change(
+    tmp_path: Path, state_dir: Path, config: str
+) -> None:
+    server = DaemonServer(str(tmp_path / "t.sock"))
+    try:
+        server.run(["--config", config, "show"], str(tmp_path))
+        server.run(["--config", config, "show"], str(tmp_path))
+        assert len(server.clients) == 1
+        Path(config).write_text(json.dumps({"username": "user", "password": "new"}))
+        server.run(["--config", config, "show"], str(tmp_path))
+        assert len(server.clients) == 2
+    finally:
+        server.server_close()
+
+
+def test_daemon_uses_account_given_as_args(
+    tmp_path: Path, state_dir: Path, config: str
+) -> None:
+    server = DaemonServer(str(tmp_path / "t.sock"))
+    try:
+        server.run(["--config", config, "show"], str(tmp_path))
+        server.run(["-u", "bob", "-p", "x", "--config", config, "show"], str(tmp_path))
+        assert len(server.clients) == 2
+        usernames = {
+            client.session.kwargs["username"] for client in server.clients.values()
+        }
+        assert usernames == {"user", "bob"}
+    finally:
+        server.server_close()
@@ -0,0 +1,72 @@
+from pathlib import Path
+
+from tyora.client import JudgedTest, SubmitResult
+from tyora.history import Submission, SubmissionHistory
+
+
+def submission(task_id: str, file_hash: str, submitted_at: float) -> Submission:
+    return Submission(
+        course="https://example.com/dsa24k/",
+        task_id=task_id,
+        filename="candies.py",
+        file_hash=file_hash,
+        submitted_at=submitted_at,
+        result_url=f"https://example.com/result/{file_hash}{submitted_at:.0f}/",
+        code=f"# {file_hash}\n",
+    )
+
+
+def test_submission_history(tmp_path: Path) -> None:
+    course = "https://example.com/dsa24k/"
+    history = SubmissionHistory(tmp_path / "history.db")
+    for i, (task_id, file_hash) in enumerate(
+        [("3055", "a"), ("3055", "b"), ("3049", "a"), ("3055", "c")]
+    ):
+        history.record(submission(task_id, file_hash, 1000.0 + i))
+    history.update_result(
+        "https://example.com/result/b1001/",
+        SubmitResult("ready", "accepted", [JudgedTest(1, "accepted", 0.5)]),
+    )
+    history.update_result(
+        "https://example.com/result/c1003/",
+        SubmitResult("ready", "wrong answer"),
+    )
+
+    assert [s.file_hash for s in history.for_task(course, "3055")] == ["c", "b", "a"]
+    assert len(history.for_task(course)) == 4
+    assert len(history.for_task(course, limit=1)) == 1
+    assert history.for_task("https://example.com/other/") == []
+
+    found = history.find(course, "3055", "a")
+    assert found is not None and found.result_url.endswith("/a1000/")
+    assert found.status == "submitted" and not found.passed
+    assert history.find(course, "3049", "b") is None
+
+    passing = history.last_passing(course, "3055")
+    assert passing is not None and passing.code == "# b\n"
+    assert passing.tests == [
+        {"number": 1, "verdict": "accepted", "time": 0.5, "memory_kib": None}
+    ]
+    assert history.last_passing(course, "3049") is None
+    history.close()
+
+    # Kept between runs
+    with_history = SubmissionHistory(tmp_path / "history.db")
+    assert len(with_history.for_task(course)) == 4
+    with_history.close()
+
+
+def test_queries_use_indexes(tmp_path: Path) -> None:
+    history = SubmissionHistory(tmp_path / "history.db")
+    for sql in (
+        "SELECT * FROM submissions WHERE course = 'x' AND task_id = 'y' "
+        "ORDER BY submitted_at DESC",
+        "SELECT * FROM submissions WHERE course = 'x' AND task_id = 'y' "
+        "AND file_hash = 'z' ORDER BY submitted_at DESC",
+        "UPDATE submissions SET status = '' WHERE result_url = 'u'",
+    ):
+        plan = " ".join(
+            row[-1] for row in history.db.execute(f"EXPLAIN QUERY PLAN {sql}")
+        )
+        assert "USING INDEX" in plan, plan
+    history.close()
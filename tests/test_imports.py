@@ -0,0 +1,88 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+from tyora.cache import CacheEntry, ResponseCache
+from tyora.client import parse_task_list
+
+# Modules that are only needed for network access or parsing pages
+NETWORK_MODULES = ("requests", "requests_toolbelt", "html5lib", "html2text", "lxml")
+# Modules the CLI module must not import up front
+HEAVY_MODULES = NETWORK_MODULES + ("platformdirs",)
+# Generous budget in microseconds for importing the CLI module, the point is to
+# catch a heavy import sneaking back in, not to benchmark the machine
+IMPORT_BUDGET_US = 200_000
+
+
+def importtime(code: str, env: Optional[dict[str, str]] = None) -> dict[str, int]:
+    """Run code in a fresh interpreter, returns cumulative import time per module"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, **(env or {})},
+    )
+    times: dict[str, int] = dict()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_cli_import_is_light() -> None:
+    times = importtime("import tyora.tyora")
+    assert not [module for module in HEAVY_MODULES if module in times]
+    assert times["tyora.tyora"] < IMPORT_BUDGET_US
+
+
+def test_cached_list_imports_no_network_modules(tmp_path: Path) -> None:
+    config = tmp_path / "config.json"
+    config.write_text(json.dumps({"username": "user", "password": "secret"}))
+    state_dir = tmp_path / "state" / "tyora"
+    body = open("tests/test_data/session_logged_in_some_tasks_done.html").read()
+    ResponseCache(state_dir / "cache").set(
+        CacheEntry(
+            url="https://cses.fi/dsa24k/list",
+            body=body,
+            data=[task.to_dict() for task in parse_task_list(body)],
+            fetched_at=time.time(),
+        )
+    )
+
+    code = (
+        "import sys; from tyora import tyora; "
+        f"sys.argv = ['tyora', '--config', {str(config)!r}, 'list']; tyora.main()"
+    )
+    times = importtime(code, env={"XDG_STATE_HOME": str(tmp_path / "state")})
+    assert not [module for module in NETWORK_MODULES if module in times]
+
+
+def test_cached_list_opens_no_index_or_history(tmp_path: Path) -> None:
+    config = tmp_path / "config.json"
+    config.write_text(json.dumps({"username": "user", "password": "secret"}))
+    state_dir = tmp_path / "state" / "tyora"
+    body = open("tests/test_data/session_logged_in_some_tasks_done.html").read()
+    ResponseCache(state_dir / "cache").set(
+        CacheEntry(
+            url="https://cses.fi/dsa24k/list",
+            body=body,
+            data=[task.to_dict() for task in parse_task_list(body)],
+            fetched_at=time.time(),
+        )
+    )
+    subprocess.run(
+        [sys.executable, "-m", "tyora", "--config", str(config), "list"],
+        check=True,
+        capture_output=True,
+        env={**os.environ, "XDG_STATE_HOME": str(tmp_path / "state")},
+    )
+    assert not (state_dir / "index.db").exists()
+    assert not (state_dir / "history.db").exists()
@@ -0,0 +1,63 @@
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+import requests_mock
+
+from tyora.client import Client, Task, TaskState
+from tyora.index import TaskIndex
+from tyora.session import MoocfiCsesSession as Session
+
+COURSE = "https://example.com/"
+
+
+@pytest.fixture(params=[True, False], ids=["fts5", "like"])
+def index(request: pytest.FixtureRequest, tmp_path: Path) -> Iterator[TaskIndex]:
+    index = TaskIndex(tmp_path / "index.db")
+    index.fts = index.fts and request.param
+    yield index
+    index.close()
+
+
+def make_task(task_id: str, name: str, description: str) -> Task:
+    return Task(
+        id=task_id, name=name, state=TaskState.INCOMPLETE, description=description
+    )
+
+
+def test_index_search(index: TaskIndex) -> None:
+    index.update(COURSE, make_task("1", "Range queries", "Build a segment tree."))
+    index.update(COURSE, make_task("2", "Candies", "Count the candies you can buy."))
+    index.update("https://other/", make_task("3", "Trees", "A segment tree again."))
+
+    results = index.search("segment tree", course=COURSE)
+    assert [result.id for result in results] == ["1"]
+    assert [result.id for result in index.search("CANDIES")] == ["2"]
+    assert index.search("segment candies") == []
+    assert index.search('"unbalanced') == []
+
+
+def test_index_update_is_incremental(index: TaskIndex) -> None:
+    task = make_task("1", "Range queries", "Build a segment tree.")
+    assert index.update(COURSE, task)
+    assert not index.update(COURSE, task)
+    task.description = "Build a Fenwick tree."
+    assert index.update(COURSE, task)
+    assert index.search("segment") == []
+    assert [result.id for result in index.search("fenwick")] == ["1"]
+
+
+def test_client_indexes_fetched_tasks(tmp_path: Path) -> None:
+    index = TaskIndex(tmp_path / "index.db")
+    client = Client(session=Session(base_url=COURSE), index=index)
+
+    with requests_mock.Mocker() as m:
+        m.get(
+            "https://example.com/task/3055",
+            text=open("tests/test_data/task_3055_complete.html").read(),
+        )
+        task = client.get_task("3055")
+    assert [result.name for result in index.search("gummy chocolate")] == ["Candies"]
+    # Indexing doesn't render the markdown of the description
+    assert task._description is None
+    index.close()
@@ -0,0 +1,67 @@
+import io
+import json
+
+import requests_mock
+
+from tyora import instrument
+from tyora.client import parse_task_list
+from tyora.instrument import Event, Recorder
+from tyora.session import MoocfiCsesSession as Session
+
+
+def test_recorder_collects_requests_and_parses() -> None:
+    session = Session(base_url="https://example.com/")
+    html = open("tests/test_data/session_logged_in_some_tasks_done.html").read()
+    with requests_mock.Mocker() as m, Recorder() as recorder:
+        m.get("https://example.com/list", text=html)
+        res = session.get_page("https://example.com/list")
+        parse_task_list(res.text)
+    assert recorder not in instrument.listeners
+
+    requests = [e for e in recorder.events if e.kind == "request"]
+    assert len(requests) == 1
+    assert requests[0].name == "GET https://example.com/list"
+    assert requests[0].status == 200
+    assert requests[0].bytes == len(html.encode())
+    assert requests[0].redirects == 0
+
+    parses = {e.name for e in recorder.events if e.kind == "parse"}
+    assert {"find_link", "parse_task_list"} <= parses
+
+
+def test_recorder_reports() -> None:
+    recorder = Recorder()
+    recorder(
+        Event(
+            kind="request",
+            name="GET /list",
+            start=0,
+            duration=0.25,
+            status=200,
+            bytes=10,
+        )
+    )
+    recorder(Event(kind="parse", name="parse_task", start=0, duration=0.002))
+    recorder(Event(kind="parse", name="parse_task", start=0, duration=0.004))
+
+    summary = io.StringIO()
+    recorder.print_summary(summary)
+    assert "GET /list" in summary.getvalue()
+    assert "parse_task" in summary.getvalue()
+    assert "1 requests, 250.0 ms, 10 bytes" in summary.getvalue()
+
+    trace = io.StringIO()
+    recorder.write_trace(trace)
+    events = json.loads(trace.getvalue())
+    assert [e["name"] for e in events] == ["GET /list", "parse_task", "parse_task"]
+
+
+def test_failing_listener_is_ignored() -> None:
+    def broken(event: Event) -> None:
+        raise RuntimeError("broken")
+
+    instrument.add_listener(broken)
+    try:
+        parse_task_list("<html></html>")
+    finally:
+        instrument.remove_listener(broken)
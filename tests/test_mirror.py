@@ -0,0 +1,116 @@
+import re
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+import requests
+import requests_mock
+
+from tyora.client import Client, OfflineError, TaskState
+from tyora.mirror import Mirror, sync_course
+from tyora.session import MoocfiCsesSession
+from tyora.transport import RetryPolicy, TokenBucket, TransportPolicy
+
+LIST_HTML = open("tests/test_data/session_logged_in_some_tasks_done.html").read()
+TASK_HTML = open("tests/test_data/task_3055_complete.html").read()
+TASK_URL = re.compile(r"https://example.com/task/(\d+)")
+
+
+def task_page(request, context) -> str:
+    return TASK_HTML.replace("3055", request.url.rstrip("/").split("/")[-1])
+
+
+def new_session(**kwargs) -> MoocfiCsesSession:
+    # Connection errors fail right away, instead of after retries
+    policy = TransportPolicy(retry=RetryPolicy(retries=0), bucket=TokenBucket(rate=0))
+    return MoocfiCsesSession(policy=policy, **kwargs)
+
+
+@pytest.fixture
+def mirror(tmp_path: Path) -> Iterator[Mirror]:
+    mirror = Mirror(tmp_path / "state.db", "dsa24k")
+    yield mirror
+    mirror.close()
+
+
+def test_sync_course(mirror: Mirror) -> None:
+    client = Client(new_session(base_url="https://example.com/", cookies={}))
+    with requests_mock.Mocker() as m:
+        m.get("https://example.com/list", text=LIST_HTML)
+        m.get(TASK_URL, text=task_page, headers={"ETag": '"v1"'})
+        first = sync_course(client, mirror)
+        assert sorted(first.added) == ["2643", "3049", "3054", "3055"]
+        assert (first.revision, first.downloaded) == (1, 4)
+
+        # Synced tasks aren't fetched again until they're old
+        m.reset_mock()
+        again = sync_course(client, mirror)
+        assert m.call_count == 1
+        assert (again.revision, len(again.unchanged)) == (1, 4)
+
+        m.get(TASK_URL, status_code=304)
+        refreshed = sync_course(client, mirror, refresh=True)
+        assert m.request_history[-1].headers["If-None-Match"] == '"v1"'
+        assert (refreshed.revision, refreshed.downloaded) == (1, 0)
+
+        m.get(
+            TASK_URL,
+            text=lambda request, context: task_page(request, context).replace(
+                "gummy", "sour"
+            ),
+        )
+        changed = sync_course(client, mirror, refresh=True)
+    assert changed.revision == 2
+    assert sorted(changed.changed) == ["2643", "3049", "3054", "3055"]
+    entry = mirror.entry("3055")
+    assert entry is not None and entry["revision"] == 2
+    # The name comes from the list, not the changed page
+    task = mirror.task("3049")
+    assert task is not None and task.name == "Inversions"
+
+
+def test_sync_course_keeps_going_on_errors(mirror: Mirror) -> None:
+    client = Client(new_session(base_url="https://example.com/", cookies={}))
+    with requests_mock.Mocker() as m:
+        m.get("https://example.com/list", text=LIST_HTML)
+        m.get(TASK_URL, text=task_page)
+        m.get("https://example.com/task/3049", exc=requests.exceptions.ConnectTimeout)
+        result = sync_course(client, mirror)
+        assert result.failed == ["3049"]
+        assert mirror.task("3049") is None
+
+        m.get("https://example.com/task/3049", text=task_page)
+        m.reset_mock()
+        retried = sync_course(client, mirror)
+    assert [request.url for request in m.request_history] == [
+        "https://example.com/list",
+        "https://example.com/task/3049",
+    ]
+    assert retried.added == ["3049"]
+    task = mirror.task("3049")
+    assert task is not None and task.id == "3049"
+
+
+def test_client_reads_the_mirror(mirror: Mirror) -> None:
+    session = new_session(base_url="https://example.com/", cookies={})
+    with requests_mock.Mocker() as m:
+        m.get("https://example.com/list", text=LIST_HTML)
+        m.get(TASK_URL, text=task_page)
+        sync_course(Client(session), mirror)
+
+    offline = Client(session, mirror=mirror, offline=True)
+    with requests_mock.Mocker() as m:
+        tasks = offline.get_task_list(state=TaskState.COMPLETE, limit=2)
+        assert [task.id for task in tasks] == ["3055", "3049"]
+        assert offline.get_task("3054").submit_file == "candies.py"
+        with pytest.raises(OfflineError):
+            offline.get_task("9999")
+        assert not m.called
+
+    online = Client(session, mirror=mirror)
+    with requests_mock.Mocker() as m:
+        m.get("https://example.com/task/3055", exc=requests.exceptions.ConnectionError)
+        assert online.get_task("3055").name == "Candies"
+        m.get("https://example.com/task/9999", exc=requests.exceptions.ConnectionError)
+        with pytest.raises(requests.exceptions.ConnectionError):
+            online.get_task("9999")
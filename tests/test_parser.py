@@ -0,0 +1,135 @@
+import importlib.util
+from pathlib import Path
+from typing import Iterator, Union
+
+import pytest
+
+from tyora import parser
+from tyora.client import iter_task_list, parse_task, parse_task_list
+from tyora.utils import find_link, parse_form
+
+TEST_DATA = Path("tests/test_data")
+
+fast_backends = [
+    "html.parser",
+    pytest.param(
+        "lxml",
+        marks=pytest.mark.skipif(
+            importlib.util.find_spec("lxml") is None, reason="lxml not installed"
+        ),
+    ),
+]
+
+
+def read(name: str) -> str:
+    return (TEST_DATA / name).read_text()
+
+
+@pytest.mark.parametrize("backend", fast_backends)
+@pytest.mark.parametrize(
+    "page", ["task_3055_complete.html", "task_3052_incomplete_no_submit_link.html"]
+)
+def test_parse_task_matches_html5lib(backend: str, page: str) -> None:
+    html = read(page)
+    expected = parse_task(parser.parse_html(html, "html5lib"))
+    assert parse_task(parser.parse_html(html, backend)) == expected
+
+
+@pytest.mark.parametrize("backend", fast_backends)
+@pytest.mark.parametrize(
+    "page", ["session_logged_in_some_tasks_done.html", "session_logged_in.html"]
+)
+def test_parse_task_list_matches_html5lib(backend: str, page: str) -> None:
+    html = read(page)
+    expected = parse_task_list(parser.parse_html(html, "html5lib"))
+    assert parse_task_list(parser.parse_html(html, backend)) == expected
+
+
+@pytest.mark.parametrize("backend", fast_backends)
+@pytest.mark.parametrize(
+    "page", ["submit_3055_form.html", "tmcmoocfi-oauth-redirect.html"]
+)
+def test_parse_form_and_links_match_html5lib(backend: str, page: str) -> None:
+    html = read(page)
+    expected_root = parser.parse_html(html, "html5lib")
+    root = parser.parse_html(html, backend)
+    assert parse_form(root) == parse_form(expected_root)
+    for xpath in ('.//a[@title="Log out"]', './/a[@class="account"]'):
+        assert find_link(root, xpath) == find_link(expected_root, xpath)
+
+
+@pytest.mark.parametrize("backend", fast_backends)
+@pytest.mark.parametrize("html", ["", "  \n", b""])
+def test_parse_empty_document(backend: str, html: Union[str, bytes]) -> None:
+    root = parser.parse_html(html, backend)
+    assert root.tag == "html"
+    assert parse_form(root) == parse_form(parser.parse_html(html, "html5lib"))
+    assert find_link(root, './/a[@title="Log out"]') == {}
+    assert parse_task_list(root) == []
+
+
+@pytest.mark.parametrize("backend", [*fast_backends, "html5lib"])
+@pytest.mark.parametrize(
+    "page", ["session_logged_in_some_tasks_done.html", "session_logged_in.html"]
+)
+def test_iter_elements_matches_parse_html(
+    backend: str, page: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    html = read(page)
+    expected = parse_task_list(parser.parse_html(html, "html5lib"))
+    monkeypatch.setattr(parser, "PARSER", backend)
+    parser.get_backend.cache_clear()
+    try:
+        assert list(iter_task_list(html)) == expected
+    finally:
+        parser.get_backend.cache_clear()
+
+
+@pytest.mark.parametrize("backend", fast_backends)
+def test_iter_elements_stops_parsing_early(
+    backend: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    from benchmarks import bench
+
+    html = bench.large_task_list(300)
+    chunks = 0
+    split = parser._chunks
+
+    def counting_chunks(html: str) -> Iterator[str]:
+        nonlocal chunks
+        for chunk in split(html):
+            chunks += 1
+            yield chunk
+
+    monkeypatch.setattr(parser, "_chunks", counting_chunks)
+    monkeypatch.setattr(parser, "CHUNK_SIZE", 1024)
+    tasks = (
+        li
+        for li in parser.iter_elements(html, "li", backend)
+        if li.get("class") == "task"
+    )
+    next(tasks)
+    assert chunks < len(html) / 1024 / 10
+    assert len(list(tasks)) == 299
+
+
+def test_tree_builder_implied_end_tags() -> None:
+    root = parser.parse_html(
+        "<ul><li><a href='/1'>One</a><li><a href='/2'>Two</a></ul>"
+        "<p>text<div>block</div><pre>\ncode</pre>",
+        "html.parser",
+    )
+    assert [li.find("a").text for li in root.findall(".//ul/li")] == ["One", "Two"]
+    assert root.find(".//p/div") is None
+    assert root.findtext(".//pre") == "code"
+
+
+def test_parse_html_is_memoized() -> None:
+    html = read("session_logged_in.html")
+    assert parser.parse_html(html) is parser.parse_html(html)
+    assert parser.parse_html(parser.parse_html(html)) is parser.parse_html(html)
+
+
+def test_unknown_backend() -> None:
+    with pytest.raises(ValueError):
+        parser.parse_html("<html></html>", "nope")
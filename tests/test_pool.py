@@ -0,0 +1,58 @@
+from pathlib import Path
+
+import pytest
+import requests_mock
+
+from tyora.client import Client
+from tyora.pool import SessionPool
+from tyora.transport import RetryPolicy, TokenBucket, TransportPolicy
+
+list_html = open("tests/test_data/session_logged_in_some_tasks_done.html").read()
+
+
+@pytest.fixture
+def pool(tmp_path: Path):
+    policy = TransportPolicy(retry=RetryPolicy(retries=0), bucket=TokenBucket(rate=0))
+    with SessionPool("https://example.com/", tmp_path, policy=policy) as pool:
+        pool.add("ta@example.com", "secret", "dsa24k")
+        pool.add("test@example.com", "secret", "dsa24k")
+        pool.add("ta@example.com", "secret", "other")
+        yield pool
+
+
+def test_run_across_keys(pool: SessionPool) -> None:
+    with requests_mock.Mocker() as m:
+        m.get("https://example.com/dsa24k/list", text=list_html)
+        m.get("https://example.com/other/list", status_code=404)
+        results = {r.key: r for r in pool.run(Client.get_task_list)}
+
+    assert set(results) == set(pool.clients)
+    assert results[("ta@example.com", "dsa24k")].value
+    assert results[("test@example.com", "dsa24k")].value
+    assert results[("ta@example.com", "other")].error is not None
+
+
+def test_sessions_share_connections(pool: SessionPool) -> None:
+    adapters = {
+        id(client.session.get_adapter("https://example.com/"))
+        for client in pool.clients.values()
+    }
+    assert adapters == {id(pool.adapter)}
+
+
+def test_state_is_stored_per_key(tmp_path: Path, pool: SessionPool) -> None:
+    client = pool.client("ta@example.com", "dsa24k")
+    client.session.cookies.set("session", "abc")
+    client.session.mark_logged_in()
+    pool.save()
+
+    state = pool.store.get("pool/ta@example.com@dsa24k")
+    assert state["cookies"] == {"session": "abc"}
+
+    restored = SessionPool("https://example.com/", tmp_path)
+    session = restored.add("ta@example.com", "secret", "dsa24k").session
+    assert session.cookies.get_dict() == {"session": "abc"}
+    assert session.login_is_cached
+    other = restored.add("test@example.com", "secret", "dsa24k").session
+    assert not other.login_is_cached
+    restored.close()
@@ -0,0 +1,72 @@
+from pathlib import Path
+
+from tyora.client import Task, TaskState, parse_task
+from tyora.runner import Sample, extract_samples, run_sample, run_samples
+
+STDIN_TASK = Task(
+    id="1068",
+    name="Weird Algorithm",
+    state=TaskState.INCOMPLETE,
+    description_html=(
+        "<div><p>Print the values.</p><h1>Example</h1>"
+        "<p>Input:</p><pre>3\n</pre><p>Output:</p><pre>3 10 5 16 8 4 2 1\n</pre>"
+        "<p>Input:</p><pre>1\n</pre><p>Output:</p><pre>1\n</pre></div>"
+    ),
+)
+
+
+def test_extract_samples_from_code() -> None:
+    task = parse_task(open("tests/test_data/task_3055_complete.html").read())
+    samples = extract_samples(task)
+    assert [(s.expression, s.expected) for s in samples] == [
+        ("count(3, 4, 11)", "3"),
+        ("count(5, 1, 100)", "100"),
+        ("count(2, 3, 1)", "0"),
+        ("count(2, 3, 9)", "4"),
+    ]
+
+
+def test_extract_samples_from_statement() -> None:
+    samples = extract_samples(STDIN_TASK)
+    assert [(s.stdin, s.expected) for s in samples] == [
+        ("3\n", "3 10 5 16 8 4 2 1\n"),
+        ("1\n", "1\n"),
+    ]
+
+
+def test_run_samples(tmp_path: Path) -> None:
+    solution = tmp_path / "weird.py"
+    solution.write_text(
+        "n = int(input())\n"
+        "values = [n]\n"
+        "while n != 1:\n"
+        "    n = n // 2 if n % 2 == 0 else 3 * n + 1\n"
+        "    values.append(n)\n"
+        "print(*values)\n"
+    )
+    results = run_samples(str(solution), extract_samples(STDIN_TASK), max_workers=2)
+    assert [result.verdict for result in results] == ["PASS", "PASS"]
+    assert results[0].output == "3 10 5 16 8 4 2 1\n"
+    assert results[0].max_rss_kib is None or results[0].max_rss_kib > 0
+
+
+def test_run_sample_verdicts(tmp_path: Path) -> None:
+    solution = tmp_path / "candies.py"
+    solution.write_text(
+        "def count(a, b, c):\n"
+        "    if a == 0:\n"
+        "        while True: pass\n"
+        "    return c // max(a, b)\n"
+    )
+    ok = run_sample(str(solution), Sample("ok", "2", expression="count(3, 4, 11)"))
+    assert ok.passed
+    wrong = run_sample(str(solution), Sample("wrong", "4", expression="count(2, 3, 9)"))
+    assert wrong.verdict == "FAIL"
+    assert wrong.output == "3\n"
+    error = run_sample(str(solution), Sample("error", "1", expression="count(1)"))
+    assert error.verdict == "ERROR"
+    assert "TypeError" in error.stderr
+    slow = run_sample(
+        str(solution), Sample("slow", "1", expression="count(0, 1, 1)"), timeout=0.5
+    )
+    assert slow.verdict == "TIMEOUT"
@@ -2,6 +2,7 @@ import pytest
 import requests_mock
 
 from tyora.session import MoocfiCsesSession as Session
+from tyora.session import cookie_fingerprint
 
 test_cookies = {"cookie_a": "value_a", "cookie_b": "value_b"}
 
@@ -47,3 +48,49 @@ def test_login_failed(mock_session: Session) -> None:
 
 def test_loading_cookies(mock_session: Session) -> None:
     assert mock_session.cookies.get_dict() == test_cookies
+
+
+def test_login_cached_skips_requests(mock_session: Session) -> None:
+    mock_session.mark_logged_in()
+    with requests_mock.Mocker() as m:
+        mock_session.login(username="test_user@test.com", password="test_password")
+        assert m.call_count == 0
+
+
+def test_get_page_logs_in_lazily(mock_session: Session) -> None:
+    mock_session.username = "test_user@test.com"
+    mock_session.password = "test_password"
+    with requests_mock.Mocker() as m:
+        m.get(
+            "https://example.com/list",
+            [
+                {"text": open("tests/test_data/session_logged_out.html").read()},
+                {"text": open("tests/test_data/session_logged_in.html").read()},
+            ],
+        )
+        m.get(
+            "https://example.com/login/oauth-redirect?site=mooc.fi",
+            text=open("tests/test_data/tmcmoocfi-oauth-redirect.html").read(),
+        )
+        m.post("https://example.com/sessions", text="")
+        mock_session.get_page("https://example.com/list")
+        assert m.call_count == 4
+    assert mock_session.login_is_cached
+
+
+def test_get_page_logged_in_no_extra_requests(mock_session: Session) -> None:
+    with requests_mock.Mocker() as m:
+        m.get(
+            "https://example.com/list",
+            text=open("tests/test_data/session_logged_in.html").read(),
+        )
+        mock_session.get_page("https://example.com/list")
+        assert m.call_count == 1
+    assert mock_session.login_is_cached
+
+
+def test_cookie_fingerprint() -> None:
+    assert cookie_fingerprint({"a": "1", "b": "2"}) == cookie_fingerprint(
+        {"b": "2", "a": "1"}
+    )
+    assert cookie_fingerprint({"a": "1"}) != cookie_fingerprint({"a": "2"})
@@ -0,0 +1,43 @@
+import threading
+
+from tyora.state import StateStore
+
+
+def test_get_set_delete(tmp_path) -> None:
+    with StateStore(tmp_path / "state.db") as store:
+        assert store.get("cookies") is None
+        assert store.get("cookies", {}) == {}
+        store.set("cookies", {"a": "b"})
+        assert store.get("cookies") == {"a": "b"}
+        store.update({"cookies": {"a": "c"}, "session": {"logged_in_until": 1.0}})
+        assert store.get("cookies") == {"a": "c"}
+        store.delete("cookies")
+        assert store.get("cookies") is None
+        assert store.get("session") == {"logged_in_until": 1.0}
+
+
+def test_concurrent_writers(tmp_path) -> None:
+    # Separate stores stand in for separate processes, each has its own lock file
+    stores = [StateStore(tmp_path / "state.db") for _ in range(4)]
+
+    def increment(store: StateStore) -> None:
+        for _ in range(25):
+            with store.locked():
+                store.set("count", store.get("count", 0) + 1)
+
+    threads = [threading.Thread(target=increment, args=(s,)) for s in stores]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert stores[0].get("count") == 100
+    for store in stores:
+        store.close()
+
+
+def test_nested_lock(tmp_path) -> None:
+    with StateStore(tmp_path / "state.db") as store:
+        with store.locked():
+            store.set("a", 1)
+        assert store.get("a") == 1
@@ -0,0 +1,134 @@
+from unittest import mock
+
+import pytest
+import requests
+import requests_mock
+
+from tyora.session import MoocfiCsesSession as Session
+from tyora.transport import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryPolicy,
+    TokenBucket,
+    TransportPolicy,
+)
+
+
+@pytest.fixture
+def sleep():
+    with mock.patch("tyora.transport.time.sleep") as sleep:
+        yield sleep
+
+
+def make_session(**kwargs) -> Session:
+    policy = TransportPolicy(
+        retry=RetryPolicy(retries=2, backoff=0.1),
+        bucket=TokenBucket(rate=0),
+        **kwargs,
+    )
+    return Session(base_url="https://example.com/", policy=policy)
+
+
+def test_get_is_retried_on_server_errors(sleep) -> None:
+    session = make_session()
+    with requests_mock.Mocker() as m:
+        m.get(
+            "https://example.com/list",
+            [{"status_code": 503}, {"status_code": 502}, {"text": "ok"}],
+        )
+        res = session.get("https://example.com/list")
+    assert res.text == "ok"
+    assert m.call_count == 3
+    assert sleep.call_count == 2
+
+
+def test_get_gives_up_after_retries(sleep) -> None:
+    session = make_session()
+    with requests_mock.Mocker() as m:
+        m.get("https://example.com/list", status_code=500)
+        res = session.get("https://example.com/list")
+    assert res.status_code == 500
+    assert m.call_count == 3
+
+
+def test_post_is_not_retried_on_server_errors(sleep) -> None:
+    session = make_session()
+    with requests_mock.Mocker() as m:
+        m.post("https://example.com/send.php", status_code=503)
+        res = session.post("https://example.com/send.php")
+    assert res.status_code == 503
+    assert m.call_count == 1
+
+
+def test_post_is_retried_after_rate_limit(sleep) -> None:
+    session = make_session()
+    with requests_mock.Mocker() as m:
+        m.post(
+            "https://example.com/send.php",
+            [
+                {"status_code": 429, "headers": {"Retry-After": "2"}},
+                {"text": "sent"},
+            ],
+        )
+        res = session.post("https://example.com/send.php")
+    assert res.text == "sent"
+    sleep.assert_called_once_with(2.0)
+
+
+def test_long_retry_after_is_not_waited_for(sleep) -> None:
+    session = make_session()
+    with requests_mock.Mocker() as m:
+        m.get(
+            "https://example.com/list",
+            status_code=429,
+            headers={"Retry-After": "3600"},
+        )
+        res = session.get("https://example.com/list")
+    assert res.status_code == 429
+    assert m.call_count == 1
+    sleep.assert_not_called()
+
+
+def test_connection_errors_are_retried_for_get(sleep) -> None:
+    session = make_session()
+    with requests_mock.Mocker() as m:
+        m.get(
+            "https://example.com/list",
+            [{"exc": requests.exceptions.ConnectionError}, {"text": "ok"}],
+        )
+        assert session.get("https://example.com/list").text == "ok"
+
+
+def test_circuit_opens_and_fails_fast(sleep) -> None:
+    session = make_session(breakers={"example.com": CircuitBreaker(threshold=3)})
+    with requests_mock.Mocker() as m:
+        m.get("https://example.com/list", status_code=503)
+        session.get("https://example.com/list")
+        assert m.call_count == 3
+        with pytest.raises(CircuitOpenError):
+            session.get("https://example.com/list")
+        assert m.call_count == 3
+
+
+def test_circuit_closes_after_successful_trial() -> None:
+    breaker = CircuitBreaker(threshold=1, cooldown=0)
+    breaker.record(False)
+    breaker.check("example.com")
+    # Only one trial request at a time while half open
+    with pytest.raises(CircuitOpenError):
+        breaker.check("example.com")
+    breaker.record(True)
+    breaker.check("example.com")
+    breaker.check("example.com")
+
+
+def test_token_bucket_limits_rate(sleep) -> None:
+    bucket = TokenBucket(rate=10, burst=2)
+    with mock.patch("tyora.transport.time.monotonic", return_value=100.0):
+        bucket.updated = 100.0
+        bucket.acquire()
+        bucket.acquire()
+        sleep.side_effect = StopIteration
+        with pytest.raises(StopIteration):
+            bucket.acquire()
+    assert sleep.call_args.args[0] == pytest.approx(0.1)
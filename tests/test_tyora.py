@@ -1,6 +1,12 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
 
 from tyora import tyora
+from tyora.client import Task, TaskState, diff_task_lists
+from tyora.state import StateStore
 
 
 def test_parse_args_missing_args() -> None:
@@ -24,3 +30,116 @@ def test_read_config() -> None: ...
 
 
 def test_get_cookiejar() -> None: ...
+
+
+def test_session_state_roundtrip(tmp_path) -> None:
+    cookies = {"cookie_a": "value_a"}
+    with StateStore(tmp_path / "state.db") as store:
+        assert tyora.read_session_state(store) == ({}, 0.0)
+        tyora.write_session_state(store, cookies, 1234.5)
+        assert tyora.read_session_state(store) == (cookies, 1234.5)
+        store.set("cookies", {"cookie_a": "other"})
+        assert tyora.read_session_state(store) == ({"cookie_a": "other"}, 0.0)
+
+
+def test_state_files_are_moved_into_store(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(tyora, "STATE_DIR", tmp_path)
+    cookies = {"cookie_a": "value_a"}
+    (tmp_path / "cookies.json").write_text(json.dumps(cookies))
+    (tmp_path / "tasks-dsa24k.json").write_text(
+        json.dumps([{"id": "1", "name": "Candies", "state": "complete"}])
+    )
+    with tyora.open_state_store() as store:
+        assert tyora.read_session_state(store) == (cookies, 0.0)
+        assert [task.id for task in tyora.read_task_list(store, "dsa24k")] == ["1"]
+    assert not list(tmp_path.glob("*.json"))
+
+
+def test_parse_args_show_multiple() -> None:
+    args = tyora.parse_args(["show", "3055", "3052", "--jobs", "2"])
+    assert args.task_id == ["3055", "3052"]
+    assert args.jobs == 2
+    assert not args.all
+
+
+def test_print_batch_results(capsys: pytest.CaptureFixture[str]) -> None:
+    results = [
+        {
+            "task_id": "3055",
+            "filename": "candies.py",
+            "status": "ready",
+            "result": "accepted",
+        }
+    ]
+    tyora.print_batch_results(results)
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].split() == ["task_id", "filename", "status", "result"]
+    assert lines[1].split() == ["3055", "candies.py", "ready", "accepted"]
+
+    tyora.print_batch_results(results, format="json")
+    assert json.loads(capsys.readouterr().out) == results
+
+
+def test_task_list_snapshot_and_changes(
+    tmp_path, capsys: pytest.CaptureFixture[str]
+) -> None:
+    with StateStore(tmp_path / "state.db") as store:
+        assert tyora.read_task_list(store, "dsa24k") == []
+        old = [Task(id="1", name="Candies", state=TaskState.INCOMPLETE)]
+        tyora.write_task_list(store, "dsa24k", old)
+        assert tyora.read_task_list(store, "dsa24k") == old
+
+    new = [
+        Task(id="1", name="Candies", state=TaskState.COMPLETE),
+        Task(id="2", name="Repeat", state=TaskState.INCOMPLETE),
+    ]
+    tyora.print_task_changes(diff_task_lists(old, new))
+    assert capsys.readouterr().out.splitlines() == [
+        "- 1: Candies ✅ (was ❌)",
+        "- 2: Repeat ❌ (new)",
+    ]
+
+
+def test_print_task_list_formats(capsys: pytest.CaptureFixture[str]) -> None:
+    tasks = [
+        Task(id="1", name="Candies", state=TaskState.COMPLETE),
+        Task(id="2", name="Two\tsets", state=TaskState.INCOMPLETE),
+    ]
+    tyora.print_task_list(tasks, format="tsv")
+    assert capsys.readouterr().out.splitlines() == [
+        "id\tname\tstate",
+        "1\tCandies\tcomplete",
+        "2\tTwo sets\tincomplete",
+    ]
+
+    tyora.print_task_list(tasks, filter="incomplete", format="jsonl")
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"id": "2", "name": "Two\tsets", "state": "incomplete"}
+    ]
+
+    tyora.print_task_list(tasks, limit=1, format="json")
+    assert json.loads(capsys.readouterr().out) == [
+        {"id": "1", "name": "Candies", "state": "complete"}
+    ]
+
+    old = [Task(id="1", name="Candies", state=TaskState.INCOMPLETE)]
+    tyora.print_task_changes(diff_task_lists(old, tasks), format="json")
+    assert json.loads(capsys.readouterr().out)[0]["previous_state"] == "incomplete"
+
+
+def test_lazy_session_is_created_once(monkeypatch: pytest.MonkeyPatch) -> None:
+    created = []
+
+    class SlowSession:
+        def __init__(self, base_url: str) -> None:
+            time.sleep(0.01)
+            created.append(self)
+            self.headers = {"Referer": base_url}
+
+    monkeypatch.setattr("tyora.session.MoocfiCsesSession", SlowSession)
+    session = tyora.LazySession("https://example.com")
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        headers = list(executor.map(lambda _: session.headers, range(8)))
+    assert headers == [{"Referer": "https://example.com"}] * 8
+    assert len(created) == 1
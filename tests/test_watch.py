@@ -0,0 +1,104 @@
+import os
+import sys
+import threading
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Callable, Optional
+
+import pytest
+
+from tyora.client import SubmitResult
+from tyora.watch import InotifyWatcher, PollWatcher, SubmissionWatcher, debounced
+
+
+def test_poll_watcher(tmp_path: Path) -> None:
+    solution = tmp_path / "candies.py"
+    solution.write_text("print(1)\n")
+    watcher = PollWatcher(str(solution), interval=0.01)
+    assert not watcher.wait(0.05)
+    solution.write_text("print(12)\n")
+    assert watcher.wait(1)
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="needs inotify")
+def test_inotify_watcher(tmp_path: Path) -> None:
+    solution = tmp_path / "candies.py"
+    solution.write_text("print(1)\n")
+    watcher = InotifyWatcher(str(solution))
+    try:
+        (tmp_path / "notes.txt").write_text("other files don't count")
+        assert not watcher.wait(0.05)
+        solution.write_text("print(2)\n")
+        assert watcher.wait(1)
+        # Editors that save by renaming a new file over the old one
+        assert not watcher.wait(0.05)
+        (tmp_path / "candies.py.new").write_text("print(3)\n")
+        os.replace(tmp_path / "candies.py.new", solution)
+        assert watcher.wait(1)
+    finally:
+        watcher.close()
+
+
+class BurstWatcher:
+    """Reports the given changes, True for a change and False for a timeout"""
+
+    def __init__(self, changes: list[bool]) -> None:
+        self.changes = changes
+
+    def wait(self, timeout: Optional[float]) -> bool:
+        if not self.changes:
+            raise KeyboardInterrupt
+        return self.changes.pop(0)
+
+    def close(self) -> None:
+        pass
+
+
+def test_debounced() -> None:
+    # Two bursts of saves, each followed by a quiet debounce period
+    watcher = BurstWatcher([True, True, True, False, True, False])
+    bursts = 0
+    with pytest.raises(KeyboardInterrupt):
+        for _ in debounced(watcher, 0):
+            bursts += 1
+    assert bursts == 2
+
+
+class FakeClient:
+    def __init__(self) -> None:
+        self.submissions: list[str] = list()
+        self.release = threading.Event()
+
+    def submit_task(self, task_id: str, submission: str, filename: str) -> str:
+        self.submissions.append(submission)
+        return f"https://example.com/result/{len(self.submissions)}/"
+
+    def wait_for_result(
+        self, result_url: str, cancelled: Callable[[], bool]
+    ) -> Iterator[SubmitResult]:
+        self.release.wait(1)
+        if cancelled():
+            return
+        yield SubmitResult(status="READY", result=result_url)
+
+
+def test_submission_watcher(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    solution = tmp_path / "candies.py"
+    client = FakeClient()
+    watcher = SubmissionWatcher(client, "3055", str(solution))  # type: ignore[arg-type]
+
+    solution.write_text("print(1)\n")
+    first = watcher.submit()
+    assert watcher.submit() is None
+    solution.write_text("print(2)\n")
+    second = watcher.submit()
+    assert first and second
+
+    client.release.set()
+    first.join()
+    second.join()
+    assert client.submissions == ["print(1)\n", "print(2)\n"]
+    out = capsys.readouterr().out
+    assert "Solution unchanged, not submitting" in out
+    assert "[#1] Superseded, ignoring its result" in out
+    assert "[#2] Submission result: https://example.com/result/2/" in out
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+from concurrent.futures import Executor
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Callable,
+    Iterable,
+    Optional,
+    TypeVar,
+)
+
+import requests
+
+from .cache import ResponseCache
+from .client import POLL_TIMEOUT, Client, SubmitResult, Task, TaskState, _backoff_delays
+from .session import MoocfiCsesSession
+
+if TYPE_CHECKING:
+    from .history import Submission, SubmissionHistory
+    from .index import TaskIndex
+    from .mirror import Mirror
+
+T = TypeVar("T")
+
+
+class AsyncSession:
+    """asyncio interface to MoocfiCsesSession
+
+    Blocking requests run in an executor (the loop's default one unless given),
+    so many sessions, e.g. one per account, can be driven from a single event loop.
+    Every request in flight takes a thread of the executor, so at most its
+    max_workers requests run at once and the rest queue; pass a larger
+    ThreadPoolExecutor to raise that. Waiting between polls of a result doesn't
+    take a thread, it sleeps on the event loop.
+    """
+
+    def __init__(
+        self, session: MoocfiCsesSession, executor: Optional[Executor] = None
+    ) -> None:
+        self.session = session
+        self.executor = executor
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(func, *args, **kwargs)
+        )
+
+    async def get_page(self, url: str, **kwargs: Any) -> requests.Response:
+        return await self.run(self.session.get_page, url, **kwargs)
+
+    async def login(
+        self, username: Optional[str] = None, password: Optional[str] = None
+    ) -> None:
+        await self.run(self.session.login, username, password)
+
+
+class AsyncClient:
+    """asyncio interface to Client with the same methods, as coroutines"""
+
+    def __init__(
+        self,
+        session: AsyncSession,
+        cache: Optional[ResponseCache] = None,
+        index: Optional[TaskIndex] = None,
+        mirror: Optional[Mirror] = None,
+        offline: bool = False,
+        history: Optional[SubmissionHistory] = None,
+    ) -> None:
+        self.session = session
+        self.client = Client(
+            session.session,
+            cache=cache,
+            index=index,
+            mirror=mirror,
+            offline=offline,
+            history=history,
+        )
+
+    async def get_task_list(
+        self, state: Optional[TaskState] = None, limit: Optional[int] = None
+    ) -> list[Task]:
+        return await self.session.run(self.client.get_task_list, state, limit)
+
+    async def get_task(self, task_id: str, describe: bool = False) -> Task:
+        return await self.session.run(self.client.get_task, task_id, describe)
+
+    async def get_tasks(
+        self, task_ids: Iterable[str], describe: bool = False
+    ) -> list[Task]:
+        """Fetch many tasks concurrently, returned in the order of task_ids"""
+        return list(
+            await asyncio.gather(
+                *(self.get_task(task_id, describe) for task_id in task_ids)
+            )
+        )
+
+    async def previous_submission(
+        self, task_id: str, submission: str
+    ) -> Optional[Submission]:
+        return await self.session.run(
+            self.client.previous_submission, task_id, submission
+        )
+
+    async def submit_task(
+        self,
+        task_id: str,
+        submission: str,
+        filename: Optional[str],
+        force: bool = False,
+    ) -> str:
+        return await self.session.run(
+            self.client.submit_task, task_id, submission, filename, force
+        )
+
+    async def wait_for_result(
+        self,
+        result_url: str,
+        timeout: float = POLL_TIMEOUT,
+        cancelled: Optional[Callable[[], bool]] = None,
+    ) -> AsyncIterator[SubmitResult]:
+        """Poll a submission result page, like Client.wait_for_result
+
+        Only the requests run in the executor, so waiting for many results
+        concurrently needs a thread per request in flight, not per submission.
+        """
+        headers: dict[str, str] = dict()
+        last_result: Optional[SubmitResult] = None
+        for delay in _backoff_delays(
+            timeout, f"No result for {result_url} in {timeout} seconds"
+        ):
+            await asyncio.sleep(delay)
+            if cancelled is not None and cancelled():
+                return
+            result, done, headers = await self.session.run(
+                self.client._poll_result, result_url, headers
+            )
+            if result is not None and (result != last_result or done):
+                if done and self.client.history:
+                    self.client.history.update_result(result_url, result)
+                yield result
+                last_result = result
+            if done:
+                return
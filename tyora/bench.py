@@ -0,0 +1,143 @@
+"""Measure how the time and memory use of a solution grow with its input
+
+The solution is run on inputs of increasing size, each in a new Python
+process like `tyora test` does. Inputs come from files, from a generator
+command that prints the input for a size, or, for tasks where the solution
+defines functions, from an expression that calls them. The time and memory of
+starting Python are measured once with an empty program and subtracted, what
+remains is fitted against the size as a power law, whose exponent estimates
+the complexity of the solution.
+"""
+
+import math
+import os
+import shlex
+import subprocess
+import tempfile
+from dataclasses import dataclass
+from typing import Optional
+
+from .runner import RUN_TIMEOUT, RunResult, Sample, run_sample
+
+BENCH_SIZES = (1000, 10000, 100000)
+
+# Upper bounds of fitted exponents and what they usually mean
+COMPLEXITY_CLASSES = (
+    (0.3, "O(1) or O(log n)"),
+    (1.3, "O(n) or O(n log n)"),
+    (2.3, "O(n^2)"),
+    (3.3, "O(n^3)"),
+)
+
+
+@dataclass
+class BenchPoint:
+    size: int
+    result: RunResult
+    # Without the time and memory of starting Python
+    time: float
+    memory_kib: Optional[int] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.result.verdict not in ("ERROR", "TIMEOUT")
+
+
+@dataclass
+class BenchReport:
+    points: list[BenchPoint]
+    time_exponent: Optional[float] = None
+    memory_exponent: Optional[float] = None
+
+    def predict_time(self, size: int) -> Optional[float]:
+        """Extrapolate the time a size takes from the largest measured one"""
+        points = [point for point in self.points if point.ok and point.time > 0]
+        if self.time_exponent is None or not points:
+            return None
+        largest = max(points, key=lambda point: point.size)
+        return largest.time * (size / largest.size) ** self.time_exponent
+
+
+def fit_exponent(sizes: list[int], values: list[float]) -> Optional[float]:
+    """Least squares slope of log(value) against log(size)
+
+    Returns None without two different sizes with a positive value.
+    """
+    pairs = [
+        (math.log(size), math.log(value))
+        for size, value in zip(sizes, values)
+        if size > 0 and value > 0
+    ]
+    if len({x for x, _ in pairs}) < 2:
+        return None
+    mean_x = sum(x for x, _ in pairs) / len(pairs)
+    mean_y = sum(y for _, y in pairs) / len(pairs)
+    return sum((x - mean_x) * (y - mean_y) for x, y in pairs) / sum(
+        (x - mean_x) ** 2 for x, _ in pairs
+    )
+
+
+def complexity_class(exponent: float) -> str:
+    for bound, name in COMPLEXITY_CLASSES:
+        if exponent < bound:
+            return name
+    return f"O(n^{exponent:.1f})"
+
+
+def input_size(stdin: str) -> int:
+    """The size of an input file, its amount of whitespace separated values"""
+    return len(stdin.split())
+
+
+def generate_input(generator: str, size: int) -> str:
+    """Run a generator command, with {n} replaced by the size, for its output"""
+    command = [arg.replace("{n}", str(size)) for arg in shlex.split(generator)]
+    return subprocess.run(command, capture_output=True, text=True, check=True).stdout
+
+
+def baseline(timeout: float = RUN_TIMEOUT) -> RunResult:
+    """Run an empty program, for the cost of starting Python and the harness"""
+    with tempfile.TemporaryDirectory() as directory:
+        empty = os.path.join(directory, "empty.py")
+        with open(empty, "w"):
+            pass
+        return run_sample(empty, Sample("baseline", ""), timeout)
+
+
+def run_bench(
+    solution: str, samples: list[tuple[int, Sample]], timeout: float = RUN_TIMEOUT
+) -> BenchReport:
+    """Run a solution on samples of the given sizes, one at a time
+
+    The samples aren't run in parallel, they'd compete for the CPU and memory
+    bandwidth and skew the measurements.
+    """
+    base = baseline(timeout)
+    base_time = base.cpu_time if base.cpu_time is not None else base.wall_time
+    points = list()
+    for size, sample in sorted(samples, key=lambda pair: pair[0]):
+        result = run_sample(solution, sample, timeout)
+        used = result.cpu_time if result.cpu_time is not None else result.wall_time
+        memory = None
+        if result.max_rss_kib is not None and base.max_rss_kib is not None:
+            memory = max(result.max_rss_kib - base.max_rss_kib, 0)
+        points.append(BenchPoint(size, result, max(used - base_time, 0.0), memory))
+        if not points[-1].ok:
+            # Larger inputs would only take longer
+            break
+
+    measured = [point for point in points if point.ok]
+    return BenchReport(
+        points,
+        time_exponent=fit_exponent(
+            [point.size for point in measured], [point.time for point in measured]
+        ),
+        memory_exponent=fit_exponent(
+            [point.size for point in measured if point.memory_kib is not None],
+            [
+                float(point.memory_kib)
+                for point in measured
+                if point.memory_kib is not None
+            ],
+        ),
+    )
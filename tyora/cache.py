@@ -0,0 +1,197 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Optional
+from urllib.parse import urlparse
+
+from .utils import write_json_atomic
+
+# Seconds a cached page is used without asking the server, per kind of page
+CACHE_LIST_TTL = int(os.getenv("CACHE_LIST_TTL", 60))
+CACHE_TASK_TTL = int(os.getenv("CACHE_TASK_TTL", 24 * 60 * 60))
+# Total bytes of cache files kept on disk before the least recently used are evicted
+CACHE_MAX_SIZE = int(os.getenv("CACHE_MAX_SIZE", 16 * 1024 * 1024))
+
+logger = logging.getLogger(__name__)
+
+
+def page_ttl(url: str) -> int:
+    """Return how long a page may be served from the cache without revalidation"""
+    path = urlparse(url).path.rstrip("/")
+    if path.endswith("/list") or path == "list":
+        return CACHE_LIST_TTL
+    if "/task/" in path or path.startswith("task/"):
+        return CACHE_TASK_TTL
+    return 0
+
+
+def body_hash(body: str) -> str:
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def conditional_headers(
+    etag: Optional[str], last_modified: Optional[str]
+) -> dict[str, str]:
+    """Return the headers that ask the server for a page only if it changed"""
+    headers: dict[str, str] = dict()
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    return headers
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    body: str
+    data: Any = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    fetched_at: float = 0.0
+    body_hash: str = ""
+
+    @property
+    def is_fresh(self) -> bool:
+        return time.time() - self.fetched_at < page_ttl(self.url)
+
+    def validators(self) -> dict[str, str]:
+        """Return the headers that make a conditional request for this entry"""
+        return conditional_headers(self.etag, self.last_modified)
+
+
+# Inode and modification time of a cache file
+FileVersion = tuple[int, int]
+
+
+class ResponseCache:
+    """Disk backed cache of fetched pages and their parsed data, keyed by URL
+
+    Every entry is a JSON file in cache_dir. Reading an entry bumps its mtime, so
+    evicting the oldest files first when max_size is exceeded gives LRU behaviour.
+    The total size is scanned once and then kept up to date by writes, the
+    directory is only scanned again when the total exceeds max_size. Other
+    processes writing the same directory are accounted for by that scan.
+    Long running processes can also keep the most recently used memory_entries
+    in memory, saving the file reads. An entry in memory is only used while its
+    file is unchanged, so other processes changing or deleting it, like a
+    submission invalidating the task, are seen right away.
+    """
+
+    def __init__(
+        self, cache_dir: Path, max_size: int = CACHE_MAX_SIZE, memory_entries: int = 0
+    ) -> None:
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.memory_entries = memory_entries
+        # Entries by url, with the version of the file they were read from
+        self.memory: OrderedDict[str, tuple[CacheEntry, FileVersion]] = OrderedDict()
+        self._memory_lock = threading.Lock()
+        # Bytes of cache files on disk, None until the first write scans them
+        self._size: Optional[int] = None
+        self._size_lock = threading.Lock()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _remember(self, entry: CacheEntry, version: Optional[FileVersion]) -> None:
+        if not self.memory_entries or version is None:
+            return
+        with self._memory_lock:
+            self.memory[entry.url] = (entry, version)
+            self.memory.move_to_end(entry.url)
+            while len(self.memory) > self.memory_entries:
+                self.memory.popitem(last=False)
+
+    def _path(self, url: str) -> Path:
+        return self.cache_dir / (hashlib.sha256(url.encode()).hexdigest() + ".json")
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        path = self._path(url)
+        with self._memory_lock:
+            if url in self.memory:
+                entry, version = self.memory[url]
+                if _file_version(path) == version:
+                    self.memory.move_to_end(url)
+                    return copy.copy(entry)
+                del self.memory[url]
+        try:
+            with open(path, "r") as f:
+                entry = CacheEntry(**json.load(f))
+        except (FileNotFoundError, json.decoder.JSONDecodeError, TypeError) as e:
+            logger.debug(f"Cache miss for {url}: {e}")
+            return None
+        os.utime(path)
+        self._remember(copy.copy(entry), _file_version(path))
+        return entry
+
+    def set(self, entry: CacheEntry) -> None:
+        path = self._path(entry.url)
+        old_size = _file_size(path)
+        write_json_atomic(path, asdict(entry))
+        self._remember(copy.copy(entry), _file_version(path))
+        with self._size_lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._scan())
+            else:
+                self._size += _file_size(path) - old_size
+            full = self._size > self.max_size
+        if full:
+            self.evict()
+
+    def delete(self, url: str) -> None:
+        with self._memory_lock:
+            self.memory.pop(url, None)
+        path = self._path(url)
+        size = _file_size(path)
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            return
+        with self._size_lock:
+            if self._size is not None:
+                self._size -= size
+
+    def _scan(self) -> list[tuple[float, int, Path]]:
+        """Return the mtime, size and path of every cache file"""
+        files: list[tuple[float, int, Path]] = list()
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def evict(self) -> None:
+        """Remove least recently used entries until the cache fits in max_size"""
+        with self._size_lock:
+            files = self._scan()
+            total = sum(size for _, size, _ in files)
+            for _, size, path in sorted(files):
+                if total <= self.max_size:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+            self._size = total
+
+
+def _file_version(path: Path) -> Optional[FileVersion]:
+    """Return what tells if a file was replaced or touched, None if it's gone"""
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def _file_size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return 0
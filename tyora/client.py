@@ -1,96 +1,672 @@
 from __future__ import annotations
 
 import logging
-from dataclasses import dataclass
+import os
+import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
 from enum import Enum
-from typing import AnyStr, Optional
+from itertools import islice
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator, Optional, TypeVar
 from urllib.parse import urljoin
-from xml.etree.ElementTree import Element, tostring
+from xml.etree.ElementTree import Element
 
-import html5lib
-from html2text import html2text
+from .cache import CacheEntry, ResponseCache, body_hash, conditional_headers
+from .instrument import instrumented
+from .parser import HtmlSource, iter_elements, parse_html, to_string
+from .utils import page_is_logged_in, parse_form
 
-from .session import MoocfiCsesSession as Session
-from .utils import parse_form
+if TYPE_CHECKING:
+    from requests import Response
+
+    from .history import Submission, SubmissionHistory
+    from .index import TaskIndex
+    from .mirror import Mirror
+    from .session import MoocfiCsesSession as Session
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+# Default amount of pages fetched concurrently by bulk operations
+MAX_WORKERS = int(os.getenv("MAX_WORKERS", 4))
+# Seconds between polls of a submission result, doubling up to the maximum
+POLL_INTERVAL = float(os.getenv("POLL_INTERVAL", 0.5))
+POLL_MAX_INTERVAL = float(os.getenv("POLL_MAX_INTERVAL", 8))
+# Seconds to wait for a submission result before giving up
+POLL_TIMEOUT = float(os.getenv("POLL_TIMEOUT", 300))
+
+LIMIT_PATTERN = re.compile(
+    r"(?P<kind>time|memory) limit:\s*(?P<value>[\d.]+)\s*(?P<unit>ms|s|kb|mb|gb)",
+    re.IGNORECASE,
+)
+MEMORY_UNITS = {"kb": 1 / 1024, "mb": 1, "gb": 1024}
+MEASURE_PATTERN = re.compile(
+    r"(?P<value>[\d.]+)\s*(?P<unit>ms|s|kb|mb|gb)?", re.IGNORECASE
+)
+TIME_LIMIT_EXCEEDED = "time limit exceeded"
+
 
 class TaskState(Enum):
     COMPLETE = "complete"
     INCOMPLETE = "incomplete"
 
 
-@dataclass
 class Task:
-    id: str
-    name: str
-    state: TaskState
-    description: Optional[str] = None
-    code: Optional[str] = None
+    """A task of the course
+
+    Parsed task pages keep the html of the description, it's converted to
+    markdown on first access of description. Listing and submitting never pay
+    for the conversion.
+    """
+
+    __slots__ = (
+        "id",
+        "name",
+        "state",
+        "description_html",
+        "code",
+        "submit_file",
+        "submit_link",
+        "time_limit",
+        "memory_limit",
+        "_description",
+    )
+
+    def __init__(
+        self,
+        id: str,
+        name: str,
+        state: TaskState,
+        description: Optional[str] = None,
+        code: Optional[str] = None,
+        submit_file: Optional[str] = None,
+        submit_link: Optional[str] = None,
+        description_html: Optional[str] = None,
+        time_limit: Optional[float] = None,
+        memory_limit: Optional[int] = None,
+    ) -> None:
+        self.id = id
+        self.name = name
+        self.state = state
+        self.description_html = description_html
+        self.code = code
+        self.submit_file = submit_file
+        self.submit_link = submit_link
+        # Seconds and megabytes, when the statement states them
+        self.time_limit = time_limit
+        self.memory_limit = memory_limit
+        self._description = description
+
+    @property
+    def description(self) -> Optional[str]:
+        if self._description is None and self.description_html is not None:
+            from html2text import html2text
+
+            self._description = html2text(self.description_html).strip()
+        return self._description
+
+    @description.setter
+    def description(self, description: Optional[str]) -> None:
+        self._description = description
+        self.description_html = None
+
+    def _fields(self) -> tuple[Any, ...]:
+        # Parsers serialize the same html differently, compare what it renders to
+        return (
+            self.id,
+            self.name,
+            self.state.value,
+            self.description,
+            self.code,
+            self.submit_file,
+            self.submit_link,
+            self.time_limit,
+            self.memory_limit,
+        )
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Task):
+            return NotImplemented
+        return self._fields() == other._fields()
+
+    def __repr__(self) -> str:
+        return f"Task(id={self.id!r}, name={self.name!r}, state={self.state})"
+
+    def to_dict(self) -> dict[str, Any]:
+        data: dict[str, Any] = {
+            "id": self.id,
+            "name": self.name,
+            "state": self.state.value,
+            "code": self.code,
+            "submit_file": self.submit_file,
+            "submit_link": self.submit_link,
+        }
+        if self.time_limit is not None:
+            data["time_limit"] = self.time_limit
+        if self.memory_limit is not None:
+            data["memory_limit"] = self.memory_limit
+        # Only what's known, converting the description is left to its first use
+        if self.description_html is not None:
+            data["description_html"] = self.description_html
+        if self._description is not None or self.description_html is None:
+            data["description"] = self._description
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> Task:
+        return cls(**{**data, "state": TaskState(data["state"])})
+
+
+@dataclass
+class SubmitForm:
+    """What submitting a solution to a task posts, besides the solution itself"""
+
+    action: str
+    fields: dict[str, Optional[str]]
     submit_file: Optional[str] = None
-    submit_link: Optional[str] = None
+
+
+def submission_rejected(res: Response) -> bool:
+    """Check if the site refused a submission instead of accepting it
+
+    An accepted submission redirects to its result page. An expired csrf token
+    or login gets a client error, or the login page.
+    """
+    if 400 <= res.status_code < 500:
+        return True
+    return "/result/" not in res.url or not page_is_logged_in(res.text)
+
+
+class OfflineError(LookupError):
+    """Working offline, and the mirror doesn't have what was asked for"""
 
 
 class Client:
-    def __init__(self, session: Session) -> None:
+    def __init__(
+        self,
+        session: Session,
+        cache: Optional[ResponseCache] = None,
+        index: Optional[TaskIndex] = None,
+        mirror: Optional[Mirror] = None,
+        offline: bool = False,
+        history: Optional[SubmissionHistory] = None,
+    ) -> None:
         self.session = session
+        self.cache = cache
+        self.index = index
+        # Tasks and lists are read from the mirror when offline, or when the
+        # site can't be reached
+        self.mirror = mirror
+        self.offline = offline
+        # Submissions and their results, identical resubmissions reuse them
+        self.history = history
+        # Submit forms by task id, also kept in the cache between runs
+        self.submit_forms: dict[str, SubmitForm] = dict()
+
+    def _get_parsed(self, url: str, parse: Callable[[str], Any]) -> Any:
+        """Return the parsed data of a page, using the cache where possible
+
+        Fresh entries are used as is, stale ones are revalidated with a conditional
+        request and only downloaded and parsed again when the server changed them.
+        """
+        entry = self.cache.get(url) if self.cache else None
+        if entry and entry.is_fresh:
+            logger.debug(f"Using cached {url}")
+            return entry.data
+
+        res = self.session.get_page(url, headers=entry.validators() if entry else None)
+        if entry and res.status_code == 304:
+            logger.debug(f"Cached {url} not modified")
+            data = entry.data
+            entry.fetched_at = time.time()
+        else:
+            new_body_hash = body_hash(res.text)
+            # Servers without validators still often send the very same page
+            if entry and entry.body_hash == new_body_hash:
+                logger.debug(f"Cached {url} has the same body")
+                data = entry.data
+            else:
+                data = parse(res.text)
+            entry = CacheEntry(
+                url=url,
+                body=res.text,
+                data=data,
+                etag=res.headers.get("ETag"),
+                last_modified=res.headers.get("Last-Modified"),
+                fetched_at=time.time(),
+                body_hash=new_body_hash,
+            )
+        if self.cache:
+            self.cache.set(entry)
+        return data
+
+    def _mirrored(
+        self, fetch: Callable[[], T], read: Callable[[Mirror], Optional[T]], what: str
+    ) -> T:
+        """Fetch from the site, or read from the mirror when offline or unreachable"""
+        if self.mirror is None:
+            return fetch()
+        if not self.offline:
+            try:
+                return fetch()
+            # Errors of requests are OSErrors too
+            except OSError as e:
+                data = read(self.mirror)
+                if data is None:
+                    raise
+                logger.warning(
+                    f"Failed to reach the site, using the mirrored {what}: {e}"
+                )
+                return data
+        data = read(self.mirror)
+        if data is None:
+            raise OfflineError(f"The {what} isn't mirrored, run `tyora sync` first")
+        return data
+
+    def get_task_list(
+        self, state: Optional[TaskState] = None, limit: Optional[int] = None
+    ) -> list[Task]:
+        """Return the tasks of the course, optionally only those in state, up to limit"""
+
+        def read(mirror: Mirror) -> Optional[list[Task]]:
+            tasks = mirror.task_list()
+            if tasks is None:
+                return None
+            return list(
+                islice((t for t in tasks if state is None or t.state == state), limit)
+            )
+
+        return self._mirrored(
+            lambda: self._fetch_task_list(state, limit), read, "task list"
+        )
 
-    def get_task_list(self) -> list[Task]:
-        res = self.session.get(urljoin(self.session.base_url, "list"))
-        res.raise_for_status()
-        return parse_task_list(res.text)
+    def _fetch_task_list(
+        self, state: Optional[TaskState] = None, limit: Optional[int] = None
+    ) -> list[Task]:
+        """Fetch the task list from the site
+
+        Without a cache the page is only parsed as far as limit needs, with a cache
+        the whole list is parsed once and stored for the next calls.
+        """
+        url = urljoin(self.session.base_url, "list")
+        if self.cache is None:
+            html = self.session.get_page(url).text
+            return list(islice(iter_task_list(html, state), limit))
+        data = self._get_parsed(
+            url, lambda html: [task.to_dict() for task in parse_task_list(html)]
+        )
+        tasks = (
+            Task.from_dict(task)
+            for task in data
+            if state is None or task["state"] == state.value
+        )
+        return list(islice(tasks, limit))
+
+    def get_task(self, task_id: str, describe: bool = False) -> Task:
+        """Return a task, with describe its description is rendered up front
+
+        The rendered description is kept in the cache with the task, so callers
+        that show it render it only once per version of the page.
+        """
+        return self._mirrored(
+            lambda: self._fetch_task(task_id, describe),
+            lambda mirror: mirror.task(task_id),
+            f"task {task_id}",
+        )
 
-    def get_task(self, task_id: str) -> Task:
-        res = self.session.get(urljoin(self.session.base_url, f"task/{task_id}"))
-        res.raise_for_status()
+    def _fetch_task(self, task_id: str, describe: bool = False) -> Task:
+        url = urljoin(self.session.base_url, f"task/{task_id}")
         try:
-            task = parse_task(res.text)
+            data = self._get_parsed(url, lambda html: parse_task(html).to_dict())
         except ValueError as e:
             logger.debug(f"Error parsing task: {e}")
             raise
+        task = Task.from_dict(data)
+        if (
+            describe
+            and self.cache
+            and data.get("description") is None
+            and task.description is not None
+        ):
+            entry = self.cache.get(url)
+            if entry is not None:
+                entry.data = task.to_dict()
+                self.cache.set(entry)
+        if self.index:
+            self.index.update(self.session.base_url, task)
         return task
 
+    def get_tasks(
+        self,
+        task_ids: Iterable[str],
+        max_workers: int = MAX_WORKERS,
+        describe: bool = False,
+        ordered: bool = False,
+    ) -> Iterator[Task]:
+        """Fetch many tasks concurrently, yielding them in the order they arrive
+
+        With ordered they're yielded in the order of task_ids instead, each as
+        soon as it and the ones before it have arrived. All workers share the
+        session and its connection pool, which also limits the amount of
+        concurrent requests per host.
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(self.get_task, task_id, describe)
+                for task_id in task_ids
+            ]
+            try:
+                for future in futures if ordered else as_completed(futures):
+                    yield future.result()
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    def previous_submission(
+        self, task_id: str, submission: str
+    ) -> Optional[Submission]:
+        """Return the latest submission of the very same solution to a task"""
+        if self.history is None:
+            return None
+        return self.history.find(self.session.base_url, task_id, body_hash(submission))
+
     def submit_task(
-        self, task_id: str, submission: str, filename: Optional[str]
+        self,
+        task_id: str,
+        submission: str,
+        filename: Optional[str],
+        force: bool = False,
     ) -> str:
+        """Submit a solution, returns the url the site answered from
+
+        The submit form of a task is remembered, so resubmitting posts right away.
+        Only when the site rejects the remembered form, for example because its
+        csrf token expired with the login, is the form fetched again.
+
+        A solution that was submitted to the task before isn't queued on the
+        judge again unless force is given, the url of its earlier result is
+        returned instead.
+        """
+        previous = None if force else self.previous_submission(task_id, submission)
+        if previous is not None:
+            logger.debug(f"Task {task_id} got this solution before, reusing its result")
+            return previous.result_url
+
+        form = self._get_submit_form(task_id)
+        res = None
+        if form is not None:
+            res = self._post_submission(task_id, form, submission, filename)
+            if submission_rejected(res):
+                logger.debug(f"Remembered submit form of {task_id} was rejected")
+                res = None
+        if form is None or res is None:
+            form = self._fetch_submit_form(task_id)
+            res = self._post_submission(task_id, form, submission, filename)
+        res.raise_for_status()
+        # The submission changes the completion state shown on these pages
+        if self.cache:
+            self.cache.delete(urljoin(self.session.base_url, "list"))
+            self.cache.delete(urljoin(self.session.base_url, f"task/{task_id}"))
+        if self.history:
+            from .history import Submission
+
+            self.history.record(
+                Submission(
+                    course=self.session.base_url,
+                    task_id=task_id,
+                    filename=form.submit_file or filename,
+                    file_hash=body_hash(submission),
+                    submitted_at=time.time(),
+                    result_url=res.url,
+                    code=submission,
+                )
+            )
+        return res.url
+
+    def _get_submit_form(self, task_id: str) -> Optional[SubmitForm]:
+        if task_id in self.submit_forms:
+            return self.submit_forms[task_id]
+        entry = self.cache.get(self._submit_form_key(task_id)) if self.cache else None
+        if entry is None:
+            return None
+        form = SubmitForm(**entry.data)
+        self.submit_forms[task_id] = form
+        return form
+
+    def _fetch_submit_form(self, task_id: str) -> SubmitForm:
         task = self.get_task(task_id)
-        if not task.submit_file and not filename:
-            raise ValueError("No submission filename found for task ID: " + task_id)
         if not task.submit_link:
             raise ValueError("No submit link found for task ID: " + task_id)
-        submit_file = task.submit_file or filename
-
-        res = self.session.get(urljoin(self.session.base_url, task.submit_link))
-        res.raise_for_status()
-        parsed_form_data = parse_form(res.text)
-        action = parsed_form_data.pop("_action")
 
-        submit_form_data: dict[str, tuple[Optional[str], Optional[str]]] = dict()
-        for key, value in parsed_form_data.items():
-            submit_form_data[key] = (None, value)
+        submit_url = urljoin(self.session.base_url, task.submit_link)
+        res = self.session.get_page(submit_url)
+        fields = parse_form(res.text)
+        action = fields.pop("_action") or ""
+        fields.pop("", None)
+        form = SubmitForm(
+            action=urljoin(submit_url, action),
+            fields={**fields, "lang": "Python3", "option": "CPython3"},
+            submit_file=task.submit_file,
+        )
+        self.submit_forms[task_id] = form
+        if self.cache:
+            self.cache.set(
+                CacheEntry(
+                    url=self._submit_form_key(task_id),
+                    body="",
+                    data=asdict(form),
+                    fetched_at=time.time(),
+                )
+            )
+        return form
+
+    def _submit_form_key(self, task_id: str) -> str:
+        return urljoin(self.session.base_url, f"submit/{task_id}/#form")
+
+    def _post_submission(
+        self,
+        task_id: str,
+        form: SubmitForm,
+        submission: str,
+        filename: Optional[str],
+    ) -> Response:
+        submit_file = form.submit_file or filename
+        if not submit_file:
+            raise ValueError("No submission filename found for task ID: " + task_id)
+        submit_form_data: dict[str, tuple[Optional[str], Optional[str]]] = {
+            key: (None, value) for key, value in form.fields.items()
+        }
         submit_form_data["file"] = (submit_file, submission)
-        submit_form_data["lang"] = (None, "Python3")
-        submit_form_data["option"] = (None, "CPython3")
-        res = self.session.post(
-            urljoin(self.session.base_url, action),
+        return self.session.post(
+            form.action,
             files=submit_form_data,  # type: ignore[arg-type]
         )
-        res.raise_for_status()
-        return res.url
-
 
-def parse_task_list(html: AnyStr) -> list[Task]:
+    def submit_tasks(
+        self, submissions: dict[str, tuple[str, str]], max_workers: int = MAX_WORKERS
+    ) -> Iterator[tuple[str, Optional[str]]]:
+        """Submit many solutions concurrently
+
+        Takes a dict of task ids to (filename, code) and yields (task id, result
+        url) in the order the submissions finish, the url is None when it failed.
+        """
+        import requests
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self.submit_task, task_id, code, filename): task_id
+                for task_id, (filename, code) in submissions.items()
+            }
+            for future in as_completed(futures):
+                task_id = futures[future]
+                try:
+                    yield task_id, future.result()
+                except (requests.RequestException, ValueError) as e:
+                    logger.warning(f"Submitting task {task_id} failed: {e}")
+                    yield task_id, None
+
+    def match_submit_files(
+        self, filenames: Iterable[str], max_workers: int = MAX_WORKERS
+    ) -> dict[str, str]:
+        """Map the task ids of the course to the given filenames they expect"""
+        filenames = set(filenames)
+        task_ids = [task.id for task in self.get_task_list()]
+        return {
+            task.id: task.submit_file
+            for task in self.get_tasks(task_ids, max_workers=max_workers)
+            if task.submit_file in filenames
+        }
+
+    def _poll_result(
+        self, result_url: str, headers: dict[str, str]
+    ) -> tuple[Optional[SubmitResult], bool, dict[str, str]]:
+        """Fetch a result page once
+
+        Returns the parsed result, or None when the page didn't change, whether
+        the result is final and the headers for the next conditional request.
+        """
+        res = self.session.get(result_url, headers=headers)
+        res.raise_for_status()
+        if res.status_code == 304:
+            return None, False, headers
+        headers = conditional_headers(
+            res.headers.get("ETag"), res.headers.get("Last-Modified")
+        )
+        return parse_submit_result(res.text), "Test report" in res.text, headers
+
+    def wait_for_result(
+        self,
+        result_url: str,
+        timeout: float = POLL_TIMEOUT,
+        cancelled: Optional[Callable[[], bool]] = None,
+    ) -> Iterator[SubmitResult]:
+        """Poll a submission result page, yielding its parsed state when it changes
+
+        Polls back off exponentially with jitter and use conditional requests
+        when the server sends validators. Stops after yielding the final result,
+        or before a poll once cancelled returns True. Raises TimeoutError if the
+        result takes longer than timeout seconds.
+        """
+        headers: dict[str, str] = dict()
+        last_result: Optional[SubmitResult] = None
+        for _ in _backoff(timeout, f"No result for {result_url} in {timeout} seconds"):
+            if cancelled is not None and cancelled():
+                return
+            result, done, headers = self._poll_result(result_url, headers)
+            if result is not None and (result != last_result or done):
+                if done and self.history:
+                    self.history.update_result(result_url, result)
+                yield result
+                last_result = result
+            if done:
+                return
+
+    def wait_for_results(
+        self,
+        result_urls: dict[str, str],
+        timeout: float = POLL_TIMEOUT,
+        errors: Optional[dict[str, Exception]] = None,
+    ) -> Iterator[tuple[str, SubmitResult]]:
+        """Poll many result pages in one loop, yielding (key, final result) pairs
+
+        Takes a dict of arbitrary keys, like task ids, to result urls. When an
+        errors dict is given, a page that fails to load is stored in it by key
+        and no longer polled, instead of stopping the polling of all of them.
+        """
+        import requests
+
+        pending: dict[str, dict[str, str]] = {key: dict() for key in result_urls}
+        for _ in _backoff(timeout, f"No result for {len(pending)} submissions"):
+            for key, headers in list(pending.items()):
+                try:
+                    result, done, pending[key] = self._poll_result(
+                        result_urls[key], headers
+                    )
+                except (requests.RequestException, ValueError) as e:
+                    if errors is None:
+                        raise
+                    logger.warning(f"Polling {result_urls[key]} failed: {e}")
+                    errors[key] = e
+                    del pending[key]
+                    continue
+                if done and result is not None:
+                    del pending[key]
+                    if self.history:
+                        self.history.update_result(result_urls[key], result)
+                    yield key, result
+            if not pending:
+                return
+
+
+def _backoff(timeout: float, message: str) -> Iterator[None]:
+    """Yield until timeout passes, then raise TimeoutError with message
+
+    Sleeps between iterations with exponential backoff and jitter.
+    """
+    for delay in _backoff_delays(timeout, message):
+        if delay:
+            time.sleep(delay)
+        yield
+
+
+def _backoff_delays(timeout: float, message: str) -> Iterator[float]:
+    """Yield the seconds to wait before each poll, see _backoff
+
+    The first poll is immediate, the deadline is checked when the next delay is
+    asked for.
+    """
+    deadline = time.monotonic() + timeout
+    interval = POLL_INTERVAL
+    yield 0.0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(message)
+        yield min(remaining, random.uniform(interval / 2, interval))
+        interval = min(interval * 2, POLL_MAX_INTERVAL)
+
+
+def diff_task_lists(
+    old_tasks: list[Task], new_tasks: list[Task]
+) -> list[tuple[Task, Optional[Task]]]:
+    """Compare two task lists, returning the tasks that were added, renamed or
+    changed state
+
+    Returns (task, previous version) pairs, the previous version of added tasks
+    is None.
+    """
+    previous_tasks = {task.id: task for task in old_tasks}
+    changes: list[tuple[Task, Optional[Task]]] = list()
+    for task in new_tasks:
+        previous = previous_tasks.get(task.id)
+        if (
+            previous is None
+            or previous.name != task.name
+            or previous.state != task.state
+        ):
+            changes.append((task, previous))
+    return changes
+
+
+@instrumented
+def parse_task_list(html: HtmlSource) -> list[Task]:
     """Parse html to find tasks and their status, returns list of Task objects"""
-    root = html5lib.parse(html, namespaceHTMLElements=False)  # type: ignore[reportUnknownMemberType]
-    task_element_list = root.findall('.//li[@class="task"]')
+    return list(iter_task_list(html))
 
-    task_list: list[Task] = list()
-    for task_element in task_element_list:
-        task_id = None
-        task_name = None
-        task_state = None
 
+def iter_task_list(
+    html: HtmlSource, state: Optional[TaskState] = None
+) -> Iterator[Task]:
+    """Yield the tasks in html as they are parsed, optionally only those in state
+
+    Raw html is parsed only as far as the tasks taken from the iterator.
+    """
+    for task_element in iter_elements(html, "li"):
+        if task_element.get("class") != "task":
+            continue
         task_link = task_element.find("a")
         if task_link is None:
             continue
@@ -113,19 +689,19 @@ def parse_task_list(html: AnyStr) -> list[Task]:
         task_state = (
             TaskState.COMPLETE if "full" in task_element_class else TaskState.INCOMPLETE
         )
+        if state is not None and task_state != state:
+            continue
 
-        task = Task(
+        yield Task(
             id=task_id,
             name=task_name,
             state=task_state,
         )
-        task_list.append(task)
 
-    return task_list
 
-
-def parse_task(html: AnyStr) -> Task:
-    root = html5lib.parse(html, namespaceHTMLElements=False)  # type: ignore[reportUnknownMemberType]
+@instrumented
+def parse_task(html: HtmlSource) -> Task:
+    root = parse_html(html)
     task_link_element = root.find('.//div[@class="nav sidebar"]/a[@class="current"]')
     task_link = task_link_element if task_link_element is not None else Element("a")
     task_id = task_link.get("href", "").split("/")[-1]
@@ -139,7 +715,6 @@ def parse_task(html: AnyStr) -> Task:
     task_span_class = task_span.get("class", "")
     desc_div_element = root.find('.//div[@class="md"]')
     desc_div = desc_div_element if desc_div_element is not None else Element("div")
-    description = html2text(tostring(desc_div).decode("utf8"))
     code = root.findtext(".//pre", None)
     submit_link_element = root.find('.//a[.="Submit"]')
     submit_link = (
@@ -158,35 +733,137 @@ def parse_task(html: AnyStr) -> Task:
         ),
         None,
     )
+    time_limit, memory_limit = parse_limits(root)
     task = Task(
         id=task_id,
         name=task_name,
         state=TaskState.COMPLETE if "full" in task_span_class else TaskState.INCOMPLETE,
-        description=description.strip(),
+        description_html=to_string(desc_div),
         code=code,
         submit_file=submit_file,
         submit_link=submit_link,
+        time_limit=time_limit,
+        memory_limit=memory_limit,
     )
 
     return task
 
 
-# TODO test with failing results
-# Seems to be broken since the switch to html5lib, needs tests!
-def parse_submit_result(html: AnyStr) -> dict[str, str]:
-    root = html5lib.parse(html, namespaceHTMLElements=False)  # type: ignore[reportUnknownMemberType]
-    submit_status_element = root.find('.//td[.="Status:"]/..') or Element("td")
-    submit_status_span_element = submit_status_element.find("td/span") or Element(
-        "span"
-    )
-    submit_status = submit_status_span_element.text or ""
-    submit_result_element = root.find('.//td[.="Result:"]/..') or Element("td")
-    submit_result_span_element = submit_result_element.find("td/span") or Element(
-        "span"
-    )
-    submit_result = submit_result_span_element.text or ""
+def parse_limits(root: Element) -> tuple[Optional[float], Optional[int]]:
+    """Find the time limit in seconds and memory limit in MB of a task statement
 
-    return {
-        "status": submit_status.lower(),
-        "result": submit_result.lower(),
-    }
+    The CSES problem set lists them as "Time limit: 1.00 s" and
+    "Memory limit: 512 MB" above the statement, mooc.fi tasks don't have them.
+    """
+    time_limit: Optional[float] = None
+    memory_limit: Optional[int] = None
+    for element in root.iter("li"):
+        match = LIMIT_PATTERN.search("".join(element.itertext()))
+        if not match:
+            continue
+        value, unit = float(match["value"]), match["unit"].lower()
+        if match["kind"].lower() == "time":
+            time_limit = value / 1000 if unit == "ms" else value
+        elif unit in MEMORY_UNITS:
+            memory_limit = round(value * MEMORY_UNITS[unit])
+    return time_limit, memory_limit
+
+
+@dataclass
+class JudgedTest:
+    """One test of a submission, as the judge reported it"""
+
+    number: int
+    verdict: str
+    # Seconds, None when the test didn't finish
+    time: Optional[float] = None
+    memory_kib: Optional[int] = None
+
+
+@dataclass
+class SubmitResult:
+    status: str
+    result: str
+    tests: list[JudgedTest] = field(default_factory=list)
+
+    @property
+    def slowest(self) -> Optional[JudgedTest]:
+        """The first test that ran out of time, or else the one that took longest"""
+        for test in self.tests:
+            if test.verdict == TIME_LIMIT_EXCEEDED:
+                return test
+        timed = [test for test in self.tests if test.time is not None]
+        return max(timed, key=lambda test: test.time or 0.0) if timed else None
+
+    def headroom(self, time_limit: Optional[float]) -> Optional[float]:
+        """Seconds the slowest test stayed below time_limit
+
+        None when the time limit or the time of the slowest test is unknown, as
+        it is for a test that ran out of time.
+        """
+        slowest = self.slowest
+        if time_limit is None or slowest is None or slowest.time is None:
+            return None
+        return time_limit - slowest.time
+
+    def to_dict(self, time_limit: Optional[float] = None) -> dict[str, Any]:
+        slowest = self.slowest
+        return {
+            **asdict(self),
+            "slowest": slowest.number if slowest else None,
+            "time_limit": time_limit,
+            "headroom": self.headroom(time_limit),
+        }
+
+
+def parse_measure(text: str, units: dict[str, float], default: str) -> Optional[float]:
+    """Parse a value like "0.61 s" or "12 MB" in the unit a factor of 1 stands for"""
+    match = MEASURE_PATTERN.search(text)
+    if not match:
+        return None
+    unit = (match["unit"] or default).lower()
+    return float(match["value"]) * units[unit] if unit in units else None
+
+
+def parse_test_report(root: Element) -> list[JudgedTest]:
+    """Parse the table of tests on a result page, its columns are found by header"""
+    for table in root.iter("table"):
+        header = ["".join(th.itertext()).strip().lower() for th in table.iter("th")]
+        if "verdict" not in header:
+            continue
+        tests: list[JudgedTest] = list()
+        for row in table.iter("tr"):
+            cells = ["".join(td.itertext()).strip() for td in row.findall("td")]
+            if not cells:
+                continue
+            values = dict(zip(header, cells))
+            time = parse_measure(values.get("time", ""), {"s": 1, "ms": 1 / 1000}, "s")
+            memory = parse_measure(
+                values.get("memory", ""), {"kb": 1, "mb": 1024, "gb": 1024**2}, "kb"
+            )
+            tests.append(
+                JudgedTest(
+                    number=int(values.get("test", "").lstrip("#") or len(tests) + 1),
+                    verdict=values.get("verdict", "").lower(),
+                    time=time,
+                    memory_kib=None if memory is None else round(memory),
+                )
+            )
+        return tests
+    return list()
+
+
+@instrumented
+def parse_submit_result(html: HtmlSource) -> SubmitResult:
+    root = parse_html(html)
+
+    def summary_value(label: str) -> str:
+        row = root.find(f'.//td[.="{label}"]/..')
+        span = row.find("td/span") if row is not None else None
+        return (span.text or "") if span is not None else ""
+
+    return SubmitResult(
+        status=summary_value("Status:").lower(),
+        result=summary_value("Result:").lower(),
+        tests=parse_test_report(root),
+    )
@@ -0,0 +1,185 @@
+import contextlib
+import hashlib
+import io
+import json
+import logging
+import os
+import socket
+import socketserver
+import sys
+import threading
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Seconds the CLI waits for the daemon to accept a connection
+CONNECT_TIMEOUT = float(os.getenv("DAEMON_CONNECT_TIMEOUT", 0.2))
+# Cached task pages kept in memory by the daemon
+MEMORY_ENTRIES = int(os.getenv("DAEMON_MEMORY_ENTRIES", 1024))
+
+
+def send_message(sock: socket.socket, message: dict[str, Any]) -> None:
+    sock.sendall(json.dumps(message).encode() + b"\n")
+
+
+def receive_message(sock: socket.socket) -> Optional[dict[str, Any]]:
+    data = b""
+    while not data.endswith(b"\n"):
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        data += chunk
+    if not data:
+        return None
+    message: dict[str, Any] = json.loads(data)
+    return message
+
+
+def forward(socket_path: str, argv: list[str]) -> Optional[int]:
+    """Run a command in a running daemon, printing its output
+
+    Returns the exit code of the command, or None if no daemon is listening and
+    the command should run in this process.
+    """
+    if not hasattr(socket, "AF_UNIX") or not os.path.exists(socket_path):
+        return None
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(CONNECT_TIMEOUT)
+        try:
+            sock.connect(socket_path)
+        except OSError as e:
+            logger.debug(f"No daemon listening on {socket_path}: {e}")
+            return None
+        sock.settimeout(None)
+        send_message(sock, {"argv": argv, "cwd": os.getcwd()})
+        response = receive_message(sock)
+    if response is None:
+        logger.debug("Daemon closed the connection without a response")
+        return None
+    print(response["stdout"], end="")
+    print(response["stderr"], end="", file=sys.stderr)
+    exit_code: int = response["exit"]
+    return exit_code
+
+
+class CommandHandler(socketserver.StreamRequestHandler):
+    server: "DaemonServer"
+
+    def handle(self) -> None:
+        request = receive_message(self.connection)
+        if request is None:
+            return
+        send_message(self.connection, self.server.run(request["argv"], request["cwd"]))
+
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Runs forwarded tyora commands with clients that stay warm between commands
+
+    Clients are kept per course and account, with their connection pool, login
+    state and an in-memory layer on top of the response cache. Commands print
+    to stdout, which is captured per command, so they run one at a time.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str) -> None:
+        super().__init__(socket_path, CommandHandler)
+        self.clients: dict[tuple[Any, ...], Any] = dict()
+        self.lock = threading.Lock()
+
+    def run(self, argv: list[str], cwd: str) -> dict[str, Any]:
+        from . import tyora
+
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        exit_code = 0
+        with self.lock, contextlib.ExitStack() as stack:
+            stack.enter_context(contextlib.redirect_stdout(stdout))
+            stack.enter_context(contextlib.redirect_stderr(stderr))
+            previous_cwd = os.getcwd()
+            try:
+                os.chdir(cwd)
+                args = tyora.parse_args(argv)
+                if args.cmd not in tyora.DAEMON_COMMANDS:
+                    raise SystemExit(f"The daemon doesn't run {args.cmd} commands")
+                config = tyora.merge_config(args, tyora.read_config(args.config))
+                # Another account or a changed password needs a new login
+                password_hash = hashlib.sha256(config["password"].encode()).hexdigest()
+                key = (
+                    args.course,
+                    config["username"],
+                    password_hash,
+                    args.no_state,
+                    args.offline,
+                    args.config,
+                )
+                if key not in self.clients:
+                    self.clients[key] = tyora.create_client(
+                        args, config, memory_entries=MEMORY_ENTRIES
+                    )
+                client = self.clients[key]
+                try:
+                    tyora.run_command(args, client)
+                finally:
+                    tyora.save_state(client)
+            except SystemExit as e:
+                if isinstance(e.code, str):
+                    print(e.code, file=sys.stderr)
+                    exit_code = 1
+                else:
+                    exit_code = e.code or 0
+            except Exception as e:
+                logger.exception("Command failed")
+                print(f"tyora: {e}", file=sys.stderr)
+                exit_code = 1
+            finally:
+                os.chdir(previous_cwd)
+        return {
+            "stdout": stdout.getvalue(),
+            "stderr": stderr.getvalue(),
+            "exit": exit_code,
+        }
+
+    def server_close(self) -> None:
+        from . import tyora
+
+        super().server_close()
+        for client in self.clients.values():
+            tyora.close_client(client)
+
+
+def serve(socket_path: str) -> None:
+    """Listen for forwarded commands on a unix socket until interrupted"""
+    if not hasattr(socket, "AF_UNIX"):
+        raise SystemExit("The daemon needs unix socket support")
+    if os.path.exists(socket_path):
+        if is_listening(socket_path):
+            raise SystemExit(f"A daemon is already listening on {socket_path}")
+        os.unlink(socket_path)
+
+    os.makedirs(os.path.dirname(socket_path) or ".", exist_ok=True)
+    # Only the owner may connect, the daemon acts with the stored credentials
+    old_umask = os.umask(0o177)
+    try:
+        server = DaemonServer(socket_path)
+    finally:
+        os.umask(old_umask)
+    print(f"Listening on {socket_path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(socket_path)
+
+
+def is_listening(socket_path: str) -> bool:
+    """Check if a process accepts connections on the socket"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(CONNECT_TIMEOUT)
+        try:
+            sock.connect(socket_path)
+        except OSError:
+            return False
+    return True
@@ -0,0 +1,182 @@
+"""History of submissions and their results, in a SQLite database
+
+Every submission is recorded with the hash and source of the submitted file,
+its result is added once the judge finishes. Queries by task and by file hash
+are served from indexes, so looking up the history of a task or the last
+accepted version of a solution takes milliseconds even after years of
+submissions.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Optional, Union
+
+if TYPE_CHECKING:
+    from .client import SubmitResult
+
+logger = logging.getLogger(__name__)
+
+# Results of the judge that mean the solution passed all tests
+PASSING_RESULTS = ("accepted",)
+# Seconds SQLite waits for a write of another process before giving up
+BUSY_TIMEOUT = 10.0
+
+COLUMNS = (
+    "id",
+    "course",
+    "task_id",
+    "filename",
+    "file_hash",
+    "submitted_at",
+    "result_url",
+    "status",
+    "result",
+    "tests",
+    "code",
+)
+
+
+@dataclass
+class Submission:
+    course: str
+    task_id: str
+    filename: Optional[str]
+    file_hash: str
+    submitted_at: float
+    result_url: str
+    status: str = "submitted"
+    result: str = ""
+    tests: Optional[list[dict[str, Any]]] = None
+    code: Optional[str] = None
+    id: Optional[int] = None
+
+    @property
+    def passed(self) -> bool:
+        return self.result in PASSING_RESULTS
+
+
+class SubmissionHistory:
+    """Submissions of all courses, newest first in every query"""
+
+    def __init__(self, path: Union[Path, str]) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._open_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        # Opened on first use, commands that never submit don't pay for it
+        return self._db if self._db is not None else self._open()
+
+    def _open(self) -> sqlite3.Connection:
+        with self._open_lock:
+            if self._db is None:
+                self._db = self._create()
+            return self._db
+
+    def _create(self) -> sqlite3.Connection:
+        db = sqlite3.connect(
+            str(self.path), timeout=BUSY_TIMEOUT, check_same_thread=False
+        )
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS submissions ("
+            "id INTEGER PRIMARY KEY, course TEXT NOT NULL, task_id TEXT NOT NULL, "
+            "filename TEXT, file_hash TEXT NOT NULL, submitted_at REAL NOT NULL, "
+            "result_url TEXT NOT NULL, status TEXT NOT NULL, result TEXT NOT NULL, "
+            "tests TEXT, code TEXT)"
+        )
+        db.execute(
+            "CREATE INDEX IF NOT EXISTS submissions_task "
+            "ON submissions (course, task_id, submitted_at)"
+        )
+        db.execute(
+            "CREATE INDEX IF NOT EXISTS submissions_file "
+            "ON submissions (course, task_id, file_hash, submitted_at)"
+        )
+        db.execute(
+            "CREATE INDEX IF NOT EXISTS submissions_result_url "
+            "ON submissions (result_url)"
+        )
+        db.commit()
+        return db
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def record(self, submission: Submission) -> int:
+        """Add a submission, returns its id"""
+        values = {
+            **vars(submission),
+            "tests": None if submission.tests is None else json.dumps(submission.tests),
+        }
+        del values["id"]
+        with self._lock, self.db:
+            cursor = self.db.execute(
+                f"INSERT INTO submissions ({', '.join(values)}) "
+                f"VALUES ({', '.join('?' * len(values))})",
+                tuple(values.values()),
+            )
+        submission.id = cursor.lastrowid
+        return submission.id or 0
+
+    def update_result(self, result_url: str, result: "SubmitResult") -> None:
+        """Store the result the judge gave the submission at result_url"""
+        tests = json.dumps([asdict(test) for test in result.tests])
+        with self._lock, self.db:
+            self.db.execute(
+                "UPDATE submissions SET status = ?, result = ?, tests = ? "
+                "WHERE result_url = ?",
+                (result.status, result.result, tests, result_url),
+            )
+
+    def _select(
+        self, where: str, params: tuple[Any, ...], limit: int
+    ) -> list[Submission]:
+        with self._lock:
+            rows = self.db.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM submissions WHERE {where} "
+                "ORDER BY submitted_at DESC, id DESC LIMIT ?",
+                params + (limit,),
+            ).fetchall()
+        submissions = list()
+        for row in rows:
+            values = dict(zip(COLUMNS, row))
+            if values["tests"] is not None:
+                values["tests"] = json.loads(values["tests"])
+            submissions.append(Submission(**values))
+        return submissions
+
+    def for_task(
+        self, course: str, task_id: Optional[str] = None, limit: int = 20
+    ) -> list[Submission]:
+        """Return the latest submissions of a task, or of all tasks of a course"""
+        if task_id is None:
+            return self._select("course = ?", (course,), limit)
+        return self._select("course = ? AND task_id = ?", (course, task_id), limit)
+
+    def find(self, course: str, task_id: str, file_hash: str) -> Optional[Submission]:
+        """Return the latest submission of the very same file to a task"""
+        found = self._select(
+            "course = ? AND task_id = ? AND file_hash = ?",
+            (course, task_id, file_hash),
+            1,
+        )
+        return found[0] if found else None
+
+    def last_passing(self, course: str, task_id: str) -> Optional[Submission]:
+        """Return the latest submission of a task the judge accepted"""
+        found = self._select(
+            "course = ? AND task_id = ? "
+            f"AND result IN ({', '.join('?' * len(PASSING_RESULTS))})",
+            (course, task_id) + PASSING_RESULTS,
+            1,
+        )
+        return found[0] if found else None
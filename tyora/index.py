@@ -0,0 +1,170 @@
+import hashlib
+import html
+import logging
+import re
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Union
+
+from .client import Task
+
+logger = logging.getLogger(__name__)
+
+TAG_PATTERN = re.compile(r"<[^>]*>")
+
+
+@dataclass
+class SearchResult:
+    course: str
+    id: str
+    name: str
+    snippet: str
+
+
+def task_hash(task: Task) -> str:
+    """Return a hash of the searchable content of a task
+
+    Uses the description html when the task has it, so checking if a task
+    changed doesn't need its markdown.
+    """
+    description = task.description_html or task.description or ""
+    content = "\0".join((task.name, description, task.code or ""))
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def task_text(task: Task) -> str:
+    """Return the description of a task as plain text for the index
+
+    Strips the tags of the description html instead of rendering its markdown,
+    which is much slower and only adds formatting search doesn't look at.
+    """
+    if task.description_html is None:
+        return task.description or ""
+    text = html.unescape(TAG_PATTERN.sub(" ", task.description_html))
+    return " ".join(text.split())
+
+
+def fts_query(query: str) -> str:
+    """Turn free text into an FTS5 query matching all words, ignoring its syntax"""
+    return " ".join('"' + word.replace('"', '""') + '"' for word in query.split())
+
+
+class TaskIndex:
+    """Full-text index of task statements in a SQLite database
+
+    Uses FTS5 when SQLite was built with it, plain LIKE queries otherwise.
+    """
+
+    def __init__(self, path: Union[Path, str]) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._open_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._fts = False
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        # Opened on first use, commands that never search don't pay for it
+        return self._db if self._db is not None else self._open()
+
+    def _open(self) -> sqlite3.Connection:
+        with self._open_lock:
+            if self._db is None:
+                self._db = self._create()
+            return self._db
+
+    def _create(self) -> sqlite3.Connection:
+        db = sqlite3.connect(str(self.path), check_same_thread=False)
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "course TEXT, id TEXT, name TEXT, description TEXT, code TEXT, hash TEXT, "
+            "PRIMARY KEY (course, id))"
+        )
+        try:
+            db.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5("
+                "course UNINDEXED, id UNINDEXED, name, description, code)"
+            )
+            self._fts = True
+        except sqlite3.OperationalError as e:
+            logger.debug(f"No FTS5 support, falling back to LIKE queries: {e}")
+            self._fts = False
+        db.commit()
+        return db
+
+    @property
+    def fts(self) -> bool:
+        """Whether SQLite has FTS5, found out when the database is opened"""
+        if self._db is None:
+            self._open()
+        return self._fts
+
+    @fts.setter
+    def fts(self, fts: bool) -> None:
+        # Opened first, so opening it later doesn't undo this
+        if self._db is None:
+            self._open()
+        self._fts = fts
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def update(self, course: str, task: Task) -> bool:
+        """Add or refresh a task in the index, returns False if it was unchanged"""
+        content_hash = task_hash(task)
+        with self._lock, self.db:
+            row = self.db.execute(
+                "SELECT hash FROM tasks WHERE course = ? AND id = ?", (course, task.id)
+            ).fetchone()
+            if row and row[0] == content_hash:
+                return False
+            values = (course, task.id, task.name, task_text(task), task.code)
+            self.db.execute(
+                "INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?, ?)",
+                values + (content_hash,),
+            )
+            if self.fts:
+                self.db.execute(
+                    "DELETE FROM tasks_fts WHERE course = ? AND id = ?",
+                    (course, task.id),
+                )
+                self.db.execute("INSERT INTO tasks_fts VALUES (?, ?, ?, ?, ?)", values)
+        logger.debug(f"Indexed task {task.id} of {course}")
+        return True
+
+    def search(
+        self, query: str, course: Optional[str] = None, limit: int = 20
+    ) -> list[SearchResult]:
+        """Find tasks containing all words of query, best matches first"""
+        if not query.split():
+            return list()
+        if self.fts:
+            sql = (
+                "SELECT course, id, name, "
+                "snippet(tasks_fts, 3, '[', ']', '...', 12) FROM tasks_fts "
+                "WHERE tasks_fts MATCH ?"
+            )
+            params: list[Union[str, int]] = [fts_query(query)]
+        else:
+            sql = (
+                "SELECT course, id, name, substr(description, 1, 80) FROM tasks WHERE 1"
+            )
+            params = list()
+            for word in query.split():
+                sql += (
+                    " AND (name || ' ' || coalesce(description, '') || ' ' || "
+                    "coalesce(code, '')) LIKE ?"
+                )
+                params.append(f"%{word}%")
+        if course:
+            sql += " AND course = ?"
+            params.append(course)
+        sql += " ORDER BY rank LIMIT ?" if self.fts else " LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self.db.execute(sql, params).fetchall()
+        return [SearchResult(*row) for row in rows]
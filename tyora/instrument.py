@@ -0,0 +1,128 @@
+"""Timing hooks for requests and parsing
+
+Library users register a listener with add_listener to receive an Event for
+every HTTP request the session makes and every page parse. Recorder is a
+listener that keeps the events for the --profile summary and --trace file.
+"""
+
+import functools
+import json
+import logging
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Optional, TextIO, TypeVar
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+@dataclass
+class Event:
+    kind: str
+    name: str
+    start: float
+    duration: float
+    status: Optional[int] = None
+    bytes: Optional[int] = None
+    redirects: Optional[int] = None
+    thread: str = field(default_factory=lambda: threading.current_thread().name)
+
+
+Listener = Callable[[Event], None]
+listeners: list[Listener] = list()
+
+
+def add_listener(listener: Listener) -> None:
+    listeners.append(listener)
+
+
+def remove_listener(listener: Listener) -> None:
+    listeners.remove(listener)
+
+
+def emit(event: Event) -> None:
+    for listener in list(listeners):
+        try:
+            listener(event)
+        except Exception:
+            logger.exception(f"Instrumentation listener {listener} failed")
+
+
+def instrumented(func: F) -> F:
+    """Emit a parse event with the duration of every call of func"""
+
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        if not listeners:
+            return func(*args, **kwargs)
+        start = time.time()
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            emit(
+                Event(
+                    kind="parse",
+                    name=func.__name__,
+                    start=start,
+                    duration=time.perf_counter() - started,
+                )
+            )
+
+    return wrapper  # type: ignore[return-value]
+
+
+class Recorder:
+    """Listener that keeps all events, to summarize or dump them afterwards"""
+
+    def __init__(self) -> None:
+        self.events: list[Event] = list()
+        self._lock = threading.Lock()
+
+    def __call__(self, event: Event) -> None:
+        with self._lock:
+            self.events.append(event)
+
+    def __enter__(self) -> "Recorder":
+        add_listener(self)
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        remove_listener(self)
+
+    def write_trace(self, f: TextIO) -> None:
+        json.dump([asdict(event) for event in self.events], f, indent=2)
+
+    def print_summary(self, f: TextIO) -> None:
+        requests = [event for event in self.events if event.kind == "request"]
+        print(
+            f"{'request':<60} {'status':>6} {'ms':>8} {'bytes':>9} {'redir':>5}", file=f
+        )
+        for event in requests:
+            print(
+                f"{event.name[:60]:<60} {event.status or '':>6} "
+                f"{event.duration * 1000:>8.1f} {event.bytes or 0:>9} "
+                f"{event.redirects or 0:>5}",
+                file=f,
+            )
+
+        parses: dict[str, list[float]] = dict()
+        for event in self.events:
+            if event.kind == "parse":
+                parses.setdefault(event.name, list()).append(event.duration)
+        print(f"\n{'parse':<30} {'calls':>6} {'total ms':>9} {'max ms':>8}", file=f)
+        for name, durations in parses.items():
+            print(
+                f"{name:<30} {len(durations):>6} {sum(durations) * 1000:>9.1f} "
+                f"{max(durations) * 1000:>8.1f}",
+                file=f,
+            )
+
+        total = sum(event.duration for event in requests)
+        print(
+            f"\n{len(requests)} requests, {total * 1000:.1f} ms, "
+            f"{sum(event.bytes or 0 for event in requests)} bytes",
+            file=f,
+        )
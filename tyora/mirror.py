@@ -0,0 +1,215 @@
+"""Offline mirror of a course, kept in the state store
+
+`tyora sync` stores the task list and every task of a course, so `list`,
+`show` and `search` work without the site. A course is stored as:
+
+- `mirror/v<format>/<course>`: the revision, which is bumped by every sync
+  that changed something, and the task list
+- `mirror/v<format>/<course>/task/<id>`: a task with the revision it last
+  changed in, and the validators and body hash of its page
+
+A new layout gets a new format version, mirrors in older ones are ignored and
+synced anew.
+
+Syncing again only downloads tasks that are new or older than the max age,
+with conditional requests, and only parses pages whose body changed.
+"""
+
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Optional, Union
+from urllib.parse import urljoin
+
+from .cache import CACHE_TASK_TTL, body_hash, conditional_headers
+from .client import MAX_WORKERS, Task, parse_task, parse_task_list
+
+if TYPE_CHECKING:
+    from .client import Client
+    from .state import StateStore
+
+logger = logging.getLogger(__name__)
+
+MIRROR_FORMAT = 1
+# Seconds a mirrored task is kept without asking the server if it changed
+MIRROR_MAX_AGE = int(os.getenv("MIRROR_MAX_AGE", CACHE_TASK_TTL))
+
+
+class Mirror:
+    """The mirrored tasks of a course"""
+
+    def __init__(self, path: Union[Path, str], course: str) -> None:
+        self.path = path
+        self.course = course
+        self._store: Optional[StateStore] = None
+
+    @property
+    def store(self) -> "StateStore":
+        # Opened on first use, commands that never need the mirror don't pay for it
+        if self._store is None:
+            from .state import StateStore
+
+            self._store = StateStore(self.path)
+        return self._store
+
+    def close(self) -> None:
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+
+    def _key(self, task_id: Optional[str] = None) -> str:
+        key = f"mirror/v{MIRROR_FORMAT}/{self.course}"
+        return key if task_id is None else f"{key}/task/{task_id}"
+
+    def info(self) -> dict[str, Any]:
+        """Return the revision, sync time and task list of the mirror"""
+        return self.store.get(self._key(), {"revision": 0, "tasks": []})
+
+    def entry(self, task_id: str) -> Optional[dict[str, Any]]:
+        return self.store.get(self._key(task_id))
+
+    def task_list(self) -> Optional[list[Task]]:
+        """Return the mirrored task list, None if the course was never synced"""
+        info = self.info()
+        if not info["revision"]:
+            return None
+        return [Task.from_dict(task) for task in info["tasks"]]
+
+    def task(self, task_id: str) -> Optional[Task]:
+        entry = self.entry(task_id)
+        return Task.from_dict(entry["task"]) if entry else None
+
+    def save(
+        self,
+        task_list: list[Task],
+        entries: dict[str, dict[str, Any]],
+        removed: list[str],
+        changed: bool = True,
+    ) -> int:
+        """Store a synced task list and task entries, returns the revision"""
+        with self.store.locked():
+            info = self.info()
+            revision = info["revision"] + 1 if changed else info["revision"]
+            for entry in entries.values():
+                entry.setdefault("revision", revision)
+            values = {self._key(task_id): entry for task_id, entry in entries.items()}
+            values[self._key()] = {
+                "revision": revision,
+                "synced_at": time.time(),
+                "tasks": [task.to_dict() for task in task_list],
+            }
+            self.store.update(values)
+            for task_id in removed:
+                self.store.delete(self._key(task_id))
+        return revision
+
+
+@dataclass
+class SyncResult:
+    revision: int
+    added: list[str] = field(default_factory=list)
+    changed: list[str] = field(default_factory=list)
+    unchanged: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    failed: list[str] = field(default_factory=list)
+    # Task pages actually downloaded, not answered with 304 Not Modified
+    downloaded: int = 0
+
+
+def sync_course(
+    client: "Client",
+    mirror: Mirror,
+    refresh: bool = False,
+    max_age: float = MIRROR_MAX_AGE,
+    max_workers: int = MAX_WORKERS,
+) -> SyncResult:
+    """Bring the mirror of the client's course up to date
+
+    The task list is always fetched, tasks are fetched when they're new, older
+    than max_age or refresh is given. Completion states come from the list, so
+    they're up to date without fetching the tasks.
+    """
+    # From the site itself, the client would fall back to the mirror
+    list_url = urljoin(client.session.base_url, "list")
+    task_list = parse_task_list(client.session.get_page(list_url).text)
+    now = time.time()
+    old_ids = {task.id for task in mirror.task_list() or []}
+    entries = {task.id: mirror.entry(task.id) for task in task_list}
+    result = SyncResult(revision=0)
+
+    def fetch(task_id: str) -> tuple[Optional[dict[str, Any]], bool]:
+        """Return the new entry of a task, and if its page was downloaded"""
+        entry = entries[task_id]
+        url = urljoin(client.session.base_url, f"task/{task_id}")
+        headers = (
+            conditional_headers(entry.get("etag"), entry.get("last_modified"))
+            if entry
+            else None
+        )
+        res = client.session.get_page(url, headers=headers)
+        if entry and res.status_code == 304:
+            return {**entry, "fetched_at": now}, False
+        new_body_hash = body_hash(res.text)
+        if entry and entry.get("body_hash") == new_body_hash:
+            return {**entry, "fetched_at": now}, True
+        task = parse_task(res.text)
+        if client.index:
+            client.index.update(client.session.base_url, task)
+        return {
+            "task": task.to_dict(),
+            "etag": res.headers.get("ETag"),
+            "last_modified": res.headers.get("Last-Modified"),
+            "body_hash": new_body_hash,
+            "fetched_at": now,
+        }, True
+
+    def fetch_or_keep(task_id: str) -> tuple[Optional[dict[str, Any]], bool]:
+        # On a flaky connection what did sync is kept, failed tasks are retried
+        # by the next sync
+        try:
+            return fetch(task_id)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to sync task {task_id}: {e}")
+            result.failed.append(task_id)
+            return entries[task_id], False
+
+    def is_stale(entry: Optional[dict[str, Any]]) -> bool:
+        return refresh or entry is None or now - entry["fetched_at"] >= max_age
+
+    stale = [task.id for task in task_list if is_stale(entries[task.id])]
+    fetched: dict[str, Optional[dict[str, Any]]] = dict()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for task_id, (entry, downloaded) in zip(
+            stale, executor.map(fetch_or_keep, stale)
+        ):
+            fetched[task_id] = entry
+            result.downloaded += downloaded
+
+    new_entries: dict[str, dict[str, Any]] = dict()
+    for task in task_list:
+        old = entries[task.id]
+        entry = fetched.get(task.id, old)
+        if entry is None:
+            continue
+        # Names and completion come from the list, without fetching the task
+        listed = {"name": task.name, "state": task.state.value}
+        if any(entry["task"].get(k) != v for k, v in listed.items()):
+            entry = {**entry, "task": {**entry["task"], **listed}}
+        if old is None or entry["task"] != old["task"]:
+            (result.changed if old else result.added).append(task.id)
+            # Stamped with the new revision when saved
+            entry = {k: v for k, v in entry.items() if k != "revision"}
+        else:
+            result.unchanged.append(task.id)
+        if entry is not old:
+            new_entries[task.id] = entry
+    result.removed = sorted(old_ids - {task.id for task in task_list})
+
+    changed = bool(result.added or result.changed or result.removed)
+    result.revision = mirror.save(
+        task_list, new_entries, result.removed, changed or not old_ids
+    )
+    return result
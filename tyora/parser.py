@@ -0,0 +1,273 @@
+"""Pluggable HTML parsing
+
+All page parsing goes through parse_html, which builds an ElementTree compatible
+tree with the fastest available backend:
+
+- lxml, when it is installed
+- html.parser, a tree builder on top of the standard library's HTMLParser
+- html5lib, the slow but spec compliant fallback
+
+The backend can be forced with the TYORA_PARSER environment variable. Parsed
+trees are memoized per document, so the same response body is parsed only once
+even when several helpers look at it. Callers must not modify returned trees.
+
+iter_elements parses incrementally instead, yielding elements as soon as they
+are closed, for callers that may stop before the end of the document.
+"""
+
+import logging
+import os
+from functools import lru_cache
+from html.parser import HTMLParser
+from typing import Any, AnyStr, Callable, Iterator, Optional, Union
+from xml.etree.ElementTree import Element, SubElement, tostring
+
+from .instrument import instrumented
+
+logger = logging.getLogger(__name__)
+
+# Either raw html or a tree returned by parse_html
+HtmlSource = Union[str, bytes, Element, Any]
+
+PARSER = os.getenv("TYORA_PARSER", "")
+# Characters fed to an incremental parser at a time
+CHUNK_SIZE = 8192
+
+VOID_ELEMENTS = frozenset(
+    (
+        "area",
+        "base",
+        "br",
+        "col",
+        "embed",
+        "hr",
+        "img",
+        "input",
+        "link",
+        "meta",
+        "param",
+        "source",
+        "track",
+        "wbr",
+    )
+)
+# Start tags that implicitly close an open <p>
+CLOSES_P = frozenset(
+    (
+        "address",
+        "article",
+        "aside",
+        "blockquote",
+        "div",
+        "dl",
+        "fieldset",
+        "footer",
+        "form",
+        "h1",
+        "h2",
+        "h3",
+        "h4",
+        "h5",
+        "h6",
+        "header",
+        "hr",
+        "li",
+        "nav",
+        "ol",
+        "p",
+        "pre",
+        "section",
+        "table",
+        "ul",
+    )
+)
+# Start tags that implicitly close an open element of the same kind, up to the
+# first element in the list of boundaries
+IMPLIED_END = {
+    "li": ("li", ("ul", "ol")),
+    "dt": ("dt", ("dl",)),
+    "dd": ("dd", ("dl",)),
+    "tr": ("tr", ("table",)),
+    "td": ("td", ("tr", "table")),
+    "th": ("th", ("tr", "table")),
+    "option": ("option", ("select",)),
+    "a": ("a", ()),
+}
+
+
+class TreeBuilder(HTMLParser):
+    """Build an ElementTree from html, handling the implied end tags CSES relies on"""
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.root = Element("html")
+        self.stack: list[Element] = [self.root]
+        # When a list, elements are added to it as they're closed
+        self.closed: Optional[list[Element]] = None
+
+    def _close(self, tag: str, boundaries: tuple[str, ...] = ()) -> None:
+        for i in range(len(self.stack) - 1, 0, -1):
+            open_tag = self.stack[i].tag
+            if open_tag == tag:
+                if self.closed is not None:
+                    self.closed.extend(reversed(self.stack[i:]))
+                del self.stack[i:]
+                return
+            if open_tag in boundaries:
+                return
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, Any]]) -> None:
+        attrib = {key: value or "" for key, value in attrs}
+        if tag == "html":
+            self.root.attrib.update(attrib)
+            return
+        if tag in CLOSES_P:
+            self._close("p", ("button", "caption", "table", "td", "th"))
+        if tag in IMPLIED_END:
+            self._close(*IMPLIED_END[tag])
+
+        element = SubElement(self.stack[-1], tag, attrib)
+        if tag not in VOID_ELEMENTS:
+            self.stack.append(element)
+
+    def handle_startendtag(self, tag: str, attrs: list[tuple[str, Any]]) -> None:
+        # Like browsers, ignore the self-closing flag on non-void elements
+        self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag not in VOID_ELEMENTS:
+            self._close(tag)
+
+    def handle_data(self, data: str) -> None:
+        parent = self.stack[-1]
+        if len(parent):
+            last = parent[-1]
+            last.tail = (last.tail or "") + data
+        else:
+            # The newline directly after <pre> isn't part of its content
+            if parent.tag == "pre" and parent.text is None and data.startswith("\n"):
+                data = data[1:]
+            parent.text = (parent.text or "") + data
+
+
+def _parse_stdlib(html: AnyStr) -> Element:
+    builder = TreeBuilder()
+    builder.feed(html.decode("utf8") if isinstance(html, bytes) else html)
+    builder.close()
+    return builder.root
+
+
+def _iter_stdlib(html: Union[str, bytes], tag: str) -> Iterator[Element]:
+    builder = TreeBuilder()
+    builder.closed = list()
+    text = html.decode("utf8") if isinstance(html, bytes) else html
+    for chunk in _chunks(text):
+        builder.feed(chunk)
+        yield from (element for element in builder.closed if element.tag == tag)
+        builder.closed.clear()
+    builder.close()
+    # Elements the document left open end with it
+    yield from (element for element in reversed(builder.stack) if element.tag == tag)
+
+
+def _iter_lxml(html: Union[str, bytes], tag: str) -> Iterator[Any]:
+    import lxml.etree
+
+    if not html.strip():
+        return
+    parser = lxml.etree.HTMLPullParser(events=("end",), tag=tag)
+    chunks = _chunks(html) if isinstance(html, str) else _chunks(html)
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from (element for _, element in parser.read_events())
+    parser.close()
+    yield from (element for _, element in parser.read_events())
+
+
+def _chunks(html: AnyStr) -> Iterator[AnyStr]:
+    for start in range(0, len(html), CHUNK_SIZE):
+        yield html[start : start + CHUNK_SIZE]
+
+
+def _parse_lxml(html: AnyStr) -> Any:
+    import lxml.html
+
+    # lxml refuses empty documents, the other backends give an empty tree
+    if not html.strip():
+        return lxml.html.Element("html")
+    return lxml.html.document_fromstring(html)
+
+
+def _parse_html5lib(html: AnyStr) -> Element:
+    import html5lib
+
+    return html5lib.parse(html, namespaceHTMLElements=False)  # type: ignore[reportUnknownMemberType]
+
+
+PARSERS: dict[str, Callable[[AnyStr], Any]] = {
+    "lxml": _parse_lxml,
+    "html.parser": _parse_stdlib,
+    "html5lib": _parse_html5lib,
+}
+
+
+@lru_cache(maxsize=None)
+def get_backend(name: str = "") -> str:
+    """Return the name of the requested backend, or the fastest usable one"""
+    name = name or PARSER
+    if name:
+        if name not in PARSERS:
+            raise ValueError(f"Unknown parser backend: {name}")
+        return name
+    try:
+        import lxml.html  # noqa: F401
+    except ImportError:
+        return "html.parser"
+    return "lxml"
+
+
+@instrumented
+def build_tree(html: AnyStr, backend: str) -> Any:
+    logger.debug(f"Parsing {len(html)} characters of html with {backend}")
+    return PARSERS[backend](html)
+
+
+@lru_cache(maxsize=8)
+def _parse_cached(html: AnyStr, backend: str) -> Any:
+    return build_tree(html, backend)
+
+
+def parse_html(html: HtmlSource, backend: str = "") -> Any:
+    """Parse html into an ElementTree compatible tree, trees are passed through"""
+    if not isinstance(html, (str, bytes)):
+        return html
+    return _parse_cached(html, get_backend(backend))
+
+
+def to_string(element: Any) -> str:
+    """Serialize an element of any backend back into html"""
+    if isinstance(element, Element):
+        return tostring(element).decode("utf8")
+    import lxml.html
+
+    return lxml.html.tostring(element, encoding="unicode")
+
+
+def iter_elements(html: HtmlSource, tag: str, backend: str = "") -> Iterator[Any]:
+    """Yield the elements with tag as they're parsed, each once it's closed
+
+    Raw html is fed to the parser in chunks, so stopping early skips parsing the
+    rest of the document. html5lib can't parse incrementally, with it and for
+    trees the whole document is searched.
+    """
+    if not isinstance(html, (str, bytes)):
+        yield from html.iter(tag)
+        return
+    backend = get_backend(backend)
+    logger.debug(f"Parsing {tag} elements of {len(html)} characters with {backend}")
+    if backend == "lxml":
+        yield from _iter_lxml(html, tag)
+    elif backend == "html.parser":
+        yield from _iter_stdlib(html, tag)
+    else:
+        yield from parse_html(html, backend).iter(tag)
@@ -0,0 +1,154 @@
+"""Clients for many accounts and courses in one process
+
+A SessionPool holds a client per (username, course). All of them share one
+connection pool to the site and one transport policy, so the rate limit covers
+the whole pool. Each key keeps its own cookies and login state in the state
+store, and its own response cache, so a key logs in only when its stored login
+expired.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Generic, Iterable, Iterator, Optional, TypeVar
+from urllib.parse import quote, urljoin
+
+from requests.adapters import HTTPAdapter
+
+from .cache import ResponseCache
+from .client import MAX_WORKERS, Client
+from .session import MAX_HOST_CONNECTIONS, MoocfiCsesSession
+from .state import StateStore
+from .transport import TransportPolicy
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+# (username, course)
+PoolKey = tuple[str, str]
+
+
+@dataclass
+class PoolResult(Generic[T]):
+    key: PoolKey
+    value: Optional[T] = None
+    error: Optional[Exception] = None
+
+
+class SessionPool:
+    def __init__(
+        self,
+        site_url: str,
+        state_dir: Optional[Path] = None,
+        policy: Optional[TransportPolicy] = None,
+        max_workers: int = MAX_WORKERS,
+    ) -> None:
+        self.site_url = site_url
+        self.state_dir = state_dir
+        self.policy = policy or TransportPolicy()
+        self.max_workers = max_workers
+        self.adapter = HTTPAdapter(pool_maxsize=max(MAX_HOST_CONNECTIONS, max_workers))
+        self.clients: dict[PoolKey, Client] = dict()
+        self._lock = threading.Lock()
+        self._store: Optional[StateStore] = None
+
+    @property
+    def store(self) -> StateStore:
+        assert self.state_dir is not None
+        if self._store is None:
+            self.state_dir.mkdir(parents=True, exist_ok=True)
+            self._store = StateStore(self.state_dir / "state.db")
+        return self._store
+
+    def _key_dir(self, key: PoolKey) -> Optional[Path]:
+        if self.state_dir is None:
+            return None
+        username, course = key
+        return self.state_dir / "pool" / quote(f"{username}@{course}", safe="@.-_+")
+
+    def add(self, username: str, password: str, course: str) -> Client:
+        """Create the client for an account in a course, restoring its stored state"""
+        key = (username, course)
+        cookies: dict[str, str] = dict()
+        logged_in_until = 0.0
+        cache = None
+        key_dir = self._key_dir(key)
+        if key_dir is not None:
+            key_dir.mkdir(parents=True, exist_ok=True)
+            state = self.store.get(f"pool/{username}@{course}", {})
+            cookies = state.get("cookies", {})
+            logged_in_until = float(state.get("logged_in_until", 0.0))
+            cache = ResponseCache(key_dir / "cache")
+
+        session = MoocfiCsesSession(
+            base_url=urljoin(self.site_url, f"{course}/"),
+            cookies=cookies,
+            username=username,
+            password=password,
+            logged_in_until=logged_in_until,
+            policy=self.policy,
+            adapter=self.adapter,
+        )
+        client = Client(session, cache=cache)
+        with self._lock:
+            self.clients[key] = client
+        return client
+
+    def client(self, username: str, course: str) -> Client:
+        return self.clients[(username, course)]
+
+    def run(
+        self,
+        operation: Callable[[Client], T],
+        keys: Optional[Iterable[PoolKey]] = None,
+    ) -> Iterator[PoolResult[T]]:
+        """Run operation with the client of every key concurrently
+
+        Results are yielded as the operations finish. A failing operation yields
+        its exception as the error of its result instead of stopping the others.
+        """
+        keys = list(self.clients) if keys is None else list(keys)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(operation, self.clients[key]): key for key in keys
+            }
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    result = PoolResult(key, value=future.result())
+                except Exception as e:
+                    logger.warning(f"Operation for {key[0]} in {key[1]} failed: {e}")
+                    result = PoolResult(key, error=e)
+                yield result
+
+    def save(self) -> None:
+        """Store the cookies and login state of every key"""
+        if self._store is None:
+            return
+        self._store.update(
+            {
+                f"pool/{username}@{course}": {
+                    "cookies": client.session.cookies.get_dict(),
+                    "logged_in_until": client.session.logged_in_until,
+                }
+                for (username, course), client in list(self.clients.items())
+            }
+        )
+
+    def close(self) -> None:
+        self.save()
+        for client in self.clients.values():
+            client.session.close()
+        self.adapter.close()
+        if self._store is not None:
+            self._store.close()
+
+    def __enter__(self) -> SessionPool:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
@@ -0,0 +1,172 @@
+"""Run solutions locally against the samples of a task
+
+Samples come in two forms:
+
+- input and output blocks, like in the CSES problem set, where the solution
+  reads the input from stdin
+- `print(expression) # expected` lines in the code template, like in the
+  mooc.fi courses, where the expression is evaluated with the functions the
+  solution defines
+
+Every run is a separate Python process, which reports its own CPU time and
+peak memory use when it finishes.
+"""
+
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+from .client import MAX_WORKERS, Task
+from .parser import parse_html
+
+# Seconds a single sample may run before it's stopped
+RUN_TIMEOUT = float(os.getenv("RUN_TIMEOUT", 5))
+
+SAMPLE_LINE = re.compile(r"^\s*print\((?P<expression>.+)\)\s*#\s*(?P<expected>.+?)\s*$")
+
+# Runs the solution in the child process and writes its resource usage to a pipe
+HARNESS = """
+import json, os, runpy, sys
+solution, expression, report_fd = sys.argv[1], sys.argv[2], int(sys.argv[3])
+try:
+    if expression:
+        print(eval(expression, runpy.run_path(solution)))
+    else:
+        sys.argv = [solution]
+        runpy.run_path(solution, run_name="__main__")
+finally:
+    sys.stdout.flush()
+    try:
+        import resource
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        report = [usage.ru_utime + usage.ru_stime, usage.ru_maxrss]
+    except ImportError:
+        report = [None, None]
+    os.write(report_fd, json.dumps(report).encode())
+"""
+
+
+@dataclass
+class Sample:
+    name: str
+    expected: str
+    stdin: str = ""
+    expression: Optional[str] = None
+
+
+@dataclass
+class RunResult:
+    sample: Sample
+    verdict: str
+    output: str
+    wall_time: float
+    cpu_time: Optional[float] = None
+    max_rss_kib: Optional[int] = None
+    stderr: str = ""
+
+    @property
+    def passed(self) -> bool:
+        return self.verdict == "PASS"
+
+
+def extract_samples(task: Task) -> list[Sample]:
+    """Find the samples in the statement of a task"""
+    samples: list[Sample] = list()
+
+    if task.description_html:
+        label = ""
+        stdin: Optional[str] = None
+        for element in parse_html(task.description_html).iter():
+            if element.tag == "p":
+                label = "".join(element.itertext()).strip().rstrip(":").lower()
+            elif element.tag == "pre" and label == "input":
+                stdin = "".join(element.itertext())
+            elif element.tag == "pre" and label == "output" and stdin is not None:
+                expected = "".join(element.itertext())
+                samples.append(Sample(f"#{len(samples) + 1}", expected, stdin=stdin))
+                stdin = None
+
+    for line in (task.code or "").splitlines():
+        match = SAMPLE_LINE.match(line)
+        if match:
+            samples.append(
+                Sample(
+                    match["expression"],
+                    match["expected"],
+                    expression=match["expression"],
+                )
+            )
+    return samples
+
+
+def outputs_match(output: str, expected: str) -> bool:
+    """Compare like a judge does, ignoring differences in whitespace"""
+    return output.split() == expected.split()
+
+
+def run_sample(
+    solution: str, sample: Sample, timeout: float = RUN_TIMEOUT
+) -> RunResult:
+    """Run a solution on one sample in a new Python process"""
+    report_read, report_write = os.pipe()
+    start = time.perf_counter()
+    try:
+        proc = subprocess.Popen(
+            [
+                sys.executable,
+                "-c",
+                HARNESS,
+                solution,
+                sample.expression or "",
+                str(report_write),
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            pass_fds=(report_write,),
+            cwd=os.path.dirname(os.path.abspath(solution)),
+        )
+    finally:
+        os.close(report_write)
+    with os.fdopen(report_read, "rb") as report_file:
+        try:
+            output, stderr = proc.communicate(sample.stdin, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            output, stderr = proc.communicate()
+            wall_time = time.perf_counter() - start
+            return RunResult(sample, "TIMEOUT", output, wall_time, stderr=stderr)
+        wall_time = time.perf_counter() - start
+        report = report_file.read()
+
+    cpu_time, max_rss = json.loads(report) if report else (None, None)
+    # macOS reports bytes, Linux kilobytes
+    if max_rss is not None and sys.platform == "darwin":
+        max_rss //= 1024
+    if proc.returncode != 0:
+        verdict = "ERROR"
+    elif outputs_match(output, sample.expected):
+        verdict = "PASS"
+    else:
+        verdict = "FAIL"
+    return RunResult(sample, verdict, output, wall_time, cpu_time, max_rss, stderr)
+
+
+def run_samples(
+    solution: str,
+    samples: list[Sample],
+    timeout: float = RUN_TIMEOUT,
+    max_workers: int = MAX_WORKERS,
+) -> list[RunResult]:
+    """Run a solution on all samples in parallel, results are in sample order"""
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(
+            executor.map(lambda sample: run_sample(solution, sample, timeout), samples)
+        )
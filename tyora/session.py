@@ -2,15 +2,26 @@ import importlib.metadata
 import logging
 import os
 import sys
+import threading
+import time
 from typing import Optional
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlparse
 
 import requests
+from requests.adapters import HTTPAdapter
 from requests_toolbelt import user_agent
 
-from .utils import find_link, parse_form
+from . import instrument
+from .transport import TransportPolicy
+from .utils import cookie_fingerprint, find_link, page_is_logged_in, parse_form
+
+__all__ = ["MoocfiCsesSession", "cookie_fingerprint", "page_is_logged_in"]
 
 HTTP_TIMEOUT = int(os.getenv("HTTP_TIMEOUT", 10))
+# Seconds a successful login check is trusted before the site is asked again
+SESSION_TTL = int(os.getenv("SESSION_TTL", 3600))
+# Maximum concurrent requests to a single host, to stay polite to cses.fi
+MAX_HOST_CONNECTIONS = int(os.getenv("MAX_HOST_CONNECTIONS", 4))
 logger = logging.getLogger(__name__)
 
 try:
@@ -21,11 +32,34 @@ except importlib.metadata.PackageNotFoundError:
 
 class MoocfiCsesSession(requests.Session):
     def __init__(
-        self, base_url: str, cookies: Optional[dict[str, str]] = None, *args, **kwargs
+        self,
+        base_url: str,
+        cookies: Optional[dict[str, str]] = None,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        logged_in_until: float = 0.0,
+        policy: Optional[TransportPolicy] = None,
+        adapter: Optional[HTTPAdapter] = None,
+        *args,
+        **kwargs,
     ):
         super().__init__(*args, **kwargs)
 
         self.base_url = base_url
+        self.username = username
+        self.password = password
+        # Unix timestamp until which we trust the cookies to hold a valid login
+        self.logged_in_until = logged_in_until
+        self.policy = policy or TransportPolicy()
+
+        self._login_lock = threading.Lock()
+        self._host_slots: dict[str, threading.BoundedSemaphore] = dict()
+
+        # Keep enough connections alive for every concurrent request to reuse one,
+        # sessions can share an adapter to share its connections
+        adapter = adapter or HTTPAdapter(pool_maxsize=MAX_HOST_CONNECTIONS)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
 
         if cookies:
             self.cookies.update(cookies)
@@ -34,32 +68,134 @@ class MoocfiCsesSession(requests.Session):
             {"User-Agent": user_agent(os.path.basename(sys.argv[0]), __version__)}
         )
 
-    def request(self, *args, **kwargs):
+    def request(self, method, url, *args, **kwargs):
         kwargs.setdefault("timeout", HTTP_TIMEOUT)
-        return super(MoocfiCsesSession, self).request(*args, **kwargs)
+        host = urlparse(url).netloc
+        return self.policy.send(
+            method, host, lambda: self._send(host, method, url, *args, **kwargs)
+        )
+
+    def _send(self, host, method, url, *args, **kwargs):
+        host_slot = self._host_slots.setdefault(
+            host, threading.BoundedSemaphore(MAX_HOST_CONNECTIONS)
+        )
+        with host_slot:
+            if not instrument.listeners:
+                return super(MoocfiCsesSession, self).request(
+                    method, url, *args, **kwargs
+                )
+            start = time.time()
+            started = time.perf_counter()
+            res = super(MoocfiCsesSession, self).request(method, url, *args, **kwargs)
+            instrument.emit(
+                instrument.Event(
+                    kind="request",
+                    name=f"{method} {url}",
+                    start=start,
+                    duration=time.perf_counter() - started,
+                    status=res.status_code,
+                    bytes=len(res.content),
+                    redirects=len(res.history),
+                )
+            )
+            return res
+
+    @property
+    def login_is_cached(self) -> bool:
+        return time.time() < self.logged_in_until
+
+    def mark_logged_in(self) -> None:
+        self.logged_in_until = time.time() + SESSION_TTL
 
     @property
     def is_logged_in(self) -> bool:
         res = self.get(urljoin(self.base_url, "list"))
         res.raise_for_status()
-        logout_link = find_link(res.text, './/a[@title="Log out"]')
-        return bool(logout_link)
+        logged_in = page_is_logged_in(res.text)
+        if logged_in:
+            self.mark_logged_in()
+        return logged_in
+
+    def get_page(self, url: str, **kwargs) -> requests.Response:
+        """Retrieve a page, logging in first if it wasn't rendered for a logged in user
 
-    def login(self, username: str, password: str) -> None:
+        The fetched page itself proves the session, so a valid session costs no
+        extra requests. Without credentials the anonymous page is returned.
+        A 304 response to a conditional request is returned as is.
+        """
+        seen_logged_in_until = self.logged_in_until
+        res = self.get(url, **kwargs)
+        res.raise_for_status()
+        # Not modified, the caller already has a page that proved the session
+        if res.status_code == 304:
+            return res
+        if page_is_logged_in(res.text):
+            self.mark_logged_in()
+            return res
+
+        if not (self.username and self.password):
+            self.logged_in_until = 0.0
+            return res
+
+        # Concurrent fetches share the session, only one of them should log in
+        with self._login_lock:
+            if self.logged_in_until <= seen_logged_in_until:
+                self.logged_in_until = 0.0
+                self._submit_login(res, self.username, self.password)
+        # The caller's copy may be the logged in page, a 304 for it would leave
+        # nothing to check the login with
+        headers = {
+            name: value
+            for name, value in (kwargs.pop("headers", None) or {}).items()
+            if name not in ("If-None-Match", "If-Modified-Since")
+        }
+        res = self.get(url, headers=headers, **kwargs)
+        res.raise_for_status()
+        if not page_is_logged_in(res.text):
+            logger.debug(
+                f"url: {res.url}, status: {res.status_code}\nhtml:\n{res.text}"
+            )
+            raise ValueError("Login failed")
+        self.mark_logged_in()
+        return res
+
+    def login(
+        self, username: Optional[str] = None, password: Optional[str] = None
+    ) -> None:
         """Log into the site using webscraping
 
         Steps:
-        - checks if already logged in
-        - retrieves base URL
-        - finds and retrieves login URL
+        - checks if the login is cached or the list page shows we're logged in
+        - finds and retrieves login URL from the same list page
         - finds and submits login form
         - checks if logged in
         """
-        if self.is_logged_in:
+        self.username = username or self.username
+        self.password = password or self.password
+        if not (self.username and self.password):
+            raise ValueError("No username and password to log in with")
+
+        if self.login_is_cached:
             return
 
         res = self.get(urljoin(self.base_url, "list"))
         res.raise_for_status()
+        if page_is_logged_in(res.text):
+            self.mark_logged_in()
+            return
+
+        res = self._submit_login(res, self.username, self.password)
+
+        if not self.is_logged_in:
+            logger.debug(
+                f"url: {res.url}, status: {res.status_code}\nhtml:\n{res.text}"
+            )
+            raise ValueError("Login failed")
+
+    def _submit_login(
+        self, res: requests.Response, username: str, password: str
+    ) -> requests.Response:
+        """Follow the login link found on a logged out page and submit the login form"""
         login_link = find_link(res.text, './/a[@class="account"]')
         if login_link:
             login_url = urljoin(res.url, login_link.get("href"))
@@ -88,9 +224,4 @@ class MoocfiCsesSession(requests.Session):
             data=login_form,
         )
         res.raise_for_status()
-
-        if not self.is_logged_in:
-            logger.debug(
-                f"url: {res.url}, status: {res.status_code}\nhtml:\n{res.text}"
-            )
-            raise ValueError("Login failed")
+        return res
@@ -0,0 +1,98 @@
+"""State shared by tyora processes, in a single SQLite file
+
+Cookies, login state and task list snapshots are stored as JSON values by key.
+Several processes may use the store at the same time: the database runs in WAL
+mode so readers never wait for a writer, and writes are serialized with an
+advisory lock on a file next to the database, so concurrent writers queue up
+instead of failing on a busy database.
+"""
+
+import contextlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Iterator, Optional, TextIO, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows, where SQLite's own locking has to do
+    fcntl = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+# Seconds SQLite waits for a lock held by another process before giving up
+BUSY_TIMEOUT = 10.0
+
+
+class StateStore:
+    """Key-value store of JSON values, safe to use from several processes"""
+
+    def __init__(self, path: Union[Path, str]) -> None:
+        self.path = Path(path)
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+        self._lock = threading.RLock()
+        self._lock_file: Optional[TextIO] = None
+        self.db = sqlite3.connect(
+            str(self.path), timeout=BUSY_TIMEOUT, check_same_thread=False
+        )
+        with self.locked():
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS state ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, updated REAL NOT NULL)"
+            )
+            self.db.commit()
+
+    def close(self) -> None:
+        self.db.close()
+
+    def __enter__(self) -> "StateStore":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    @contextlib.contextmanager
+    def locked(self) -> Iterator[None]:
+        """Hold the store's write lock, across threads and processes"""
+        with self._lock:
+            # Taken again by the thread that holds it, flock would wait for itself
+            if self._lock_file is not None or fcntl is None:
+                yield
+                return
+            with open(self.lock_path, "a") as self._lock_file:
+                try:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+                    yield
+                finally:
+                    self._lock_file = None
+
+    def get(self, key: str, default: Optional[Any] = None) -> Any:
+        with self._lock:
+            row = self.db.execute(
+                "SELECT value FROM state WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return default
+        try:
+            return json.loads(row[0])
+        except json.decoder.JSONDecodeError as e:
+            logger.debug(f"Ignoring unreadable state for {key}: {e}")
+            return default
+
+    def set(self, key: str, value: Any) -> None:
+        self.update({key: value})
+
+    def update(self, values: dict[str, Any]) -> None:
+        """Store several values in one transaction, readers see all or none"""
+        now = time.time()
+        rows = [(key, json.dumps(value), now) for key, value in values.items()]
+        with self.locked(), self.db:
+            self.db.executemany("INSERT OR REPLACE INTO state VALUES (?, ?, ?)", rows)
+
+    def delete(self, key: str) -> None:
+        with self.locked(), self.db:
+            self.db.execute("DELETE FROM state WHERE key = ?", (key,))
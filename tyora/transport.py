@@ -0,0 +1,208 @@
+"""Retries, rate limiting and a circuit breaker for requests to the site
+
+The session sends every request through a TransportPolicy:
+
+- a token bucket spaces out requests, shared by all threads using the policy
+- per host circuit breakers fail fast after repeated server errors, until a
+  cooldown has passed and a single trial request succeeds again
+- failed requests are retried with exponential backoff and jitter, honouring
+  Retry-After. Non-idempotent requests, like submitting a solution, are only
+  retried when the server can't have acted on them.
+"""
+
+import email.utils
+import logging
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Times a failed request is retried
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", 3))
+# Seconds before the first retry, doubling with every attempt
+HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", 0.5))
+# Longest wait before a retry, a longer Retry-After fails the request instead
+HTTP_RETRY_MAX_WAIT = float(os.getenv("HTTP_RETRY_MAX_WAIT", 30))
+# Sustained requests per second and burst size, a rate of 0 disables the limit
+HTTP_RATE_LIMIT = float(os.getenv("HTTP_RATE_LIMIT", 20))
+HTTP_RATE_BURST = int(os.getenv("HTTP_RATE_BURST", 20))
+# Consecutive failures that open the circuit, and seconds until it's tried again
+CIRCUIT_THRESHOLD = int(os.getenv("CIRCUIT_THRESHOLD", 5))
+CIRCUIT_COOLDOWN = float(os.getenv("CIRCUIT_COOLDOWN", 30))
+
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+IDEMPOTENT_METHODS = frozenset(("GET", "HEAD", "OPTIONS", "PUT", "DELETE"))
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised without sending a request while the site is considered down"""
+
+
+class TokenBucket:
+    """Blocks callers so they don't exceed rate requests per second on average"""
+
+    def __init__(self, rate: Optional[float] = None, burst: Optional[int] = None):
+        self.rate = HTTP_RATE_LIMIT if rate is None else rate
+        self.burst = max(HTTP_RATE_BURST if burst is None else burst, 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.burst, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """Tracks consecutive failures of a host, failing fast once there are too many"""
+
+    def __init__(
+        self, threshold: int = CIRCUIT_THRESHOLD, cooldown: float = CIRCUIT_COOLDOWN
+    ):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial = False
+        self._lock = threading.Lock()
+
+    def check(self, host: str) -> None:
+        """Raise CircuitOpenError unless a request may be sent"""
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if not self.trial and time.monotonic() - self.opened_at >= self.cooldown:
+                # Half open, let a single request find out if the host is back
+                self.trial = True
+                return
+        raise CircuitOpenError(f"{host} is failing, not sending requests for now")
+
+    def record(self, success: bool) -> None:
+        with self._lock:
+            self.trial = False
+            if success:
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.failures += 1
+            if self.failures >= self.threshold:
+                if self.opened_at is None:
+                    logger.warning(f"Opening circuit after {self.failures} failures")
+                self.opened_at = time.monotonic()
+
+
+@dataclass
+class RetryPolicy:
+    retries: int = HTTP_RETRIES
+    backoff: float = HTTP_RETRY_BACKOFF
+    max_wait: float = HTTP_RETRY_MAX_WAIT
+    statuses: frozenset[int] = RETRY_STATUSES
+
+    def retries_response(self, method: str, res: requests.Response) -> bool:
+        if res.status_code not in self.statuses:
+            return False
+        # A rate limited request wasn't processed, so even a POST can be repeated
+        return method.upper() in IDEMPOTENT_METHODS or res.status_code == 429
+
+    def retries_error(self, method: str, error: requests.RequestException) -> bool:
+        if method.upper() in IDEMPOTENT_METHODS:
+            return isinstance(
+                error,
+                (requests.exceptions.ConnectionError, requests.exceptions.Timeout),
+            ) and not isinstance(error, CircuitOpenError)
+        # Without a connection the request certainly didn't reach the server
+        return isinstance(error, requests.exceptions.ConnectTimeout)
+
+    def delay(
+        self, attempt: int, res: Optional[requests.Response] = None
+    ) -> Optional[float]:
+        """Return the seconds to wait before retrying, or None to give up"""
+        retry_after = retry_after_seconds(res) if res is not None else None
+        if retry_after is not None:
+            return retry_after if retry_after <= self.max_wait else None
+        return random.uniform(0, min(self.max_wait, self.backoff * 2**attempt))
+
+
+def retry_after_seconds(res: requests.Response) -> Optional[float]:
+    """Return the delay requested by a Retry-After header, in seconds or as a date"""
+    value = res.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, date.timestamp() - time.time())
+
+
+@dataclass
+class TransportPolicy:
+    """Retry, rate limit and circuit breaker settings, may be shared by sessions"""
+
+    retry: RetryPolicy = field(default_factory=RetryPolicy)
+    bucket: TokenBucket = field(default_factory=TokenBucket)
+    breakers: dict[str, CircuitBreaker] = field(default_factory=dict)
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        return self.breakers.setdefault(host, CircuitBreaker())
+
+    def send(
+        self, method: str, host: str, send: Callable[[], requests.Response]
+    ) -> requests.Response:
+        """Call send until it succeeds, can't be retried or runs out of attempts"""
+        breaker = self.breaker(host)
+        attempt = 0
+        while True:
+            breaker.check(host)
+            self.bucket.acquire()
+            delay: Optional[float]
+            try:
+                res = send()
+            except requests.RequestException as e:
+                breaker.record(False)
+                if attempt >= self.retry.retries or not self.retry.retries_error(
+                    method, e
+                ):
+                    raise
+                delay = self.retry.delay(attempt)
+                reason = str(e)
+            else:
+                breaker.record(res.status_code < 500)
+                if attempt >= self.retry.retries or not self.retry.retries_response(
+                    method, res
+                ):
+                    return res
+                delay = self.retry.delay(attempt, res)
+                if delay is None:
+                    return res
+                reason = f"status {res.status_code}"
+                res.close()
+            assert delay is not None
+            attempt += 1
+            logger.info(
+                f"Retrying {method} to {host} in {delay:.2f}s "
+                f"(attempt {attempt}/{self.retry.retries}): {reason}"
+            )
+            time.sleep(delay)
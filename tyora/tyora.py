@@ -1,17 +1,42 @@
+from __future__ import annotations
+
 import argparse
 import importlib.metadata
 import json
 import logging
+import os
 import sys
+import threading
+import time
+from dataclasses import asdict
 from getpass import getpass
+from itertools import islice
 from pathlib import Path
-from time import sleep
-from typing import Optional, no_type_check
+from typing import TYPE_CHECKING, Any, Iterable, Optional, no_type_check
+from urllib.parse import urljoin
 
-import platformdirs
+# Only lightweight modules are imported up front, requests and friends are
+# imported when a command first needs the network
+from .cache import ResponseCache
+from .client import (
+    MAX_WORKERS,
+    Client,
+    OfflineError,
+    SubmitResult,
+    Task,
+    TaskState,
+    diff_task_lists,
+)
+from .instrument import Recorder, add_listener, remove_listener
+from .utils import cookie_fingerprint
 
-from .client import Client, Task, TaskState, parse_submit_result
-from .session import MoocfiCsesSession as Session
+if TYPE_CHECKING:
+    from .bench import BenchReport
+    from .history import Submission
+    from .index import SearchResult
+    from .runner import RunResult
+    from .session import MoocfiCsesSession
+    from .state import StateStore
 
 logger = logging.getLogger(name="tyora")
 try:
@@ -20,8 +45,16 @@ except importlib.metadata.PackageNotFoundError:
     __version__ = "unknown"
 
 PROG_NAME = "tyora"
-CONF_FILE = platformdirs.user_config_path(PROG_NAME) / "config.json"
-STATE_DIR = platformdirs.user_state_path(f"{PROG_NAME}")
+# Resolved on first use by config_file() and state_dir(), finding the user
+# directories isn't needed for importing the module or parsing arguments
+CONF_FILE: Optional[Path] = None
+STATE_DIR: Optional[Path] = None
+SITE_URL = os.getenv("TYORA_SITE_URL", "https://cses.fi/")
+SOCKET_NAME = "tyora.sock"
+# Commands that are handed to a running `tyora serve` daemon. The daemon runs
+# one command at a time, so commands that wait minutes for the judge run in
+# their own process instead of blocking the others.
+DAEMON_COMMANDS = ("list", "show", "search")
 
 
 # Disable typechecking for the argparse function calls since we ignore most returned values
@@ -43,19 +76,47 @@ def parse_args(args: Optional[list[str]] = None) -> argparse.Namespace:
     )
     parser.add_argument(
         "--config",
-        help="Location of config file (default: %(default)s)",
-        default=CONF_FILE,
+        help="Location of config file (default: config.json in the user config directory)",
     )
     parser.add_argument(
         "--no-state",
         help="Don't store cookies or cache (they're used for faster access on the future runs)",
         action="store_true",
     )
+    parser.add_argument(
+        "--no-daemon",
+        help="Don't hand the command to a running `tyora serve` daemon",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--offline",
+        help="Don't access the site, read exercises from the mirror made by `tyora sync`",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--profile",
+        help="Print the time spent in requests and parsing to stderr, runs without the daemon",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--trace",
+        help="Write every request and parse with its timing as JSON to this file",
+    )
     subparsers = parser.add_subparsers(required=True, title="commands", dest="cmd")
 
     # login subparser
     subparsers.add_parser("login", help="Login to mooc.fi CSES")
 
+    # daemon subparser
+    parser_serve = subparsers.add_parser(
+        "serve",
+        help="Run a daemon that keeps a warm session for the other tyora commands",
+    )
+    parser_serve.add_argument(
+        "--socket",
+        help=f"Location of the unix socket to listen on (default: {SOCKET_NAME} in the state directory)",
+    )
+
     # list exercises subparser
     parser_list = subparsers.add_parser("list", help="List exercises")
     parser_list.add_argument(
@@ -66,10 +127,32 @@ def parse_args(args: Optional[list[str]] = None) -> argparse.Namespace:
     parser_list.add_argument(
         "--limit", help="Maximum amount of items to list", type=int
     )
+    parser_list.add_argument(
+        "--changed",
+        help="List only tasks that were added, renamed or changed state since the last --changed run",
+        action="store_true",
+    )
+    parser_list.add_argument(
+        "--format",
+        help="Output format (default: %(default)s)",
+        choices=["text", "json", "jsonl", "tsv"],
+        default="text",
+    )
 
     # show exercise subparser
-    parser_show = subparsers.add_parser("show", help="Show details of an exercise")
-    parser_show.add_argument("task_id", help="Numerical task identifier")
+    parser_show = subparsers.add_parser("show", help="Show details of exercises")
+    parser_show.add_argument(
+        "task_id", help="Numerical task identifier", nargs="*", default=[]
+    )
+    parser_show.add_argument(
+        "--all", help="Show all exercises of the course", action="store_true"
+    )
+    parser_show.add_argument(
+        "--jobs",
+        help="Amount of exercises to fetch concurrently (default: %(default)s)",
+        type=int,
+        default=MAX_WORKERS,
+    )
 
     # submit exercise solution subparser
     parser_submit = subparsers.add_parser("submit", help="Submit an exercise solution")
@@ -78,6 +161,153 @@ def parse_args(args: Optional[list[str]] = None) -> argparse.Namespace:
         help="Filename of the solution to submit (if not given will be guessed from task description)",
     )
     parser_submit.add_argument("task_id", help="Numerical task identifier")
+    parser_submit.add_argument(
+        "--format",
+        help="Output format of the result (default: %(default)s)",
+        choices=["text", "json"],
+        default="text",
+    )
+    parser_submit.add_argument(
+        "--force",
+        help="Submit even if the very same solution was submitted before",
+        action="store_true",
+    )
+
+    # watch subparser
+    parser_watch = subparsers.add_parser(
+        "watch", help="Submit a solution every time the file is saved"
+    )
+    parser_watch.add_argument("task_id", help="Numerical task identifier")
+    parser_watch.add_argument("filename", help="Filename of the solution")
+    parser_watch.add_argument(
+        "--debounce",
+        help="Seconds the file must stay unchanged before it's submitted",
+        type=float,
+    )
+
+    # test subparser
+    parser_test = subparsers.add_parser(
+        "test", help="Run a solution locally on the samples of an exercise"
+    )
+    parser_test.add_argument("task_id", help="Numerical task identifier")
+    parser_test.add_argument("filename", help="Filename of the solution")
+    parser_test.add_argument(
+        "--timeout", help="Seconds each sample may run", type=float
+    )
+    parser_test.add_argument(
+        "--jobs",
+        help="Amount of samples run in parallel (default: %(default)s)",
+        type=int,
+        default=MAX_WORKERS,
+    )
+
+    # bench subparser
+    parser_bench = subparsers.add_parser(
+        "bench",
+        help="Measure how the time and memory of a solution grow with the input size",
+    )
+    parser_bench.add_argument("task_id", help="Numerical task identifier")
+    parser_bench.add_argument("filename", help="Filename of the solution")
+    parser_bench_inputs = parser_bench.add_mutually_exclusive_group()
+    parser_bench_inputs.add_argument(
+        "--input",
+        help="Input file, its size is its amount of values (repeat for more sizes)",
+        action="append",
+        dest="inputs",
+    )
+    parser_bench_inputs.add_argument(
+        "--generator",
+        help='Command printing an input of size {n}, e.g. "python gen.py {n}"',
+    )
+    parser_bench_inputs.add_argument(
+        "--expression",
+        help='Expression calling the solution with size {n}, e.g. "count(1, 2, {n})"',
+    )
+    parser_bench.add_argument(
+        "--sizes",
+        help="Comma separated input sizes for --generator and --expression",
+        type=lambda sizes: [int(size) for size in sizes.split(",")],
+    )
+    parser_bench.add_argument(
+        "--max-size",
+        help="Largest input size of the task, to predict the time it takes",
+        type=int,
+    )
+    parser_bench.add_argument(
+        "--timeout", help="Seconds each input may run", type=float
+    )
+
+    # history subparser
+    parser_history = subparsers.add_parser(
+        "history", help="List earlier submissions and their results"
+    )
+    parser_history.add_argument("--task", help="Only submissions of this task")
+    parser_history.add_argument(
+        "--limit",
+        help="Maximum amount of submissions to list (default: %(default)s)",
+        type=int,
+        default=20,
+    )
+    parser_history.add_argument(
+        "--last-passing",
+        help="Print the source of the latest accepted submission of --task",
+        action="store_true",
+    )
+    parser_history.add_argument(
+        "--format",
+        help="Output format (default: %(default)s)",
+        choices=["text", "json", "jsonl", "tsv"],
+        default="text",
+    )
+
+    # sync subparser
+    parser_sync = subparsers.add_parser(
+        "sync", help="Mirror all exercises of the course, for working offline"
+    )
+    parser_sync.add_argument(
+        "--refresh",
+        help="Check every exercise for changes, not only those synced over a day ago",
+        action="store_true",
+    )
+    parser_sync.add_argument(
+        "--jobs",
+        help="Amount of exercises to fetch concurrently (default: %(default)s)",
+        type=int,
+        default=MAX_WORKERS,
+    )
+
+    # search exercises subparser
+    parser_search = subparsers.add_parser(
+        "search", help="Search the exercises fetched before, without network access"
+    )
+    parser_search.add_argument("query", help="Words to search for")
+    parser_search.add_argument(
+        "--limit",
+        help="Maximum amount of items to list (default: %(default)s)",
+        type=int,
+        default=20,
+    )
+
+    # submit a directory of exercise solutions subparser
+    parser_submit_batch = subparsers.add_parser(
+        "submit-batch",
+        help="Submit all exercise solutions found in a directory",
+    )
+    parser_submit_batch.add_argument(
+        "directory", help="Directory with solution files named as the tasks expect"
+    )
+    parser_submit_batch.add_argument(
+        "--jobs",
+        help="Amount of solutions to submit concurrently (default: %(default)s)",
+        type=int,
+        default=MAX_WORKERS,
+    )
+    parser_submit_batch.add_argument(
+        "--format",
+        help="Output format of the results (default: %(default)s)",
+        choices=["table", "json"],
+        default="table",
+    )
 
     if len(sys.argv) == 1:
         parser.print_help()
@@ -97,8 +327,26 @@ def create_config() -> dict[str, str]:
     return config
 
 
-def write_config(configfile: str, config: dict[str, str]) -> None:
-    file_path = Path(configfile).expanduser()
+def config_file() -> Path:
+    global CONF_FILE
+    if CONF_FILE is None:
+        import platformdirs
+
+        CONF_FILE = platformdirs.user_config_path(PROG_NAME) / "config.json"
+    return CONF_FILE
+
+
+def state_dir() -> Path:
+    global STATE_DIR
+    if STATE_DIR is None:
+        import platformdirs
+
+        STATE_DIR = platformdirs.user_state_path(PROG_NAME)
+    return STATE_DIR
+
+
+def write_config(configfile: Optional[str], config: dict[str, str]) -> None:
+    file_path = Path(configfile or config_file()).expanduser()
     if file_path.exists():
         # TODO: https://github.com/madeddie/tyora/issues/28
         ...
@@ -109,9 +357,9 @@ def write_config(configfile: str, config: dict[str, str]) -> None:
         json.dump(config, f)
 
 
-def read_config(configfile: str) -> dict[str, str]:
+def read_config(configfile: Optional[str]) -> dict[str, str]:
     config: dict[str, str] = dict()
-    file_path = Path(configfile).expanduser()
+    file_path = Path(configfile or config_file()).expanduser()
     with open(file_path, "r") as f:
         config = json.load(f)
         for setting in ("username", "password"):
@@ -119,35 +367,101 @@ def read_config(configfile: str) -> dict[str, str]:
     return config
 
 
-def read_cookie_file(cookiefile: str) -> dict[str, str]:
+def merge_config(args: argparse.Namespace, config: dict[str, str]) -> dict[str, str]:
+    """Merge cli args and configfile parameters in one dict, args take precedence"""
+    return {**config, **{k: v for k, v in vars(args).items() if v is not None}}
+
+
+def open_state_store() -> StateStore:
+    """Open the state store in the state directory, moving in the JSON files of
+    older versions"""
+    from .state import StateStore
+
+    directory = state_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    store = StateStore(directory / "state.db")
+    legacy_files = {
+        "cookies": directory / "cookies.json",
+        "session": directory / "session.json",
+    }
+    for path in directory.glob("tasks-*.json"):
+        legacy_files[f"tasks/{path.stem[len('tasks-') :]}"] = path
+    with store.locked():
+        for key, path in legacy_files.items():
+            try:
+                with open(path) as f:
+                    store.set(key, json.load(f))
+            except (FileNotFoundError, json.decoder.JSONDecodeError) as e:
+                logger.debug(f"Not moving {path} into the state store: {e}")
+                continue
+            path.unlink()
+    return store
+
+
+def read_session_state(store: StateStore) -> tuple[dict[str, str], float]:
     """
-    Reads cookies from a JSON formatted file.
+    Reads the stored cookies and the login validity belonging to them.
 
     Args:
-        cookiefile: str path to the file containing cookies.
+        store: the state store.
 
     Returns:
-        A dictionary of cookies.
+        A dictionary of cookies, and the Unix timestamp until which their login
+        is trusted, 0 if unknown or stale.
     """
-    try:
-        with open(cookiefile, "r") as f:
-            cookies: dict[str, str] = json.load(f)
-            return cookies
-    except (FileNotFoundError, json.decoder.JSONDecodeError) as e:
-        logger.debug(f"Error reading cookies from {cookiefile}: {e}")
-    return {}
+    cookies: dict[str, str] = store.get("cookies", {})
+    state = store.get("session", {})
+    if state.get("fingerprint") != cookie_fingerprint(cookies):
+        return cookies, 0.0
+    return cookies, float(state.get("logged_in_until", 0.0))
 
 
-def write_cookie_file(cookiefile: str, cookies: dict[str, str]) -> None:
+def write_session_state(
+    store: StateStore, cookies: dict[str, str], logged_in_until: float
+) -> None:
     """
-    Writes cookies to a file in JSON format.
+    Writes cookies and their login validity in one transaction.
 
     Args:
-        cookiefile: Path to the file for storing cookies.
+        store: the state store.
         cookies: A dictionary of cookies to write.
+        logged_in_until: Unix timestamp until which the login is trusted.
+    """
+    store.update(
+        {
+            "cookies": cookies,
+            "session": {
+                "fingerprint": cookie_fingerprint(cookies),
+                "logged_in_until": logged_in_until,
+            },
+        }
+    )
+
+
+def read_task_list(store: StateStore, course: str) -> list[Task]:
     """
-    with open(cookiefile, "w") as f:
-        json.dump(cookies, f)
+    Reads the task list snapshot of a course.
+
+    Args:
+        store: the state store.
+        course: SLUG of the course.
+
+    Returns:
+        A list of tasks, empty if there is no snapshot yet.
+    """
+    return [Task.from_dict(task) for task in store.get(f"tasks/{course}", [])]
+
+
+def write_task_list(store: StateStore, course: str, task_list: list[Task]) -> None:
+    """
+    Writes the task list snapshot of a course.
+
+    Args:
+        store: the state store.
+        course: SLUG of the course.
+        task_list: A list of tasks to write.
+    """
+    store.set(f"tasks/{course}", [task.to_dict() for task in task_list])
 
 
 TASK_STATE_ICON = {
@@ -156,16 +470,85 @@ TASK_STATE_ICON = {
 }
 
 
+TASK_COLUMNS = ("id", "name", "state")
+CHANGE_COLUMNS = TASK_COLUMNS + ("previous_name", "previous_state")
+
+
+def print_records(
+    records: Iterable[dict[str, Any]], columns: tuple[str, ...], format: str
+) -> None:
+    """Print records as a JSON array, JSON lines or tab separated values"""
+    if format == "json":
+        print(json.dumps(list(records), indent=2, ensure_ascii=False))
+        return
+    if format == "tsv":
+        print("\t".join(columns))
+    for record in records:
+        if format == "jsonl":
+            print(json.dumps(record, ensure_ascii=False))
+        else:
+            values = ("" if record[c] is None else str(record[c]) for c in columns)
+            print("\t".join(" ".join(value.split()) for value in values))
+
+
 def print_task_list(
-    task_list: list[Task], filter: Optional[str] = None, limit: Optional[int] = None
+    task_list: Iterable[Task],
+    filter: Optional[str] = None,
+    limit: Optional[int] = None,
+    format: str = "text",
+) -> None:
+    tasks = islice(
+        (task for task in task_list if not filter or filter == task.state.value),
+        limit or None,
+    )
+    if format != "text":
+        records = (
+            {"id": task.id, "name": task.name, "state": task.state.value}
+            for task in tasks
+        )
+        print_records(records, TASK_COLUMNS, format)
+        return
+    for task in tasks:
+        print(f"- {task.id}: {task.name} {TASK_STATE_ICON[task.state]}")
+
+
+def print_task_changes(
+    changes: list[tuple[Task, Optional[Task]]],
+    filter: Optional[str] = None,
+    limit: Optional[int] = None,
+    format: str = "text",
 ) -> None:
-    count: int = 0
-    for task in task_list:
-        if not filter or filter == task.state.value:
-            print(f"- {task.id}: {task.name} {TASK_STATE_ICON[task.state]}")
-            count += 1
-            if limit and count >= limit:
-                return
+    selected = islice(
+        (
+            (task, previous)
+            for task, previous in changes
+            if not filter or filter == task.state.value
+        ),
+        limit or None,
+    )
+    if format != "text":
+        records = (
+            {
+                "id": task.id,
+                "name": task.name,
+                "state": task.state.value,
+                "previous_name": previous.name if previous else None,
+                "previous_state": previous.state.value if previous else None,
+            }
+            for task, previous in selected
+        )
+        print_records(records, CHANGE_COLUMNS, format)
+        return
+    for task, previous in selected:
+        line = f"- {task.id}: {task.name} {TASK_STATE_ICON[task.state]}"
+        if previous is None:
+            line += " (new)"
+        else:
+            if previous.name != task.name:
+                line += f" (renamed from {previous.name})"
+            if previous.state != task.state:
+                line += f" (was {TASK_STATE_ICON[previous.state]})"
+        print(line)
 
 
 def print_task(task: Task) -> None:
@@ -174,6 +557,193 @@ def print_task(task: Task) -> None:
     print(f"\nSubmission file name: {task.submit_file}")
 
 
+def print_search_results(results: list[SearchResult]) -> None:
+    for result in results:
+        print(f"- {result.id}: {result.name}")
+        print(f"    {' '.join(result.snippet.split())}")
+
+
+def print_batch_results(results: list[dict[str, Any]], format: str = "table") -> None:
+    if format == "json":
+        print(json.dumps(results, indent=2))
+        return
+    columns = ("task_id", "filename", "status", "result")
+    widths = [
+        max([len(column)] + [len(row[column]) for row in results]) for column in columns
+    ]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    for row in results:
+        print(
+            "  ".join(
+                row[column].ljust(width) for column, width in zip(columns, widths)
+            )
+        )
+
+
+def task_time_limit(client: Client, task_id: str) -> Optional[float]:
+    """Return the time limit of a task, None if it has none or can't be fetched"""
+    try:
+        return client.get_task(task_id).time_limit
+    except (OSError, ValueError) as e:
+        logger.debug(f"No time limit for task {task_id}: {e}")
+        return None
+
+
+def print_submit_result(
+    result: SubmitResult, time_limit: Optional[float] = None
+) -> None:
+    print(f"Submission result: {result.result}")
+    if not result.tests:
+        return
+    width = max(len(test.verdict) for test in result.tests)
+    memory = any(test.memory_kib is not None for test in result.tests)
+    print()
+    print(f"test  {'verdict':<{width}}  time s" + ("  mem MiB" if memory else ""))
+    for test in result.tests:
+        line = f"{'#' + str(test.number):>4}  {test.verdict:<{width}}  "
+        line += "    --" if test.time is None else f"{test.time:>6.2f}"
+        if memory:
+            mib = "" if test.memory_kib is None else f"{test.memory_kib / 1024:.1f}"
+            line += f"  {mib:>7}"
+        print(line)
+
+    slowest = result.slowest
+    if slowest is None:
+        return
+    print()
+    if slowest.time is None:
+        print(f"Test #{slowest.number} ran out of time")
+        return
+    line = f"Slowest test: #{slowest.number}, {slowest.time:.2f} s"
+    headroom = result.headroom(time_limit)
+    if time_limit and headroom is not None:
+        line += (
+            f", {headroom:.2f} s ({headroom / time_limit:.0%}) left of the "
+            f"{time_limit:.2f} s time limit"
+        )
+    print(line)
+
+
+HISTORY_COLUMNS = ("submitted_at", "task_id", "filename", "status", "result")
+
+
+def format_time(timestamp: float) -> str:
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
+
+
+def print_history(submissions: list[Submission], format: str = "text") -> None:
+    if format != "text":
+        # Without the source, it's printed with --last-passing
+        records = [
+            {k: v for k, v in asdict(submission).items() if k != "code"}
+            for submission in submissions
+        ]
+        print_records(records, HISTORY_COLUMNS + ("result_url",), format)
+        return
+    for submission in submissions:
+        print(
+            f"{format_time(submission.submitted_at)}  {submission.task_id}  "
+            f"{submission.filename or ''}  {submission.result or submission.status}  "
+            f"{submission.result_url}"
+        )
+
+
+def print_run_results(results: list[RunResult]) -> None:
+    width = max([len("sample")] + [len(result.sample.name) for result in results])
+    print(f"{'sample':<{width}}  verdict  time ms  cpu ms  rss MiB")
+    for result in results:
+        cpu = "" if result.cpu_time is None else f"{result.cpu_time * 1000:.0f}"
+        rss = "" if result.max_rss_kib is None else f"{result.max_rss_kib / 1024:.1f}"
+        print(
+            f"{result.sample.name:<{width}}  {result.verdict:<7}  "
+            f"{result.wall_time * 1000:>7.0f}  {cpu:>6}  {rss:>7}"
+        )
+    for result in results:
+        if result.verdict == "FAIL":
+            print(f"\n{result.sample.name}: expected")
+            print(result.sample.expected.rstrip())
+            print("got")
+            print(result.output.rstrip())
+        elif result.verdict == "ERROR":
+            print(f"\n{result.sample.name}: failed")
+            print(result.stderr.rstrip())
+
+
+def print_bench_report(
+    report: BenchReport, task: Task, max_size: Optional[int] = None
+) -> None:
+    from .bench import complexity_class
+
+    print("   size  time ms  mem MiB  verdict")
+    for point in report.points:
+        memory = "" if point.memory_kib is None else f"{point.memory_kib / 1024:.1f}"
+        verdict = "OK" if point.ok else point.result.verdict
+        print(f"{point.size:>7}  {point.time * 1000:>7.0f}  {memory:>7}  {verdict}")
+    for point in report.points:
+        if point.result.verdict == "ERROR":
+            print(f"\nSize {point.size}: failed")
+            print(point.result.stderr.rstrip())
+
+    print()
+    if report.time_exponent is None:
+        print("Not enough successful runs to estimate the complexity")
+    else:
+        exponent = report.time_exponent
+        print(f"Time grows like n^{exponent:.2f}: {complexity_class(exponent)}")
+    if report.memory_exponent is not None:
+        print(f"Memory grows like n^{report.memory_exponent:.2f}")
+
+    measured = [point for point in report.points if point.ok]
+    if measured:
+        largest = measured[-1]
+        if task.time_limit:
+            print(
+                f"Size {largest.size} took {largest.time:.2f} s, "
+                f"{largest.time / task.time_limit:.0%} of the "
+                f"{task.time_limit:.2f} s time limit"
+            )
+        if task.memory_limit and largest.memory_kib is not None:
+            print(
+                f"Size {largest.size} used {largest.memory_kib / 1024:.1f} MiB, "
+                f"{largest.memory_kib / 1024 / task.memory_limit:.0%} of the "
+                f"{task.memory_limit} MB memory limit"
+            )
+    predicted = report.predict_time(max_size) if max_size else None
+    if predicted is not None:
+        verdict = ""
+        if task.time_limit:
+            within = predicted <= task.time_limit
+            verdict = ", within" if within else ", over"
+            verdict += f" the {task.time_limit:.2f} s time limit"
+        print(f"Size {max_size} would take about {predicted:.2f} s{verdict}")
+
+
+class LazySession:
+    """Stand-in for MoocfiCsesSession that creates it on first use
+
+    Commands answered from the cache never touch the session, so they don't pay
+    for importing requests.
+    """
+
+    def __init__(self, base_url: str, **kwargs: Any) -> None:
+        self.base_url = base_url
+        self.kwargs = kwargs
+        self.session: Optional[MoocfiCsesSession] = None
+        # The workers of get_tasks may all touch it first at the same time
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str) -> Any:
+        if self.session is None:
+            with self._lock:
+                if self.session is None:
+                    from .session import MoocfiCsesSession
+
+                    self.session = MoocfiCsesSession(
+                        base_url=self.base_url, **self.kwargs
+                    )
+        return getattr(self.session, name)
+
+
 def main() -> None:
     args = parse_args()
 
@@ -188,64 +758,378 @@ def main() -> None:
         write_config(args.config, config)
         return
 
-    config = read_config(args.config)
+    if args.cmd == "serve":
+        from .daemon import serve
+
+        serve(args.socket or str(state_dir() / SOCKET_NAME))
+        return
+
+    profiling = args.profile or bool(args.trace)
+    if args.cmd in DAEMON_COMMANDS and not (args.no_daemon or profiling):
+        from .daemon import forward
+
+        socket_path = state_dir() / SOCKET_NAME
+        exit_code = forward(str(socket_path), sys.argv[1:])
+        if exit_code is not None:
+            sys.exit(exit_code)
+
+    recorder = Recorder()
+    if profiling:
+        add_listener(recorder)
+    client = create_client(args, read_config(args.config))
+    try:
+        run_command(args, client)
+    except OfflineError as e:
+        sys.exit(str(e))
+    finally:
+        save_state(client)
+        close_client(client)
+        if profiling:
+            remove_listener(recorder)
+            write_profile(args, recorder)
+
 
-    # Merge cli args and configfile parameters in one dict
-    config.update((k, v) for k, v in vars(args).items() if v is not None)
+def write_profile(args: argparse.Namespace, recorder: Recorder) -> None:
+    if args.profile:
+        recorder.print_summary(sys.stderr)
+    if args.trace:
+        with open(args.trace, "w") as f:
+            recorder.write_trace(f)
 
-    base_url = f"https://cses.fi/{config['course']}/"
 
-    cookiefile = None
+def create_client(
+    args: argparse.Namespace, config: dict[str, str], memory_entries: int = 0
+) -> Client:
+    """Create a client for the course and account in args and config
+
+    Unless --no-state is given, the client gets the stored cookies, login state,
+    response cache and search index.
+    """
+    config = merge_config(args, config)
+    base_url = urljoin(SITE_URL, f"{config['course']}/")
+
+    cache = None
+    index = None
+    mirror = None
+    history = None
     cookies: dict[str, str] = dict()
+    logged_in_until = 0.0
     if not args.no_state:
-        if not STATE_DIR.exists():
-            STATE_DIR.mkdir(parents=True, exist_ok=True)
-        cookiefile = STATE_DIR / "cookies.json"
-        cookies = read_cookie_file(str(cookiefile))
+        with open_state_store() as store:
+            cookies, logged_in_until = read_session_state(store)
+        cache = ResponseCache(state_dir() / "cache", memory_entries=memory_entries)
+
+        from .index import TaskIndex
+
+        index = TaskIndex(state_dir() / "index.db")
+
+        from .mirror import Mirror
 
-    session = Session(
+        mirror = Mirror(state_dir() / "state.db", config["course"])
+
+        from .history import SubmissionHistory
+
+        history = SubmissionHistory(state_dir() / "history.db")
+    elif args.offline:
+        sys.exit(
+            "Working offline needs the mirror in the stored state, don't use --no-state"
+        )
+
+    # Logging in happens lazily, the first page we fetch tells if it's needed
+    session = LazySession(
         base_url=base_url,
         cookies=cookies,
+        username=config["username"],
+        password=config["password"],
+        logged_in_until=logged_in_until,
+    )
+    return Client(
+        session,  # type: ignore[arg-type]
+        cache=cache,
+        index=index,
+        mirror=mirror,
+        offline=args.offline,
+        history=history,
     )
-    # TODO: make logging in optional for list and show commands
-    session.login(username=config["username"], password=config["password"])
-    client = Client(session)
 
-    if not args.no_state and cookiefile:
-        cookies = session.cookies.get_dict()
-        write_cookie_file(str(cookiefile), cookies)
+
+def save_state(client: Client) -> None:
+    """Store the cookies and login state of a client created by create_client"""
+    session = client.session
+    if client.cache is None or (
+        isinstance(session, LazySession) and session.session is None
+    ):
+        return
+    with open_state_store() as store:
+        write_session_state(store, session.cookies.get_dict(), session.logged_in_until)
+
+
+def close_client(client: Client) -> None:
+    if client.index:
+        client.index.close()
+    if client.mirror:
+        client.mirror.close()
+    if client.history:
+        client.history.close()
+
+
+def run_command(args: argparse.Namespace, client: Client) -> None:
+    if args.offline and args.cmd in ("submit", "watch", "submit-batch", "sync"):
+        sys.exit(f"{args.cmd} needs the site, it can't run with --offline")
 
     if args.cmd == "list":
-        print_task_list(client.get_task_list(), filter=args.filter, limit=args.limit)
+        if args.changed:
+            if args.no_state:
+                sys.exit("Listing changes needs the stored state, don't use --no-state")
+            task_list = client.get_task_list()
+            slug = client.session.base_url.rstrip("/").split("/")[-1]
+            with open_state_store() as store, store.locked():
+                changes = diff_task_lists(read_task_list(store, slug), task_list)
+                if changes:
+                    write_task_list(store, slug, task_list)
+            print_task_changes(
+                changes, filter=args.filter, limit=args.limit, format=args.format
+            )
+        else:
+            # Filtered and limited by the client, so parsing can stop early
+            state = TaskState(args.filter) if args.filter else None
+            task_list = client.get_task_list(state=state, limit=args.limit or None)
+            print_task_list(task_list, format=args.format)
 
     if args.cmd == "show":
-        print_task(client.get_task(args.task_id))
+        task_ids = args.task_id
+        if args.all:
+            task_ids = [task.id for task in client.get_task_list()]
+        if not task_ids:
+            sys.exit("Give one or more task ids or --all")
+        for i, task in enumerate(
+            client.get_tasks(
+                task_ids, max_workers=args.jobs, describe=True, ordered=True
+            )
+        ):
+            if i:
+                print()
+            print_task(task)
 
     if args.cmd == "submit":
         # TODO allow user to paste the code in or even pipe it in
         with open(args.filename) as f:
             submission_code = f.read()
 
-        result_url = client.submit_task(
-            task_id=args.task_id,
-            filename=args.filename,
-            submission=submission_code,
+        # Progress goes to stderr when stdout is for other tools
+        progress = sys.stdout if args.format == "text" else sys.stderr
+        previous = None
+        if not args.force:
+            previous = client.previous_submission(args.task_id, submission_code)
+        if previous is not None:
+            print(
+                "The same solution was submitted "
+                f"{format_time(previous.submitted_at)}, not submitting it again "
+                "(use --force to do so)",
+                file=progress,
+            )
+            result_url = previous.result_url
+        else:
+            result_url = client.submit_task(
+                task_id=args.task_id,
+                filename=args.filename,
+                submission=submission_code,
+                force=True,
+            )
+        print("Waiting for test results...", file=progress)
+        results = SubmitResult(status="", result="")
+        for results in client.wait_for_result(result_url):
+            print(f"Submission status: {results.status}", file=progress)
+        time_limit = task_time_limit(client, args.task_id) if results.tests else None
+        if args.format == "json":
+            print(
+                json.dumps(
+                    {
+                        "task_id": args.task_id,
+                        "result_url": result_url,
+                        **results.to_dict(time_limit),
+                    },
+                    indent=2,
+                )
+            )
+        else:
+            print_submit_result(results, time_limit)
+
+    if args.cmd == "watch":
+        from .watch import SubmissionWatcher, create_watcher
+
+        watcher = SubmissionWatcher(client, args.task_id, args.filename)
+        try:
+            watcher.run(create_watcher(args.filename), debounce=args.debounce)
+        except KeyboardInterrupt:
+            pass
+
+    if args.cmd == "test":
+        from .runner import RUN_TIMEOUT, extract_samples, run_samples
+
+        samples = extract_samples(client.get_task(args.task_id))
+        if not samples:
+            sys.exit(f"No samples found in the statement of task {args.task_id}")
+        run_results = run_samples(
+            args.filename,
+            samples,
+            timeout=args.timeout or RUN_TIMEOUT,
+            max_workers=args.jobs,
         )
-        print("Waiting for test results.", end="")
-        while True:
-            print(".", end="")
-            res = session.get(result_url)
-            print(res.text)
-            res.raise_for_status()
-            if "Test report" in res.text:
-                break
-            sleep(1)
-
-        print()
-        results = parse_submit_result(res.text)
-
-        print(f"Submission status: {results['status']}")
-        print(f"Submission result: {results['result']}")
+        print_run_results(run_results)
+        if not all(result.passed for result in run_results):
+            sys.exit(1)
+
+    if args.cmd == "bench":
+        from .bench import BENCH_SIZES, generate_input, input_size, run_bench
+        from .runner import RUN_TIMEOUT, Sample
+
+        settings: dict[str, Any] = {
+            "generator": args.generator,
+            "expression": args.expression,
+            "sizes": args.sizes,
+        }
+        if not (args.no_state or args.inputs):
+            # How inputs of a task are made is remembered for the next runs
+            slug = client.session.base_url.rstrip("/").split("/")[-1]
+            key = f"bench/{slug}/{args.task_id}"
+            with open_state_store() as store, store.locked():
+                stored = store.get(key, {})
+                if args.generator or args.expression:
+                    settings["sizes"] = args.sizes or stored.get("sizes")
+                else:
+                    settings = {
+                        **settings,
+                        **stored,
+                        "sizes": args.sizes or stored.get("sizes"),
+                    }
+                if (settings["generator"] or settings["expression"]) and (
+                    settings != stored
+                ):
+                    store.set(key, settings)
+
+        bench_samples: list[tuple[int, Sample]] = list()
+        if args.inputs:
+            for path in args.inputs:
+                stdin = Path(path).read_text()
+                bench_samples.append((input_size(stdin), Sample(path, "", stdin=stdin)))
+        elif settings["generator"] or settings["expression"]:
+            bench_samples = [
+                (
+                    size,
+                    Sample(
+                        f"n={size}",
+                        "",
+                        stdin=generate_input(settings["generator"], size)
+                        if settings["generator"]
+                        else "",
+                        expression=settings["expression"].replace("{n}", str(size))
+                        if settings["expression"]
+                        else None,
+                    ),
+                )
+                for size in settings["sizes"] or BENCH_SIZES
+            ]
+        else:
+            sys.exit("Give inputs with --input, --generator or --expression")
+
+        task = client.get_task(args.task_id)
+        report = run_bench(
+            args.filename, bench_samples, timeout=args.timeout or RUN_TIMEOUT
+        )
+        print_bench_report(report, task, max_size=args.max_size)
+        if not all(point.ok for point in report.points):
+            sys.exit(1)
+
+    if args.cmd == "history":
+        if not client.history:
+            sys.exit("The history needs the stored state, don't use --no-state")
+        course = client.session.base_url
+        if args.last_passing:
+            if not args.task:
+                sys.exit("Give the task with --task")
+            passing = client.history.last_passing(course, args.task)
+            if passing is None or passing.code is None:
+                sys.exit(f"No accepted submission of task {args.task} recorded")
+            print(passing.code, end="")
+            return
+        past_submissions = client.history.for_task(course, args.task, limit=args.limit)
+        print_history(past_submissions, format=args.format)
+
+    if args.cmd == "sync":
+        from .mirror import sync_course
+
+        if client.mirror is None:
+            sys.exit("Syncing needs the stored state, don't use --no-state")
+        sync_result = sync_course(
+            client, client.mirror, refresh=args.refresh, max_workers=args.jobs
+        )
+        print(
+            f"Synced {client.mirror.course} to revision {sync_result.revision}: "
+            f"{len(sync_result.added)} added, {len(sync_result.changed)} changed, "
+            f"{len(sync_result.unchanged)} unchanged, "
+            f"{len(sync_result.removed)} removed "
+            f"({sync_result.downloaded} pages downloaded)"
+        )
+        if sync_result.failed:
+            sys.exit(
+                f"Failed to sync {', '.join(sync_result.failed)}, "
+                "run sync again to retry them"
+            )
+
+    if args.cmd == "search":
+        if not client.index:
+            sys.exit("Searching needs the stored state, don't use --no-state")
+        search_results = client.index.search(
+            args.query, course=client.session.base_url, limit=args.limit
+        )
+        if not search_results:
+            sys.exit(f"No fetched exercises match: {args.query}")
+        print_search_results(search_results)
+
+    if args.cmd == "submit-batch":
+        directory = Path(args.directory)
+        filenames = [path.name for path in directory.iterdir() if path.is_file()]
+        matches = client.match_submit_files(filenames, max_workers=args.jobs)
+        if not matches:
+            sys.exit(f"No solution files for any task found in {directory}")
+
+        submissions = {
+            task_id: (filename, (directory / filename).read_text())
+            for task_id, filename in matches.items()
+        }
+        batch_results = {
+            task_id: {
+                "task_id": task_id,
+                "filename": filename,
+                "status": "submitted",
+                "result": "",
+            }
+            for task_id, filename in matches.items()
+        }
+        result_urls: dict[str, str] = dict()
+        for task_id, submitted_url in client.submit_tasks(
+            submissions, max_workers=args.jobs
+        ):
+            if submitted_url:
+                result_urls[task_id] = submitted_url
+            else:
+                batch_results[task_id]["status"] = "submit failed"
+        poll_errors: dict[str, Exception] = dict()
+        try:
+            for task_id, results in client.wait_for_results(
+                result_urls, errors=poll_errors
+            ):
+                batch_results[task_id].update(results.to_dict())
+        except TimeoutError as e:
+            logger.warning(e)
+        # Whatever got no result is reported instead of losing the whole table
+        for task_id in result_urls:
+            if task_id in poll_errors:
+                batch_results[task_id]["status"] = "poll failed"
+            elif batch_results[task_id]["status"] == "submitted":
+                batch_results[task_id]["status"] = "timed out"
+        print_batch_results(list(batch_results.values()), format=args.format)
 
 
 if __name__ == "__main__":
@@ -1,11 +1,36 @@
-from typing import AnyStr, Optional
+import hashlib
+import json
+import os
+import tempfile
+from typing import Any, Optional, Union
 
-import html5lib
+from .instrument import instrumented
+from .parser import HtmlSource, parse_html
 
 
-def find_link(html: AnyStr, xpath: str) -> dict[str, Optional[str]]:
+def cookie_fingerprint(cookies: dict[str, str]) -> str:
+    """Return a stable hash of a cookie dict, used to tie cached login state to it"""
+    return hashlib.sha256(json.dumps(cookies, sort_keys=True).encode()).hexdigest()
+
+
+def write_json_atomic(path: Union[str, "os.PathLike[str]"], data: Any) -> None:
+    """Write data as JSON to a temporary file first so readers never see a partial file"""
+    fd, tmp_name = tempfile.mkstemp(
+        dir=os.path.dirname(path) or ".", prefix=".", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_name, path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+
+@instrumented
+def find_link(html: HtmlSource, xpath: str) -> dict[str, Optional[str]]:
     """Search for html link by xpath and return dict with href and text"""
-    anchor_element = html5lib.parse(html, namespaceHTMLElements=False).find(xpath)
+    anchor_element = parse_html(html).find(xpath)
     if anchor_element is None:
         return dict()
 
@@ -16,9 +41,15 @@ def find_link(html: AnyStr, xpath: str) -> dict[str, Optional[str]]:
     return link_data
 
 
-def parse_form(html: AnyStr, xpath: str = ".//form") -> dict[str, Optional[str]]:
+def page_is_logged_in(html: HtmlSource) -> bool:
+    """Check if a CSES page was rendered for a logged in user"""
+    return bool(find_link(html, './/a[@title="Log out"]'))
+
+
+@instrumented
+def parse_form(html: HtmlSource, xpath: str = ".//form") -> dict[str, Optional[str]]:
     """Search for the first form in html and return dict with action and all other found inputs"""
-    form_element = html5lib.parse(html, namespaceHTMLElements=False).find(xpath)
+    form_element = parse_html(html).find(xpath)
     if form_element is None:
         return dict()
 
@@ -0,0 +1,216 @@
+"""Submit a solution every time it's saved
+
+The solution file is watched with inotify on Linux and by polling its stat
+elsewhere. Editors often save in bursts, or by writing a new file and renaming
+it over the old one, so the directory is watched and a submission is only made
+once the file has been quiet for the debounce time. Results of a submission
+that was superseded by a newer one are no longer polled or printed.
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Iterator, Optional, Protocol
+
+from .client import Client, SubmitResult
+
+logger = logging.getLogger(__name__)
+
+# Seconds without changes to the file before it's submitted
+WATCH_DEBOUNCE = float(os.getenv("WATCH_DEBOUNCE", 0.3))
+# Seconds between checks of the file when inotify isn't available
+WATCH_POLL_INTERVAL = float(os.getenv("WATCH_POLL_INTERVAL", 0.5))
+
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+INOTIFY_EVENT = struct.Struct("iIII")
+
+
+class Watcher(Protocol):
+    def wait(self, timeout: Optional[float]) -> bool:
+        """Wait until the file changes, returns False if timeout passed first"""
+        ...
+
+    def close(self) -> None: ...
+
+
+class PollWatcher:
+    """Watch a file by comparing its stat at an interval"""
+
+    def __init__(self, path: str, interval: float = WATCH_POLL_INTERVAL) -> None:
+        self.path = path
+        self.interval = interval
+        self.last = self._stat()
+
+    def _stat(self) -> Optional[tuple[int, int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def wait(self, timeout: Optional[float]) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            current = self._stat()
+            if current != self.last:
+                self.last = current
+                return True
+            if deadline is None:
+                time.sleep(self.interval)
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self.interval, remaining))
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """Watch a file with Linux inotify, through the C library with ctypes"""
+
+    def __init__(self, path: str) -> None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.name = os.path.basename(path).encode()
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        directory = os.path.dirname(os.path.abspath(path))
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if libc.inotify_add_watch(self.fd, directory.encode(), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, os.strerror(errno), directory)
+
+    def _read_names(self) -> Iterator[bytes]:
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(data):
+            _, _, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            yield data[offset : offset + length].rstrip(b"\0")
+            offset += length
+
+    def wait(self, timeout: Optional[float]) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            ready, _, _ = select.select([self.fd], [], [], remaining)
+            if not ready:
+                return False
+            # Read all queued events, other files in the directory don't count
+            if self.name in list(self._read_names()):
+                return True
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def create_watcher(path: str) -> Watcher:
+    """Return an inotify watcher where it works, a polling one otherwise"""
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(path)
+        except (OSError, AttributeError) as e:
+            logger.debug(f"No inotify, polling {path} instead: {e}")
+    return PollWatcher(path)
+
+
+def debounced(watcher: Watcher, debounce: float = WATCH_DEBOUNCE) -> Iterator[None]:
+    """Yield once for every burst of changes, after debounce seconds of quiet"""
+    while True:
+        watcher.wait(None)
+        while watcher.wait(debounce):
+            pass
+        yield
+
+
+class SubmissionWatcher:
+    """Submits the file on every save and prints the result of the latest one"""
+
+    def __init__(self, client: Client, task_id: str, path: str) -> None:
+        self.client = client
+        self.task_id = task_id
+        self.path = path
+        self.generation = 0
+        self.last_submission: Optional[str] = None
+        self._print_lock = threading.Lock()
+
+    def print(self, message: str) -> None:
+        with self._print_lock:
+            print(message, flush=True)
+
+    def submit(self) -> Optional[threading.Thread]:
+        """Submit the file if it changed, returns the thread polling its result"""
+        try:
+            with open(self.path) as f:
+                submission = f.read()
+        except FileNotFoundError:
+            return None
+        if submission == self.last_submission:
+            self.print("Solution unchanged, not submitting")
+            return None
+
+        self.generation += 1
+        generation = self.generation
+        try:
+            result_url = self.client.submit_task(
+                self.task_id, submission, filename=os.path.basename(self.path)
+            )
+        except Exception as e:
+            self.print(f"[#{generation}] Submitting failed: {e}")
+            return None
+        self.last_submission = submission
+        self.print(f"[#{generation}] Submitted, waiting for test results...")
+        thread = threading.Thread(
+            target=self.report, args=(generation, result_url), daemon=True
+        )
+        thread.start()
+        return thread
+
+    def report(self, generation: int, result_url: str) -> None:
+        def superseded() -> bool:
+            return generation != self.generation
+
+        try:
+            results = SubmitResult(status="", result="")
+            for results in self.client.wait_for_result(
+                result_url, cancelled=superseded
+            ):
+                if superseded():
+                    break
+                self.print(f"[#{generation}] Submission status: {results.status}")
+            if superseded():
+                self.print(f"[#{generation}] Superseded, ignoring its result")
+                return
+            self.print(f"[#{generation}] Submission result: {results.result}")
+        except Exception as e:
+            self.print(f"[#{generation}] Waiting for the result failed: {e}")
+
+    def run(self, watcher: Watcher, debounce: Optional[float] = None) -> None:
+        self.print(f"Watching {self.path}, save it to submit task {self.task_id}")
+        try:
+            for _ in debounced(
+                watcher, WATCH_DEBOUNCE if debounce is None else debounce
+            ):
+                self.submit()
+        finally:
+            watcher.close()